@@ -0,0 +1,49 @@
+#############################################################################################################
+
+"""
+Description:
+Stand-in for the AgroC executable, for testing the run tools without the simulator.
+
+It reads plants.in from the working directory, checks that it parses, prints a few progress lines,
+sleeps for a moment and writes a small output file (plants_out.txt), like a short simulation would.
+
+Usage:
+    python agroc_stub.py [--sleep SECONDS] [--fail]
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import plants_io
+
+
+###############################################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AgroC stand-in")
+    parser.add_argument("--sleep", type=float, default=0.2, help="simulated run time in seconds")
+    parser.add_argument("--fail", action="store_true", help="exit with an error after reading the input")
+    args = parser.parse_args(argv)
+
+    doc = plants_io.read("plants.in")
+    plant = doc.plants[0]
+    print(f"AgroC stub: start date {doc.header['start_date']}, latitude {doc.header['latitude']}", flush=True)
+    print(f"AgroC stub: {len(doc.plants)} plant type(s), first: {plant.fields['plant_type_name']}", flush=True)
+    time.sleep(args.sleep)
+    if args.fail:
+        print("AgroC stub: simulated failure", file=sys.stderr)
+        return 2
+    with open("plants_out.txt", "w") as file:
+        file.write(f"AMX {plant.fields['amx']}\nTEMPSTART {plant.fields['tempstart']}\n")
+    print("AgroC stub: done", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
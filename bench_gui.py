@@ -0,0 +1,310 @@
+#############################################################################################################
+
+"""
+Description:
+Scripted interaction benchmark for the AgroC plants.in editor.
+
+The benchmark drives AgroCInputEditor under the offscreen Qt platform and replays a realistic
+editing session: loading plants.in (parsed, and from the parse cache), switching between the 17
+tables, editing cells, adding and removing rows and saving. For every kind of action it reports p50/p95/p99 latency, and for the whole
+session the growth of Python heap (tracemalloc) and resident set size.
+
+With --soak N the benchmark instead repeats a load/switch/edit/save cycle N times and measures the
+Python heap, the resident set size and the live Qt objects by class (see plants_diag.py) after
+every cycle. It exits with status 1 when they keep growing beyond the given limits, so it can run
+in CI to catch leaks of long editing sessions.
+
+Usage:
+    python bench_gui.py                       # default session
+    python bench_gui.py --switches 5000 --edits 5000 --json results.json
+    python bench_gui.py --soak 200 --max-heap-growth 2
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import contextlib
+import gc
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication, QTableWidgetItem
+
+from plants_diag import count_growth, qt_object_counts, rss_bytes
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+###############################################################################################################
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(p / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+@contextlib.contextmanager
+def _parse_cache(cache):
+    # Temporarily replaces the process-wide parse cache (None disables it)
+    import plants_cache
+    saved = plants_cache.default_cache()
+    plants_cache._default[:] = [cache]
+    try:
+        yield
+    finally:
+        plants_cache._default[:] = [saved]
+
+
+class Recorder:
+    # Collects per-action latencies in milliseconds
+    def __init__(self, app):
+        self.app = app
+        self.samples = {}
+
+    def run(self, action, func, *args):
+        start = time.perf_counter()
+        func(*args)
+        # Let Qt process the resulting layout/paint events so they count towards the action
+        self.app.processEvents()
+        self.samples.setdefault(action, []).append((time.perf_counter() - start) * 1000.0)
+
+    def report(self):
+        rows = []
+        for action, values in self.samples.items():
+            values = sorted(values)
+            rows.append({
+                "action": action,
+                "count": len(values),
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+                "p99_ms": percentile(values, 99),
+                "max_ms": values[-1],
+            })
+        return rows
+
+
+##########################################
+
+def run_session(args):
+    import plants_gui
+
+    os.chdir(HERE)
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    rng = random.Random(args.seed)
+    out_dir = tempfile.mkdtemp(prefix="agroc_bench_")
+    out_file = os.path.join(out_dir, "plants_mod.in")
+
+    gc.collect()
+    tracemalloc.start()
+    heap_start = tracemalloc.get_traced_memory()[0]
+    rss_start = rss_bytes()
+
+    rec = Recorder(app)
+    start_session = time.perf_counter()
+    rec.run("construct", lambda: setattr(rec, "editor", plants_gui.AgroCInputEditor()))
+    editor = rec.editor
+    editor.show()
+    app.processEvents()
+
+    n_tables = len(editor.tables)
+    # "load" parses the file every time; "load_cached" is served by the parse cache (plants_cache.py)
+    with _parse_cache(None):
+        for _ in range(args.loads):
+            rec.run("load", editor.load_file, editor.default_file)
+    for _ in range(args.loads):
+        rec.run("load_cached", editor.load_file, editor.default_file)
+
+    for _ in range(args.switches):
+        row = rng.randrange(n_tables)
+
+        def switch(row=row):
+            editor.table_list.setCurrentRow(row)
+            editor.show_selected_table(editor.table_list.item(row))
+        rec.run("switch_table", switch)
+
+    for _ in range(args.edits):
+        table = editor.tables[rng.randrange(n_tables)]
+        if table.rowCount() == 0:
+            continue
+        r, c = rng.randrange(table.rowCount()), rng.randrange(table.columnCount())
+        value = f"{rng.uniform(-10, 40):.4f}"
+
+        def edit(table=table, r=r, c=c, value=value):
+            item = table.item(r, c)
+            if item is None:
+                table.setItem(r, c, QTableWidgetItem(value))
+            else:
+                item.setText(value)
+        rec.run("edit_cell", edit)
+
+    for _ in range(args.row_ops):
+        index = rng.randrange(n_tables)
+        rec.run("add_row", editor.add_row_to_table, index)
+        rec.run("remove_row", editor.remove_row_from_table, index)
+
+    # generate_plants_in reports every save on stdout; keep the benchmark output readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(args.saves):
+            rec.run("save", editor.generate_plants_in, out_file)
+
+    elapsed = time.perf_counter() - start_session
+    gc.collect()
+    app.processEvents()
+    heap_end, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_end = rss_bytes()
+
+    editor.close()
+    return {
+        "actions": rec.report(),
+        "session_seconds": elapsed,
+        "heap_growth_bytes": heap_end - heap_start,
+        "heap_peak_bytes": heap_peak,
+        "rss_growth_bytes": rss_end - rss_start,
+        "rss_end_bytes": rss_end,
+    }
+
+
+##########################################
+# Soak test
+
+def run_soak(args):
+    # Repeats load/switch/edit/save cycles; the first --warmup cycles fill caches and are not judged
+    import plants_gui
+
+    os.chdir(HERE)
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    rng = random.Random(args.seed)
+    out_file = os.path.join(tempfile.mkdtemp(prefix="agroc_soak_"), "plants_mod.in")
+    editor = plants_gui.AgroCInputEditor()
+    editor.show()
+    app.processEvents()
+    tracemalloc.start()
+
+    def cycle():
+        editor.load_file(editor.default_file)
+        for row in range(len(editor.tables)):
+            editor.table_list.setCurrentRow(row)
+            editor.show_selected_table(editor.table_list.item(row))
+            app.processEvents()
+        for _ in range(10):
+            table = editor.tables[rng.randrange(len(editor.tables))]
+            if table.rowCount():
+                table.item(rng.randrange(table.rowCount()), 1).setText(f"{rng.uniform(-10, 40):.4f}")
+        index = rng.randrange(len(editor.tables))
+        editor.add_row_to_table(index)
+        editor.remove_row_from_table(index)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            editor.generate_plants_in(out_file)
+        app.processEvents()
+
+    def measure():
+        gc.collect()
+        app.processEvents()
+        return tracemalloc.get_traced_memory()[0], rss_bytes()
+
+    start = time.perf_counter()
+    for _ in range(args.warmup):
+        cycle()
+    # Qt objects are only counted at both ends; the walk itself allocates
+    counts_start = qt_object_counts(app)
+    baseline = measure()
+    samples = []
+    for _ in range(args.soak):
+        cycle()
+        samples.append(measure())
+    heap, rss = samples[-1] if samples else baseline
+    counts = qt_object_counts(app)
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    editor.close()
+
+    heap_growth = (heap - baseline[0]) / max(args.soak, 1)
+    rss_growth = rss - baseline[1]
+    qt_growth = count_growth(counts_start, counts)
+    failures = []
+    if heap_growth > args.max_heap_growth * 1024:
+        failures.append(f"Python heap grew by {heap_growth / 1024:.2f} KiB per cycle "
+                        f"(limit {args.max_heap_growth} KiB)")
+    if rss_growth > args.max_rss_growth * 1048576:
+        failures.append(f"RSS grew by {rss_growth / 1048576:.1f} MiB (limit {args.max_rss_growth} MiB)")
+    grown = [(name, change) for name, change in qt_growth if change > args.max_qt_growth]
+    if grown:
+        failures.append("Qt objects grew: " + ", ".join(f"{name} {change:+d}" for name, change in grown))
+    return {
+        "cycles": args.soak,
+        "session_seconds": elapsed,
+        "heap_growth_bytes_per_cycle": heap_growth,
+        "rss_growth_bytes": rss_growth,
+        "qt_objects": sum(counts.values()),
+        "qt_growth": qt_growth,
+        "heap_bytes": [sample[0] for sample in samples],
+        "rss_bytes": [sample[1] for sample in samples],
+        "failures": failures,
+    }
+
+
+def print_soak_report(result):
+    print(f"soak cycles:    {result['cycles']} in {result['session_seconds']:.2f} s")
+    print(f"heap growth:    {result['heap_growth_bytes_per_cycle'] / 1024:.2f} KiB per cycle")
+    print(f"RSS growth:     {result['rss_growth_bytes'] / 1024:.1f} KiB")
+    print(f"Qt objects:     {result['qt_objects']} "
+          f"({', '.join(f'{name} {change:+d}' for name, change in result['qt_growth']) or 'no change'})")
+    for failure in result["failures"]:
+        print(f"FAIL: {failure}")
+
+
+def print_report(result):
+    print(f"{'action':<14} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for row in result["actions"]:
+        print(f"{row['action']:<14} {row['count']:>7} {row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} "
+              f"{row['p99_ms']:>9.3f} {row['max_ms']:>9.3f}")
+    print(f"session time:   {result['session_seconds']:.2f} s")
+    print(f"heap growth:    {result['heap_growth_bytes'] / 1024:.1f} KiB "
+          f"(peak {result['heap_peak_bytes'] / 1024:.1f} KiB)")
+    print(f"RSS growth:     {result['rss_growth_bytes'] / 1024:.1f} KiB "
+          f"(end {result['rss_end_bytes'] / 1048576:.1f} MiB)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offscreen interaction benchmark for the AgroC editor")
+    parser.add_argument("--loads", type=int, default=20, help="number of reloads of plants.in, each with and without the parse cache")
+    parser.add_argument("--switches", type=int, default=2000, help="number of table switches")
+    parser.add_argument("--edits", type=int, default=2000, help="number of cell edits")
+    parser.add_argument("--row-ops", type=int, default=500, help="number of add/remove row pairs")
+    parser.add_argument("--saves", type=int, default=200, help="number of saves")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the session script")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    soak = parser.add_argument_group("soak test")
+    soak.add_argument("--soak", type=int, metavar="CYCLES", help="run CYCLES load/switch/edit/save cycles instead")
+    soak.add_argument("--warmup", type=int, default=5, help="cycles before the baseline is taken")
+    soak.add_argument("--max-heap-growth", type=float, default=1.0, help="KiB of Python heap growth allowed per cycle")
+    soak.add_argument("--max-rss-growth", type=float, default=16.0, help="MiB of RSS growth allowed in total")
+    soak.add_argument("--max-qt-growth", type=int, default=0, help="growth allowed per Qt class in total")
+    args = parser.parse_args(argv)
+
+    if args.soak is not None:
+        result = run_soak(args)
+        print_soak_report(result)
+    else:
+        result = run_session(args)
+        print_report(result)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(result, file, indent=2)
+    return 1 if result.get("failures") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
@@ -0,0 +1,328 @@
+#############################################################################################################
+
+"""
+Description:
+Single-archive output for large ensembles of generated plants.in files.
+
+Instead of writing one small file per variant, the batch generators can stream their output into
+one archive. The format is chosen by the file extension:
+- .zip                      zip archive (deflate compressed)
+- .tar, .tar.gz, .tgz       tar archive (random access by ID is only cheap for uncompressed .tar)
+- .pack                     packed container: zlib-compressed members followed by an index, so a
+                            member is read with one seek without scanning the archive
+
+Members are stored as '<ID>.in'. open_archive() returns a reader that pulls single members out by
+ID, and extract() materializes a subset as ordinary files for an AgroC run.
+
+Usage:
+    python plants_archive.py list variants.pack
+    python plants_archive.py cat variants.pack site_0042
+    python plants_archive.py extract variants.pack site_0042 site_0043 -o run_dir
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import io
+import json
+import os
+import struct
+import sys
+import tarfile
+import time
+import zipfile
+import zlib
+
+
+###############################################################################################################
+
+MEMBER_SUFFIX = ".in"
+
+PACK_MAGIC = b"AGPK"
+PACK_VERSION = 1
+# File header: magic + version; footer: index offset, index length, magic
+_PACK_HEADER = struct.Struct("<4sI")
+_PACK_FOOTER = struct.Struct("<QQ4s")
+
+
+def member_name(member_id):
+    return member_id if member_id.endswith(MEMBER_SUFFIX) else member_id + MEMBER_SUFFIX
+
+
+def member_id(name):
+    return name[:-len(MEMBER_SUFFIX)] if name.endswith(MEMBER_SUFFIX) else name
+
+
+def safe_path(directory, name):
+    # directory/name; names that would not lead to a path below the directory (absolute, "..", "")
+    # are rejected
+    path = os.path.normpath(name)
+    if (os.path.isabs(path) or os.path.splitdrive(path)[0] or path in (os.curdir, os.pardir)
+            or path.startswith(os.pardir + os.sep)):
+        raise ValueError(f"{name!r} would be written outside {directory}")
+    return os.path.join(directory, path)
+
+
+def member_path(directory, member):
+    # directory/<ID>.in; IDs that would lead outside the directory are rejected
+    return safe_path(directory, member_name(member))
+
+
+def _unique_index(pairs):
+    # object_pairs_hook for the pack index: a member ID may appear only once
+    index = {}
+    for key, value in pairs:
+        if key in index:
+            raise ValueError(f"duplicate member {key!r} in the pack index")
+        index[key] = value
+    return index
+
+
+def archive_kind(path):
+    lower = path.lower()
+    if lower.endswith(".zip"):
+        return "zip"
+    if lower.endswith((".tar", ".tar.gz", ".tgz", ".tar.xz", ".tar.bz2")):
+        return "tar"
+    if lower.endswith(".pack"):
+        return "pack"
+    raise ValueError(f"unknown archive type for {path} (use .zip, .tar[.gz] or .pack)")
+
+
+###############################################################################################################
+# Writers
+
+class ZipSink:
+    def __init__(self, path, level=6):
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=level)
+
+    def add(self, member, text):
+        self._zip.writestr(member_name(member), text)
+
+    def close(self):
+        self._zip.close()
+
+
+class TarSink:
+    def __init__(self, path):
+        mode = "w"
+        for suffix, compression in ((".gz", "gz"), (".tgz", "gz"), (".xz", "xz"), (".bz2", "bz2")):
+            if path.lower().endswith(suffix):
+                mode = "w:" + compression
+        self._tar = tarfile.open(path, mode)
+        self._mtime = time.time()
+
+    def add(self, member, text):
+        data = text.encode()
+        info = tarfile.TarInfo(member_name(member))
+        info.size = len(data)
+        info.mtime = self._mtime
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def close(self):
+        self._tar.close()
+
+
+class PackSink:
+    # Writes the packed container: header, members, zlib-compressed JSON index, footer
+    def __init__(self, path, level=6):
+        self._file = open(path, "wb")
+        self._file.write(_PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION))
+        self._level = level
+        self._index = {}
+
+    def add(self, member, text):
+        if member_id(member) in self._index:
+            raise ValueError(f"duplicate member {member_id(member)!r}")
+        data = zlib.compress(text.encode(), self._level)
+        self._index[member_id(member)] = (self._file.tell(), len(data))
+        self._file.write(data)
+
+    def close(self):
+        index = zlib.compress(json.dumps(self._index, separators=(",", ":")).encode())
+        offset = self._file.tell()
+        self._file.write(index)
+        self._file.write(_PACK_FOOTER.pack(offset, len(index), PACK_MAGIC))
+        self._file.close()
+
+
+class DirectorySink:
+    # Plain files in a directory, for tools that accept either a directory or an archive
+    def __init__(self, path):
+        self._dir = path
+        os.makedirs(path, exist_ok=True)
+
+    def add(self, member, text):
+        path = member_path(self._dir, member)
+        if os.path.dirname(member):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(text)
+
+    def close(self):
+        pass
+
+
+def open_sink(path):
+    # Output sink for path: an archive if the extension names one, a directory otherwise
+    try:
+        kind = archive_kind(path)
+    except ValueError:
+        return DirectorySink(path)
+    return {"zip": ZipSink, "tar": TarSink, "pack": PackSink}[kind](path)
+
+
+def write_archive(variants, path):
+    # Streams (ID, text) pairs into the archive or directory at path; returns the member count
+    sink = open_sink(path)
+    count = 0
+    try:
+        for name, text in variants:
+            sink.add(name, text)
+            count += 1
+    finally:
+        sink.close()
+    return count
+
+
+###############################################################################################################
+# Readers
+
+class ZipArchive:
+    def __init__(self, path):
+        self._zip = zipfile.ZipFile(path)
+
+    def ids(self):
+        return [member_id(name) for name in self._zip.namelist() if name.endswith(MEMBER_SUFFIX)]
+
+    def read(self, member):
+        return self._zip.read(member_name(member)).decode()
+
+    def close(self):
+        self._zip.close()
+
+
+class TarArchive:
+    def __init__(self, path):
+        self._tar = tarfile.open(path)
+
+    def ids(self):
+        return [member_id(info.name) for info in self._tar.getmembers()
+                if info.isfile() and info.name.endswith(MEMBER_SUFFIX)]
+
+    def read(self, member):
+        return self._tar.extractfile(member_name(member)).read().decode()
+
+    def close(self):
+        self._tar.close()
+
+
+class PackArchive:
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        magic, version = _PACK_HEADER.unpack(self._file.read(_PACK_HEADER.size))
+        if magic != PACK_MAGIC or version > PACK_VERSION:
+            raise ValueError(f"{path} is not a plants.in pack (or was written by a newer version)")
+        self._file.seek(-_PACK_FOOTER.size, os.SEEK_END)
+        offset, length, magic = _PACK_FOOTER.unpack(self._file.read(_PACK_FOOTER.size))
+        if magic != PACK_MAGIC:
+            raise ValueError(f"{path} is truncated (no pack index found)")
+        self._file.seek(offset)
+        self._index = json.loads(zlib.decompress(self._file.read(length)), object_pairs_hook=_unique_index)
+
+    def ids(self):
+        return list(self._index)
+
+    def read(self, member):
+        offset, length = self._index[member_id(member)]
+        self._file.seek(offset)
+        return zlib.decompress(self._file.read(length)).decode()
+
+    def close(self):
+        self._file.close()
+
+
+class DirectoryArchive:
+    def __init__(self, path):
+        self._dir = path
+
+    def ids(self):
+        # Nested IDs (sub/b) as written by DirectorySink, with "/" as separator on every platform
+        ids = []
+        for root, _, names in os.walk(self._dir):
+            prefix = os.path.relpath(root, self._dir).replace(os.sep, "/")
+            ids += [member_id(name if prefix == "." else f"{prefix}/{name}")
+                    for name in names if name.endswith(MEMBER_SUFFIX)]
+        return sorted(ids)
+
+    def read(self, member):
+        with open(member_path(self._dir, member)) as file:
+            return file.read()
+
+    def close(self):
+        pass
+
+
+def open_archive(path):
+    # Reader for an archive written by open_sink (or a directory of .in files)
+    if os.path.isdir(path):
+        return DirectoryArchive(path)
+    return {"zip": ZipArchive, "tar": TarArchive, "pack": PackArchive}[archive_kind(path)](path)
+
+
+def iter_members(path, ids=None):
+    # Yields (ID, text) for the given IDs, or for all members
+    archive = open_archive(path)
+    try:
+        for member in (archive.ids() if ids is None else ids):
+            yield member_id(member), archive.read(member)
+    finally:
+        archive.close()
+
+
+def extract(path, ids, out_dir):
+    # Materializes the given members as out_dir/<ID>.in; returns the written paths
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for member, text in iter_members(path, ids):
+        target = member_path(out_dir, member)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w") as file:
+            file.write(text)
+        written.append(target)
+    return written
+
+
+###############################################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and extract plants.in archives")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_cmd = commands.add_parser("list", help="list member IDs")
+    list_cmd.add_argument("archive")
+    cat_cmd = commands.add_parser("cat", help="print one member")
+    cat_cmd.add_argument("archive")
+    cat_cmd.add_argument("id")
+    extract_cmd = commands.add_parser("extract", help="write members as plain files")
+    extract_cmd.add_argument("archive")
+    extract_cmd.add_argument("ids", nargs="*", help="member IDs (all members when omitted)")
+    extract_cmd.add_argument("-o", "--out-dir", default=".", help="output directory")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        archive = open_archive(args.archive)
+        print("\n".join(archive.ids()))
+        archive.close()
+    elif args.command == "cat":
+        archive = open_archive(args.archive)
+        sys.stdout.write(archive.read(args.id))
+        archive.close()
+    else:
+        written = extract(args.archive, args.ids or None, args.out_dir)
+        print(f"Extracted {len(written)} files to {args.out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
@@ -0,0 +1,188 @@
+#############################################################################################################
+
+"""
+Description:
+On-disk cache of parsed plants.in documents for fast re-opening of large libraries.
+
+plants_io.read() consults this cache transparently. An entry holds the parsed scalars and tables of
+one file plus the tables as float64 arrays, in a compact binary form (marshal) that loads several
+times faster than parsing the text. Entries are keyed by the absolute path and validated against
+the file's modification time and size, so an edited file is parsed again and its stale entry
+replaced. The tables of each plant type are stored as a separate blob that is only decoded when the
+plant type is used, like the lazily parsed blocks of plants_io.parse(). The cache is bounded in
+size: when it grows beyond its limit, the least recently used entries are removed.
+
+Environment:
+    AGROC_CACHE=0             disable the cache
+    AGROC_CACHE_DIR=PATH      cache location (default: ~/.cache/agroc/parsed)
+    AGROC_CACHE_MAX_MB=N      size limit in MiB (default: 256)
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import hashlib
+import marshal
+import os
+import tempfile
+from array import array
+
+import plants_io
+from plants_trace import traced
+
+
+###############################################################################################################
+
+CACHE_FORMAT = 2
+ENTRY_SUFFIX = ".pcache"
+
+
+def _table_array(rows):
+    # Table values as a flat float64 array (x0, y0, x1, y1, ...); None if a cell is not a number
+    try:
+        return array("d", [v for row in plants_io.table_values(rows) for v in row]).tobytes()
+    except ValueError:
+        return None
+
+
+def _cached_plant(fields, tables_blob):
+    # Builds a plant type from a cache entry on first access (see plants_io.PlantType). The entry's
+    # fields dict is shared by every copy of the unparsed plant type, so each one gets its own dict.
+    return dict(fields), marshal.loads(tables_blob)
+
+
+class ParseCache:
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or os.environ.get("AGROC_CACHE_DIR") or os.path.join(
+            os.path.expanduser("~"), ".cache", "agroc", "parsed")
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("AGROC_CACHE_MAX_MB", "256")) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._size = None  # total size of the entries, measured on the first write
+        os.makedirs(self.directory, exist_ok=True)
+
+    def entry_path(self, path):
+        digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+        return os.path.join(self.directory, digest + ENTRY_SUFFIX)
+
+    ##########################################
+
+    def _read_entry(self, path, stat):
+        entry = self.entry_path(path)
+        try:
+            with open(entry, "rb") as file:
+                data = marshal.loads(file.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if (not isinstance(data, tuple) or data[0] != CACHE_FORMAT
+                or data[1] != stat.st_mtime_ns or data[2] != stat.st_size):
+            self._remove(entry)  # stale: the file changed since it was cached
+            return None
+        try:
+            os.utime(entry)  # mark as recently used for the LRU eviction
+        except OSError:
+            pass
+        return data
+
+    def _write_entry(self, path, stat, doc):
+        plants = [(plant.fields, marshal.dumps(plant.tables), [_table_array(rows) for rows in plant.tables])
+                  for plant in doc.plants]
+        blob = marshal.dumps((CACHE_FORMAT, stat.st_mtime_ns, stat.st_size, doc.header, plants))
+        entry = self.entry_path(path)
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                file.write(blob)
+            os.replace(tmp, entry)
+        except OSError:
+            return
+        if self._size is None:
+            self._size = self.total_size()
+        else:
+            self._size += len(blob)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    ##########################################
+
+    @traced(name="plants_cache.load")
+    def load(self, path):
+        # Parsed document for path, from the cache when the entry is still valid
+        stat = os.stat(path)
+        data = self._read_entry(path, stat)
+        if data is not None:
+            return plants_io.PlantsDocument(data[3], [plants_io.PlantType(source=(_cached_plant, fields, tables))
+                                                      for fields, tables, _ in data[4]])
+        with plants_io.open_file(path) as file:
+            doc = plants_io.parse(file.read())
+        self._write_entry(path, stat, doc)
+        return doc
+
+    def load_arrays(self, path):
+        # (header, [(fields, [17 float64 arrays of x, y pairs or None])]) without building a document
+        stat = os.stat(path)
+        data = self._read_entry(path, stat)
+        if data is None:
+            with plants_io.open_file(path) as file:
+                doc = plants_io.parse(file.read())
+            self._write_entry(path, stat, doc)
+            data = self._read_entry(path, stat)
+        if data is None:
+            # The entry could not be written (e.g. a read-only cache directory): use the parsed document
+            header = doc.header
+            plants = [(plant.fields, None, [_table_array(rows) for rows in plant.tables]) for plant in doc.plants]
+        else:
+            header, plants = data[3], data[4]
+        return header, [(fields, [array("d", blob) if blob is not None else None for blob in blobs])
+                        for fields, _, blobs in plants]
+
+    ##########################################
+
+    def _entries(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(ENTRY_SUFFIX):
+                yield entry
+
+    def total_size(self):
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def evict(self, target=None):
+        # Remove least recently used entries until the cache is below target (90% of the limit)
+        target = int(self.max_bytes * 0.9) if target is None else target
+        entries = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in self._entries()))
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, entry_path in entries:
+            if size <= target:
+                break
+            self._remove(entry_path)
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        for entry in list(self._entries()):
+            self._remove(entry.path)
+        self._size = 0
+
+    @staticmethod
+    def _remove(entry):
+        try:
+            os.remove(entry)
+        except OSError:
+            pass
+
+
+_default = []
+
+
+def default_cache():
+    # The process-wide cache, or None when disabled with AGROC_CACHE=0 or not creatable
+    if not _default:
+        cache = None
+        if os.environ.get("AGROC_CACHE", "1").lower() not in ("0", "false", "no", "off"):
+            try:
+                cache = ParseCache()
+            except OSError:
+                cache = None
+        _default.append(cache)
+    return _default[0]
+
+
+#####################################################################################################################
@@ -0,0 +1,338 @@
+#############################################################################################################
+
+"""
+Description:
+Calibration of plant parameters against observations, using the headless plants.in writer.
+
+A candidate parameter vector is applied to a base plants.in document and evaluated by a pluggable
+objective that returns a misfit to minimize (e.g. the RMSE of simulated against observed LAI and
+biomass):
+- an external command, run in a fresh directory containing the candidate as plants.in; the last
+  number printed on stdout is the objective value. "{input}" and "{workdir}" in the command are
+  replaced by the input path and the directory.
+- a Python callable given as "module:function", called as function(document, text) -> float.
+
+Candidates are evaluated in parallel (processes for callables, threads for commands) by
+differential evolution or Nelder-Mead. Every result is stored in an append-only cache keyed by the
+hash of the objective and the written document, so a point is never evaluated twice. The
+optimizers are deterministic for a given --seed, so re-running an interrupted calibration with the
+same arguments replays the cached evaluations and continues where it stopped.
+
+Parameters are given as NAME=LOW:HIGH. NAME is a field (AMX, EFF, SLA, RGR, TEMPSTART, ...,
+'field@N' for plant type N) or a table transformation: tabK.yscale, tabK.xscale, tabK.yshift,
+tabK.xshift.
+
+Usage:
+    python plants_calibrate.py plants.in AMX=40:90 EFF=0.3:0.7 tab12.yscale=0.5:2 \\
+        --command "python fit_lai.py {workdir}" --method de --generations 30 -j 8
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import concurrent.futures
+import hashlib
+import importlib
+import json
+import math
+import os
+import random
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+
+import plants_io
+from plants_trace import traced
+
+
+###############################################################################################################
+# Parameters
+
+_TABLE_PARAM = re.compile(r"^tab(\d+)(?:@(\d+))?\.(xscale|yscale|xshift|yshift)$", re.IGNORECASE)
+
+
+class Parameter:
+    __slots__ = ("name", "low", "high")
+
+    def __init__(self, name, low, high):
+        if not low < high:
+            raise ValueError(f"{name}: lower bound must be below upper bound")
+        self.name = name
+        self.low = low
+        self.high = high
+
+    def apply(self, doc, value):
+        match = _TABLE_PARAM.match(self.name)
+        if match is None:
+            doc.set(self.name, value)
+            return
+        table, plant, op = match.groups()
+        key = f"tab{table}@{plant}" if plant else f"tab{table}"
+        rows = plants_io.table_values(doc.get(key))
+        col = 0 if op[0] == "x" else 1
+        if op.endswith("scale"):
+            rows = [tuple(v * value if i == col else v for i, v in enumerate(row)) for row in rows]
+        else:
+            rows = [tuple(v + value if i == col else v for i, v in enumerate(row)) for row in rows]
+        doc.set(key, rows)
+
+
+def parse_parameter(spec):
+    # "AMX=40:90" -> Parameter
+    try:
+        name, bounds = spec.split("=", 1)
+        low, high = (float(v) for v in bounds.split(":"))
+    except ValueError:
+        raise ValueError(f"parameter must look like NAME=LOW:HIGH, got {spec!r}") from None
+    return Parameter(name.strip(), low, high)
+
+
+def apply_parameters(base, params, x):
+    doc = base.copy()
+    for param, value in zip(params, x):
+        param.apply(doc, value)
+    return doc
+
+
+###############################################################################################################
+# Objectives
+
+def _load_callable(spec):
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name or "objective")
+
+
+def _last_number(text):
+    for token in reversed(text.split()):
+        try:
+            return float(token)
+        except ValueError:
+            continue
+    raise ValueError("the objective command printed no number")
+
+
+def evaluate_text(objective, text, work_root=None, key=None):
+    # Evaluates one candidate; runs in a worker. objective is ("command", str) or ("callable", str)
+    kind, spec = objective
+    if kind == "callable":
+        return float(_load_callable(spec)(plants_io.parse(text), text))
+    workdir = os.path.join(work_root, key[:16])
+    os.makedirs(workdir, exist_ok=True)
+    input_path = os.path.join(workdir, "plants.in")
+    with open(input_path, "w") as file:
+        file.write(text)
+    command = [arg.replace("{input}", input_path).replace("{workdir}", workdir)
+               for arg in shlex.split(spec, posix=os.name != "nt")]
+    try:
+        done = subprocess.run(command, cwd=workdir, capture_output=True, text=True)
+        if done.returncode != 0:
+            raise RuntimeError(f"objective command exited with {done.returncode}: {done.stderr.strip()[-500:]}")
+        return _last_number(done.stdout)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+###############################################################################################################
+# Cache
+
+class EvaluationCache:
+    # Append-only JSON-lines file of {"key", "value", "x"} records; safe to interrupt at any point
+    def __init__(self, path):
+        self.path = path
+        self.values = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by an interruption
+                    self.values[record["key"]] = record["value"]
+        self._file = open(path, "a")
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def put(self, key, value, x):
+        self.values[key] = value
+        self._file.write(json.dumps({"key": key, "value": value, "x": x}) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def document_key(objective, text):
+    # Canonical hash of the objective and the written document
+    digest = hashlib.sha256()
+    digest.update(f"{objective[0]}:{objective[1]}\n".encode())
+    digest.update(text.encode())
+    return digest.hexdigest()
+
+
+###############################################################################################################
+
+class Calibrator:
+    # Maps parameter vectors to objective values through the cache and a worker pool
+    def __init__(self, base, params, objective, cache, jobs=None, work_root="calibration_work"):
+        self.base = base
+        self.params = params
+        self.objective = objective
+        self.cache = cache
+        self.work_root = os.path.abspath(work_root)
+        jobs = jobs or os.cpu_count() or 1
+        pool = concurrent.futures.ProcessPoolExecutor if objective[0] == "callable" else concurrent.futures.ThreadPoolExecutor
+        self.executor = pool(max_workers=jobs)
+        self.evaluations = 0
+        self.cache_hits = 0
+        self.best = (math.inf, None)
+
+    def clip(self, x):
+        return [min(max(v, p.low), p.high) for v, p in zip(x, self.params)]
+
+    @traced(name="plants_calibrate.evaluate_batch")
+    def evaluate(self, xs):
+        # Objective values for a batch of vectors; identical documents are evaluated once
+        keys = []
+        todo = {}
+        for x in xs:
+            text = plants_io.serialize(apply_parameters(self.base, self.params, x))
+            key = document_key(self.objective, text)
+            keys.append(key)
+            if self.cache.get(key) is None and key not in todo:
+                todo[key] = (x, text)
+        self.cache_hits += len(xs) - len(todo)
+        futures = {self.executor.submit(evaluate_text, self.objective, text, self.work_root, key): key
+                   for key, (x, text) in todo.items()}
+        for future in concurrent.futures.as_completed(futures):
+            key = futures[future]
+            try:
+                value = future.result()
+            except Exception as e:
+                print(f"evaluation failed: {e}", file=sys.stderr)
+                value = math.inf
+            if math.isnan(value):
+                value = math.inf
+            self.cache.put(key, value, todo[key][0])
+            self.evaluations += 1
+        values = [self.cache.get(key) for key in keys]
+        for x, value in zip(xs, values):
+            if value < self.best[0]:
+                self.best = (value, list(x))
+        return values
+
+    def close(self):
+        self.executor.shutdown()
+        self.cache.close()
+
+
+##########################################
+# Optimizers (minimization within the parameter bounds)
+
+def differential_evolution(cal, popsize=15, generations=50, mutation=0.7, crossover=0.9, seed=0, log=print):
+    rng = random.Random(seed)
+    n = len(cal.params)
+    size = max(popsize * n, 5)
+    pop = [[p.low + rng.random() * (p.high - p.low) for p in cal.params] for _ in range(size)]
+    fit = cal.evaluate(pop)
+    for gen in range(generations):
+        trials = []
+        for i in range(size):
+            a, b, c = rng.sample([j for j in range(size) if j != i], 3)
+            forced = rng.randrange(n)
+            trial = [pop[a][k] + mutation * (pop[b][k] - pop[c][k]) if (rng.random() < crossover or k == forced)
+                     else pop[i][k] for k in range(n)]
+            trials.append(cal.clip(trial))
+        trial_fit = cal.evaluate(trials)
+        for i in range(size):
+            if trial_fit[i] <= fit[i]:
+                pop[i], fit[i] = trials[i], trial_fit[i]
+        log(f"generation {gen + 1}/{generations}: best {min(fit):.6g}")
+    best = min(range(size), key=fit.__getitem__)
+    return pop[best], fit[best]
+
+
+def nelder_mead(cal, x0=None, iterations=200, step=0.1, tolerance=1e-8, log=print):
+    # Nelder-Mead in the unit cube of the parameter bounds; the n+1 start points and shrinks run in parallel
+    n = len(cal.params)
+    to_x = lambda u: [p.low + min(max(v, 0.0), 1.0) * (p.high - p.low) for v, p in zip(u, cal.params)]
+    u0 = [0.5] * n if x0 is None else [(v - p.low) / (p.high - p.low) for v, p in zip(x0, cal.params)]
+    simplex = [u0] + [[u + (step if i == k else 0.0) for k, u in enumerate(u0)] for i in range(n)]
+    values = cal.evaluate([to_x(u) for u in simplex])
+    for it in range(iterations):
+        order = sorted(range(n + 1), key=values.__getitem__)
+        simplex = [simplex[i] for i in order]
+        values = [values[i] for i in order]
+        if values[-1] - values[0] <= tolerance:
+            break
+        centroid = [sum(u[k] for u in simplex[:-1]) / n for k in range(n)]
+        worst = simplex[-1]
+        reflect = [c + (c - w) for c, w in zip(centroid, worst)]
+        expand = [c + 2.0 * (c - w) for c, w in zip(centroid, worst)]
+        contract = [c + 0.5 * (w - c) for c, w in zip(centroid, worst)]
+        # Reflection, expansion and contraction are evaluated together as one parallel batch
+        fr, fe, fc = cal.evaluate([to_x(reflect), to_x(expand), to_x(contract)])
+        if fr < values[0] and fe < fr:
+            simplex[-1], values[-1] = expand, fe
+        elif fr < values[-2]:
+            simplex[-1], values[-1] = reflect, fr
+        elif fc < values[-1]:
+            simplex[-1], values[-1] = contract, fc
+        else:
+            best = simplex[0]
+            simplex = [best] + [[b + 0.5 * (u - b) for b, u in zip(best, s)] for s in simplex[1:]]
+            values = [values[0]] + cal.evaluate([to_x(u) for u in simplex[1:]])
+        log(f"iteration {it + 1}/{iterations}: best {min(values):.6g}")
+    best = min(range(n + 1), key=values.__getitem__)
+    return to_x(simplex[best]), values[best]
+
+
+###############################################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate plants.in parameters against observations")
+    parser.add_argument("base", help="base plants.in file")
+    parser.add_argument("params", nargs="+", help="NAME=LOW:HIGH, e.g. AMX=40:90 or tab12.yscale=0.5:2")
+    objective = parser.add_mutually_exclusive_group(required=True)
+    objective.add_argument("--command", help="objective command; prints the misfit as its last number")
+    objective.add_argument("--callable", help="objective as module:function(document, text) -> float")
+    parser.add_argument("--method", choices=["de", "nm"], default="de", help="differential evolution or Nelder-Mead")
+    parser.add_argument("--generations", type=int, default=30, help="DE generations / Nelder-Mead iterations")
+    parser.add_argument("--popsize", type=int, default=10, help="DE population per parameter")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (keep it to resume a run)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="parallel evaluations (default: number of cores)")
+    parser.add_argument("-o", "--out-dir", default="calibration", help="cache, best parameters and best plants.in")
+    args = parser.parse_args(argv)
+
+    base = plants_io.read(args.base)
+    params = [parse_parameter(spec) for spec in args.params]
+    for param in params:
+        param.apply(base.copy(), param.low)  # fail early on unknown names
+    os.makedirs(args.out_dir, exist_ok=True)
+    objective = ("command", args.command) if args.command else ("callable", args.callable)
+    if objective[0] == "callable":
+        sys.path.insert(0, os.getcwd())
+    cache = EvaluationCache(os.path.join(args.out_dir, "evaluations.jsonl"))
+    cal = Calibrator(base, params, objective, cache, args.jobs, os.path.join(args.out_dir, "work"))
+    try:
+        if args.method == "de":
+            x, value = differential_evolution(cal, args.popsize, args.generations, seed=args.seed)
+        else:
+            x, value = nelder_mead(cal, iterations=args.generations)
+    finally:
+        cal.close()
+
+    best = {param.name: v for param, v in zip(params, x)}
+    with open(os.path.join(args.out_dir, "best.json"), "w") as file:
+        json.dump({"objective": value, "parameters": best}, file, indent=2)
+    plants_io.write(apply_parameters(base, params, x), os.path.join(args.out_dir, "plants_best.in"))
+    print(f"best objective {value:.6g} with " + ", ".join(f"{k}={v:.6g}" for k, v in best.items()))
+    print(f"{cal.evaluations} new evaluations, {cal.cache_hits} answered from the cache")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
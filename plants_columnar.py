@@ -0,0 +1,333 @@
+#############################################################################################################
+
+"""
+Description:
+Columnar export and import of plants.in collections, for joining model inputs to outputs in
+pandas or Arrow.
+
+export flattens files, directories (searched for *.in) and archives (.zip/.tar/.pack) into one
+table with a row per configuration:
+    id                      configuration ID (archive member ID, or path relative to the directory)
+    <general setting>       version, flags, start_date, ..., latitude
+    <field>[@N]             plant type fields; plant type 1 without suffix, type N as 'amx@N'
+    tabK[@N].x, tabK[@N].y  the columns of table K as lists of floats
+The parameters RNA_MAX .. SLAID_OFF and the latitude are float columns, the other fields text.
+import turns such a table back into plants.in files (a directory or an archive).
+
+Both directions work in chunks of rows, so collections larger than memory can be converted. The
+format follows the extension:
+    .parquet                Parquet (needs pyarrow)
+    .arrow, .feather        Arrow IPC file (needs pyarrow)
+    .jsonl                  JSON lines, one object per row (pandas.read_json(path, lines=True))
+    .csv                    CSV; table columns hold JSON lists such as "[0.0, 0.25, 1.0]"
+
+Usage:
+    python plants_columnar.py export library/ variants.pack -o inputs.parquet
+    python plants_columnar.py import inputs.parquet -o regenerated.pack
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import plants_archive
+import plants_io
+from plants_transform import iter_library
+
+
+###############################################################################################################
+# Table layout
+
+FLOAT_FIELDS = set(plants_io.PARAMETER_FIELDS) | {"latitude"}
+
+
+def _suffix(plant):
+    return "" if plant == 1 else f"@{plant}"
+
+
+def columns(plant_count):
+    # [(column name, kind)] for documents with plant_count plant types; kind is text, float or list
+    out = [("id", "text")]
+    out += [(key, "float" if key in FLOAT_FIELDS else "text") for key in plants_io.HEADER_FIELDS]
+    for plant in range(1, plant_count + 1):
+        out += [(key + _suffix(plant), "float" if key in FLOAT_FIELDS else "text")
+                for key in plants_io.PLANT_FIELDS]
+        for number in range(1, plants_io.NUM_TABLES + 1):
+            out += [(f"tab{number}{_suffix(plant)}.x", "list"), (f"tab{number}{_suffix(plant)}.y", "list")]
+    return out
+
+
+def _column_kind(name):
+    if name.endswith((".x", ".y")):
+        return "list"
+    return "float" if name.partition("@")[0] in FLOAT_FIELDS else "text"
+
+
+def _number(text):
+    return float(text) if text.strip() else None
+
+
+def document_row(member, doc, plant_count):
+    # Flattens a document into a row dict; plant types beyond the document's own are left empty
+    if len(doc.plants) > plant_count:
+        raise ValueError(f"{len(doc.plants)} plant types, but the table has columns for {plant_count}")
+    row = {"id": member}
+    for key in plants_io.HEADER_FIELDS:
+        row[key] = _number(doc.header[key]) if key in FLOAT_FIELDS else doc.header[key]
+    for plant, plant_type in enumerate(doc.plants, start=1):
+        suffix = _suffix(plant)
+        for key, value in plant_type.fields.items():
+            row[key + suffix] = _number(value) if key in FLOAT_FIELDS else value
+        for number, rows in enumerate(plant_type.tables, start=1):
+            values = plants_io.table_values(rows)
+            row[f"tab{number}{suffix}.x"] = [x for x, _ in values]
+            row[f"tab{number}{suffix}.y"] = [y for _, y in values]
+    return row
+
+
+def row_document(row):
+    # Inverse of document_row: (id, PlantsDocument)
+    header = {key: _text(row.get(key)) for key in plants_io.HEADER_FIELDS}
+    plants = []
+    plant = 1
+    while row.get(f"tab1{_suffix(plant)}.x") is not None:
+        suffix = _suffix(plant)
+        fields = {key: _text(row.get(key + suffix)) for key in plants_io.PLANT_FIELDS}
+        tables = [plants_io.table_from_value(zip(row.get(f"tab{n}{suffix}.x") or [], row.get(f"tab{n}{suffix}.y") or []))
+                  for n in range(1, plants_io.NUM_TABLES + 1)]
+        plants.append(plants_io.PlantType(fields, tables))
+        plant += 1
+    if not plants:
+        raise ValueError(f"row {row.get('id')!r} has no plant type")
+    return str(row["id"]), plants_io.PlantsDocument(header, plants)
+
+
+def _text(value):
+    return "" if value is None else plants_io.format_number(value)
+
+
+###############################################################################################################
+# Formats: writers take chunks of row dicts, readers yield chunks of row dicts
+
+def table_format(path):
+    lower = path.lower()
+    for suffix, kind in ((".parquet", "parquet"), (".arrow", "arrow"), (".feather", "arrow"),
+                         (".jsonl", "jsonl"), (".csv", "csv")):
+        if lower.endswith(suffix):
+            return kind
+    raise ValueError(f"unknown table format for {path} (use .parquet, .arrow, .feather, .jsonl or .csv)")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet and Arrow files need pyarrow (pip install pyarrow); "
+                           "use .jsonl or .csv otherwise") from None
+    return pyarrow
+
+
+class ArrowWriter:
+    def __init__(self, path, column_list, kind):
+        pa = _pyarrow()
+        types = {"text": pa.string(), "float": pa.float64(), "list": pa.list_(pa.float64())}
+        self._pa = pa
+        self._schema = pa.schema([(name, types[column_kind]) for name, column_kind in column_list])
+        if kind == "parquet":
+            self._writer = pa.parquet.ParquetWriter(path, self._schema)
+        else:
+            self._writer = pa.ipc.new_file(path, self._schema)
+
+    def write(self, rows):
+        data = {name: [row.get(name) for row in rows] for name in self._schema.names}
+        self._writer.write_table(self._pa.Table.from_pydict(data, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+class JsonlWriter:
+    def __init__(self, path, column_list):
+        self._file = open(path, "w")
+
+    def write(self, rows):
+        self._file.write("".join(json.dumps(row) + "\n" for row in rows))
+
+    def close(self):
+        self._file.close()
+
+
+class CsvWriter:
+    def __init__(self, path, column_list):
+        self._file = open(path, "w", newline="")
+        self._kinds = dict(column_list)
+        self._writer = csv.DictWriter(self._file, [name for name, _ in column_list])
+        self._writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            self._writer.writerow({name: json.dumps(value) if self._kinds[name] == "list"
+                                   else "" if value is None else value for name, value in row.items()})
+
+    def close(self):
+        self._file.close()
+
+
+def open_writer(path, column_list):
+    kind = table_format(path)
+    if kind in ("parquet", "arrow"):
+        return ArrowWriter(path, column_list, kind)
+    return {"jsonl": JsonlWriter, "csv": CsvWriter}[kind](path, column_list)
+
+
+def iter_row_chunks(path, chunk_rows=1000):
+    # Yields lists of at most chunk_rows row dicts
+    kind = table_format(path)
+    if kind == "parquet":
+        for batch in _pyarrow().parquet.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pylist()
+    elif kind == "arrow":
+        with _pyarrow().memory_map(path) as source:
+            reader = _pyarrow().ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i).to_pylist()
+    else:
+        with open(path, newline="" if kind == "csv" else None) as file:
+            if kind == "csv":
+                rows = (_csv_row(row) for row in csv.DictReader(file))
+            else:
+                rows = (json.loads(line) for line in file if line.strip())
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_rows:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+
+def _csv_row(row):
+    out = {}
+    for name, value in row.items():
+        kind = _column_kind(name)
+        if value == "":
+            out[name] = None
+        elif kind == "list":
+            out[name] = json.loads(value)
+        elif kind == "float":
+            out[name] = float(value)
+        else:
+            out[name] = value
+    return out
+
+
+###############################################################################################################
+# Export and import
+
+def iter_sources(sources):
+    # Yields (ID, text) from plants.in files, directories of them and archives
+    for source in sources:
+        if os.path.isdir(source):
+            for root, path in iter_library([source]):
+                with plants_io.open_file(path) as file:
+                    yield os.path.splitext(plants_io.strip_compression(os.path.relpath(path, root)))[0], file.read()
+        else:
+            try:
+                plants_archive.archive_kind(source)
+            except ValueError:
+                with plants_io.open_file(source) as file:
+                    yield os.path.splitext(plants_io.strip_compression(os.path.basename(source)))[0], file.read()
+                continue
+            yield from plants_archive.iter_members(source)
+
+
+def export(sources, path, chunk_rows=1000, plant_types=None, on_error=None):
+    # Writes the documents of sources to the table file path; returns the number of rows.
+    # The number of plant type columns is plant_types, or that of the first document.
+    writer = None
+    count = 0
+    chunk = []
+    try:
+        for member, text in iter_sources(sources):
+            try:
+                doc = plants_io.parse(text)
+                if writer is None:
+                    plant_types = plant_types or len(doc.plants)
+                    writer = open_writer(path, columns(plant_types))
+                chunk.append(document_row(member, doc, plant_types))
+            except ValueError as e:
+                if on_error is None:
+                    raise
+                on_error(member, e)
+                continue
+            if len(chunk) >= chunk_rows:
+                writer.write(chunk)
+                count += len(chunk)
+                chunk = []
+        if writer is None:
+            writer = open_writer(path, columns(plant_types or 1))
+        if chunk:
+            writer.write(chunk)
+            count += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def iter_documents(path, chunk_rows=1000):
+    # Yields (ID, plants.in text) for every row of a table file
+    for chunk in iter_row_chunks(path, chunk_rows):
+        for row in chunk:
+            member, doc = row_document(row)
+            yield member, plants_io.serialize(doc)
+
+
+def import_table(path, output, chunk_rows=1000):
+    # Regenerates the plants.in files of a table file into a directory or archive; returns the count
+    return plants_archive.write_archive(iter_documents(path, chunk_rows), output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert plants.in collections to and from columnar tables")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="plants.in files -> table")
+    export_parser.add_argument("sources", nargs="+", help="plants.in files, directories or archives")
+    export_parser.add_argument("-o", "--output", required=True, help=".parquet, .arrow, .feather, .jsonl or .csv")
+    export_parser.add_argument("--plant-types", type=int, default=None,
+                               help="plant type columns (default: as in the first file)")
+    export_parser.add_argument("--chunk-rows", type=int, default=1000, help="rows per chunk (default: 1000)")
+    import_parser = commands.add_parser("import", help="table -> plants.in files")
+    import_parser.add_argument("table", help=".parquet, .arrow, .feather, .jsonl or .csv file")
+    import_parser.add_argument("-o", "--output", required=True, help="directory or .zip/.tar/.pack archive")
+    import_parser.add_argument("--chunk-rows", type=int, default=1000, help="rows per chunk (default: 1000)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        if args.command == "export":
+            failed = []
+            count = export(args.sources, args.output, args.chunk_rows, args.plant_types,
+                           on_error=lambda member, e: failed.append(member) or print(f"{member}: {e}", file=sys.stderr))
+            print(f"exported {count} configurations to {args.output} in {time.perf_counter() - start:.2f} s"
+                  + (f", {len(failed)} failed" if failed else ""), file=sys.stderr)
+            return 1 if failed else 0
+        count = import_table(args.table, args.output, args.chunk_rows)
+    except (RuntimeError, ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(f"wrote {count} plants.in files to {args.output} in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
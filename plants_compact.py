@@ -0,0 +1,329 @@
+#############################################################################################################
+
+"""
+Description:
+Compact in-memory representations of plants.in documents for large parameter ensembles.
+
+A PlantsDocument keeps every value as text in dicts and lists, which is convenient for editing but
+costs several kilobytes per document. For sensitivity analyses with 100k+ parameter sets this
+module offers two lighter forms:
+
+- CompactDocument / CompactPlant: slotted records. The parameters RNA_MAX .. SLAID_OFF are float
+  slots, the other plant fields a tuple of text, and the 17 tables one flat array('d') of x, y
+  values with row offsets. table() returns zero-copy memoryviews of the x, y values.
+- Ensemble: N documents with the same number of plant types, stored column-wise. The parameters are
+  one NumPy structured array of shape (N, plant types) with a float64 field per parameter, the text
+  fields are integer codes into lists of distinct values, and each table is one float64 array of
+  rows shared by all members (identical tables are stored once). Members are light views: their
+  tables are read-only slices of the shared arrays, and a parameter column such as
+  ensemble.params["amx"][:, 0] can be assigned directly, e.g. from a sampling plan.
+
+Numbers are kept as floats, so converting back to a PlantsDocument writes them with
+plants_io.format_number (e.g. "75" for "75.0"); the values themselves do not change.
+
+Usage:
+    ensemble = Ensemble.from_base(plants_io.read("plants.in"), 100000)
+    ensemble.params["amx"][:, 0] = numpy.random.uniform(40, 90, 100000)
+    plants_io.write(ensemble[17].to_document(), "member17.in")
+
+    python plants_compact.py plants.in -n 100000     (memory per member of each representation)
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import sys
+import tracemalloc
+from array import array
+
+import numpy as np
+
+import plants_io
+
+
+###############################################################################################################
+
+PARAMETER_FIELDS = plants_io.PARAMETER_FIELDS
+# Plant fields kept as text (names, dates, multi-value lines)
+TEXT_FIELDS = [key for key in plants_io.PLANT_FIELDS if key not in PARAMETER_FIELDS]
+
+
+def _flat_values(rows):
+    return [v for row in plants_io.table_values(rows) for v in row]
+
+
+def _split_key(key):
+    # "amx@2" -> ("amx", 1); "tab12" -> ("tab12", 0); aliases as in plants_io
+    name, _, plant = key.partition("@")
+    name = name.strip().lower()
+    return plants_io.ALIASES.get(name, name), int(plant) - 1 if plant else 0
+
+
+def _table_number(name):
+    if name.startswith("tab") and name[3:].isdigit() and 1 <= int(name[3:]) <= plants_io.NUM_TABLES:
+        return int(name[3:])
+    return None
+
+
+class CompactPlant:
+    # One plant type: parameters as float slots, other fields as text, tables in one flat array('d')
+    __slots__ = tuple(PARAMETER_FIELDS) + ("text", "values", "offsets")
+
+    @classmethod
+    def from_plant(cls, plant):
+        self = cls.__new__(cls)
+        fields = plant.fields
+        for key in PARAMETER_FIELDS:
+            setattr(self, key, float(fields[key]))
+        self.text = tuple(fields[key] for key in TEXT_FIELDS)
+        self.values = array("d")
+        self.offsets = array("l", [0])
+        for rows in plant.tables:
+            self.values.extend(_flat_values(rows))
+            self.offsets.append(len(self.values) // 2)
+        return self
+
+    def table(self, number):
+        # Zero-copy view of table number (1-17) as flat x0, y0, x1, y1, ... values
+        return memoryview(self.values)[2 * self.offsets[number - 1]:2 * self.offsets[number]]
+
+    def to_plant(self):
+        fields = {key: plants_io.format_number(getattr(self, key)) for key in PARAMETER_FIELDS}
+        fields.update(zip(TEXT_FIELDS, self.text))
+        tables = []
+        for number in range(1, plants_io.NUM_TABLES + 1):
+            values = self.table(number)
+            tables.append(plants_io.table_from_value(zip(values[0::2], values[1::2])))
+        return plants_io.PlantType(fields, tables)
+
+
+class CompactDocument:
+    # Slotted counterpart of PlantsDocument: header as a tuple of text in HEADER_FIELDS order
+    __slots__ = ("header", "plants")
+
+    @classmethod
+    def from_document(cls, doc):
+        self = cls.__new__(cls)
+        self.header = tuple(doc.header[key] for key in plants_io.HEADER_FIELDS)
+        self.plants = tuple(CompactPlant.from_plant(plant) for plant in doc.plants)
+        return self
+
+    def get(self, key):
+        name, plant = _split_key(key)
+        if name in plants_io.HEADER_FIELDS:
+            return self.header[plants_io.HEADER_FIELDS.index(name)]
+        if _table_number(name):
+            return self.plants[plant].table(_table_number(name))
+        if name in PARAMETER_FIELDS:
+            return getattr(self.plants[plant], name)
+        return self.plants[plant].text[TEXT_FIELDS.index(name)]
+
+    def to_document(self):
+        return plants_io.PlantsDocument(dict(zip(plants_io.HEADER_FIELDS, self.header)),
+                                        [plant.to_plant() for plant in self.plants])
+
+
+###############################################################################################################
+# Column-wise ensembles
+
+class Ensemble:
+    # N documents with the same number of plant types, stored column-wise:
+    #   params       structured array (N, plant types) with one float64 field per parameter
+    #   header_codes structured array (N,) and text_codes (N, plant types) of int32 codes into
+    #                levels[field], the distinct values of each text field
+    #   tables       per table a (rows, 2) float64 array holding the distinct tables of all members;
+    #                member i, plant type p uses rows starts[k][i, p] : stops[k][i, p]
+    __slots__ = ("params", "header_codes", "text_codes", "levels", "tables", "starts", "stops")
+
+    def __len__(self):
+        return len(self.params)
+
+    def __getitem__(self, index):
+        if not -len(self) <= index < len(self):
+            raise IndexError("ensemble member out of range")
+        return EnsembleMember(self, index % len(self))
+
+    def __iter__(self):
+        return (EnsembleMember(self, i) for i in range(len(self)))
+
+    @property
+    def plant_count(self):
+        return self.params.shape[1]
+
+    @property
+    def nbytes(self):
+        arrays = [self.params, self.header_codes, self.text_codes] + self.tables + self.starts + self.stops
+        return sum(a.nbytes for a in arrays)
+
+    ##########################################
+
+    @classmethod
+    def from_documents(cls, docs):
+        # Builds an ensemble from PlantsDocuments (or CompactDocuments) in one pass
+        levels = {key: {} for key in plants_io.HEADER_FIELDS + TEXT_FIELDS}
+        header_codes, text_codes, params = [], [], []
+        chunks = [[] for _ in range(plants_io.NUM_TABLES)]
+        lengths = [0] * plants_io.NUM_TABLES
+        seen = [{} for _ in range(plants_io.NUM_TABLES)]
+        spans = [[] for _ in range(plants_io.NUM_TABLES)]
+        plant_count = None
+
+        def code(field, value):
+            return levels[field].setdefault(value, len(levels[field]))
+
+        for doc in docs:
+            if isinstance(doc, CompactDocument):
+                doc = doc.to_document()
+            if plant_count is None:
+                plant_count = len(doc.plants)
+            elif len(doc.plants) != plant_count:
+                raise ValueError(f"all members need {plant_count} plant type(s), got {len(doc.plants)}")
+            header_codes.append(tuple(code(key, doc.header[key]) for key in plants_io.HEADER_FIELDS))
+            member_params, member_text = [], []
+            for p, plant in enumerate(doc.plants):
+                fields = plant.fields
+                member_params.append(tuple(float(fields[key]) for key in PARAMETER_FIELDS))
+                member_text.append(tuple(code(key, fields[key]) for key in TEXT_FIELDS))
+                for k, rows in enumerate(plant.tables):
+                    values = np.array(plants_io.table_values(rows), dtype=float).reshape(-1, 2)
+                    blob = values.tobytes()
+                    if blob not in seen[k]:
+                        seen[k][blob] = (lengths[k], lengths[k] + len(values))
+                        chunks[k].append(values)
+                        lengths[k] += len(values)
+                    spans[k].append(seen[k][blob])
+            params.append(member_params)
+            text_codes.append(member_text)
+        if plant_count is None:
+            raise ValueError("an ensemble needs at least one document")
+
+        self = cls.__new__(cls)
+        self.params = np.array(params, dtype=[(key, "f8") for key in PARAMETER_FIELDS])
+        self.header_codes = np.array(header_codes, dtype=[(key, "i4") for key in plants_io.HEADER_FIELDS])
+        self.text_codes = np.array(text_codes, dtype=[(key, "i4") for key in TEXT_FIELDS])
+        self.levels = {field: list(values) for field, values in levels.items()}
+        self.tables = [np.concatenate(chunk) if chunk else np.empty((0, 2)) for chunk in chunks]
+        shape = (len(params), plant_count)
+        self.starts = [np.array([s for s, _ in span], dtype=np.int32).reshape(shape) for span in spans]
+        self.stops = [np.array([e for _, e in span], dtype=np.int32).reshape(shape) for span in spans]
+        return self
+
+    @classmethod
+    def from_base(cls, doc, size):
+        # size copies of one document; all members share its text and tables
+        single = cls.from_documents([doc])
+        self = cls.__new__(cls)
+        self.params = np.repeat(single.params, size, axis=0)
+        self.header_codes = np.repeat(single.header_codes, size, axis=0)
+        self.text_codes = np.repeat(single.text_codes, size, axis=0)
+        self.levels = single.levels
+        self.tables = single.tables
+        self.starts = [np.repeat(a, size, axis=0) for a in single.starts]
+        self.stops = [np.repeat(a, size, axis=0) for a in single.stops]
+        return self
+
+    ##########################################
+
+    def table(self, index, number, plant=1):
+        # Read-only zero-copy view of table number (1-17) of a member, shape (rows, 2)
+        k = number - 1
+        view = self.tables[k][self.starts[k][index, plant - 1]:self.stops[k][index, plant - 1]]
+        view.flags.writeable = False
+        return view
+
+    def text(self, index, field, plant=1):
+        if field in plants_io.HEADER_FIELDS:
+            return self.levels[field][self.header_codes[field][index]]
+        return self.levels[field][self.text_codes[field][index, plant - 1]]
+
+    def to_document(self, index):
+        header = {key: self.text(index, key) for key in plants_io.HEADER_FIELDS}
+        plants = []
+        for p in range(1, self.plant_count + 1):
+            fields = {key: plants_io.format_number(float(self.params[key][index, p - 1]))
+                      for key in PARAMETER_FIELDS}
+            fields.update((key, self.text(index, key, p)) for key in TEXT_FIELDS)
+            tables = [plants_io.table_from_value(self.table(index, number, p).tolist())
+                      for number in range(1, plants_io.NUM_TABLES + 1)]
+            plants.append(plants_io.PlantType(fields, tables))
+        return plants_io.PlantsDocument(header, plants)
+
+
+class EnsembleMember:
+    # View of one ensemble member; holds no data of its own
+    __slots__ = ("ensemble", "index")
+
+    def __init__(self, ensemble, index):
+        self.ensemble = ensemble
+        self.index = index
+
+    def get(self, key):
+        # Field value ("amx", "tempstart@2", "latitude") or table view ("tab12", "tab13@2")
+        name, plant = _split_key(key)
+        if not 0 <= plant < self.ensemble.plant_count:
+            raise KeyError(f"{key}: the ensemble has {self.ensemble.plant_count} plant type(s)")
+        if _table_number(name):
+            return self.ensemble.table(self.index, _table_number(name), plant + 1)
+        if name in PARAMETER_FIELDS:
+            return float(self.ensemble.params[name][self.index, plant])
+        if name in self.ensemble.levels:
+            return self.ensemble.text(self.index, name, plant + 1)
+        raise KeyError(f"unknown field: {key}")
+
+    def table(self, number, plant=1):
+        return self.ensemble.table(self.index, number, plant)
+
+    def to_document(self):
+        return self.ensemble.to_document(self.index)
+
+
+###############################################################################################################
+
+def _measure(build):
+    tracemalloc.start()
+    try:
+        result = build()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the memory used per ensemble member")
+    parser.add_argument("file", help="plants.in file used for every member")
+    parser.add_argument("-n", "--size", type=int, default=10000, help="number of members (default: 10000)")
+    args = parser.parse_args(argv)
+
+    doc = plants_io.read(args.file)
+    for plant in doc.plants:
+        plant.fields  # parse every block before measuring
+    rng = np.random.default_rng(0)
+    samples = rng.uniform(40, 90, args.size)
+    sample_count = min(args.size, 500)  # the per-document forms are measured on a sample
+
+    def documents():
+        docs = [doc.copy() for _ in range(sample_count)]
+        for d, value in zip(docs, samples):
+            d.set("amx", float(value))
+        return docs
+
+    def compact():
+        return [CompactDocument.from_document(d) for d in documents()]
+
+    def ensemble():
+        result = Ensemble.from_base(doc, args.size)
+        result.params["amx"][:, 0] = samples
+        return result
+
+    _, docs_bytes = _measure(documents)
+    _, compact_bytes = _measure(compact)
+    _, ensemble_bytes = _measure(ensemble)
+    print(f"PlantsDocument:  {docs_bytes / sample_count:10.0f} bytes per member")
+    print(f"CompactDocument: {compact_bytes / sample_count:10.0f} bytes per member")
+    print(f"Ensemble:        {ensemble_bytes / args.size:10.0f} bytes per member ({args.size} members)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
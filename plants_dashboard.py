@@ -0,0 +1,519 @@
+#############################################################################################################
+
+"""
+Description:
+Parameter distribution dashboard over a library of plants.in files ("Library" tab of the editor).
+
+A worker thread reads every *.in file below a directory and adds it to running aggregates in chunks:
+- each scalar parameter (RNA_MAX .. SLAID_OFF and the latitude; all plant types pooled) is kept as a
+  NumPy column, from which histograms and quantiles are computed;
+- each of the 17 tables is interpolated onto a common grid of x values and folded into a running
+  envelope (minimum, maximum and mean curve). Outside its own x range a table keeps its end value,
+  as in AgroC's interpolation, so the grid can grow when files with wider ranges arrive (the
+  aggregates are then resampled onto the wider grid, which is exact at the edges and approximate
+  between grid points).
+Tables with the same x values are interpolated together as one matrix product. The GUI thread only
+receives small snapshots of the aggregates, so it never waits for the scan. New files anywhere
+below the directory are picked up as they appear; when a file already read is changed or removed,
+the aggregates are rebuilt on the next scan. Files are read through plants_cache, so a library opens
+much faster the second time.
+
+The histogram of the selected parameter marks where the open document sits; the envelope plots
+draw the document's table over the library's band.
+
+Usage:
+    Editor: File > Open Library...
+    python plants_dashboard.py library/          (summary of the scalar parameters)
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QListWidget,
+                             QSplitter, QFileDialog, QApplication)
+from PyQt5.QtCore import Qt, QThread, QTimer, QFileSystemWatcher, QPointF, pyqtSignal
+from PyQt5.QtGui import QPainter, QColor, QPen, QPolygonF
+
+import plants_cache
+import plants_io
+from plants_transform import iter_library
+
+
+###############################################################################################################
+# Aggregates (no Qt)
+
+SCALAR_FIELDS = ["latitude"] + plants_io.PARAMETER_FIELDS
+
+
+def _float(text):
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+def load_arrays(path, cache=None):
+    # (header, [(fields, [17 flat x, y arrays])]) of a file, from the parse cache when available
+    if cache is not None:
+        return cache.load_arrays(path)
+    doc = plants_io.read(path, use_cache=False)
+    return doc.header, [(plant.fields, [np.array(plants_io.table_values(rows), dtype=float).ravel()
+                                        for rows in plant.tables]) for plant in doc.plants]
+
+
+class TableEnvelope:
+    # Running minimum, maximum and mean of many piecewise-linear curves on a common x grid
+    def __init__(self, size=64):
+        self.size = size
+        self.grid = None
+        self.lo = self.hi = self.total = None
+        self.count = 0
+
+    def _extend(self, xmin, xmax):
+        if self.grid is None:
+            self.grid = np.linspace(xmin, xmax if xmax > xmin else xmin + 1.0, self.size)
+            self.lo = np.full(self.size, np.inf)
+            self.hi = np.full(self.size, -np.inf)
+            self.total = np.zeros(self.size)
+            return
+        if xmin >= self.grid[0] and xmax <= self.grid[-1]:
+            return
+        grid = np.linspace(min(xmin, self.grid[0]), max(xmax, self.grid[-1]), self.size)
+        # The curves seen so far hold their end values beyond the old grid, and so do the aggregates
+        self.lo, self.hi, self.total = (np.interp(grid, self.grid, a) for a in (self.lo, self.hi, self.total))
+        self.grid = grid
+
+    def _weights(self, x):
+        # Matrix W with y @ W == np.interp(grid, x, y) for every y on the same x values
+        return np.stack([np.interp(self.grid, x, column) for column in np.eye(len(x))])
+
+    def add(self, curves):
+        # curves: flat x0, y0, x1, y1, ... arrays (None or empty ones are skipped). Curves are grouped
+        # by their x values without converting them one by one.
+        groups = {}
+        for flat in curves:
+            if flat is not None and len(flat) >= 2:
+                groups.setdefault(memoryview(flat)[0::2].tobytes(), []).append(flat)
+        if not groups:
+            return
+        stacked = []
+        for members in groups.values():
+            data = np.concatenate([np.frombuffer(flat, dtype=float) for flat in members]).reshape(len(members), -1, 2)
+            x, ys = data[0, :, 0], data[:, :, 1]
+            if np.any(np.diff(x) < 0):
+                order = np.argsort(x, kind="stable")
+                x, ys = x[order], ys[:, order]
+            stacked.append((x, ys))
+        self._extend(min(x[0] for x, _ in stacked), max(x[-1] for x, _ in stacked))
+        for x, ys in stacked:
+            values = ys @ self._weights(x)
+            self.lo = np.minimum(self.lo, values.min(axis=0))
+            self.hi = np.maximum(self.hi, values.max(axis=0))
+            self.total += values.sum(axis=0)
+            self.count += len(ys)
+
+    def snapshot(self):
+        if not self.count:
+            return None
+        return {"x": self.grid.copy(), "lo": self.lo.copy(), "hi": self.hi.copy(),
+                "mean": self.total / self.count, "count": self.count}
+
+
+class LibraryStats:
+    # Aggregates over a growing set of files; add_files() takes the output of load_arrays()
+    def __init__(self, grid_size=64):
+        self.files = 0
+        self.failed = 0
+        self._chunks = {field: [] for field in SCALAR_FIELDS}
+        self._values = {}
+        self.envelopes = [TableEnvelope(grid_size) for _ in range(plants_io.NUM_TABLES)]
+
+    def add_files(self, items):
+        columns = {field: [] for field in SCALAR_FIELDS}
+        curves = [[] for _ in range(plants_io.NUM_TABLES)]
+        for header, plants in items:
+            for fields, arrays in plants:
+                columns["latitude"].append(_float(header["latitude"]))
+                for field in plants_io.PARAMETER_FIELDS:
+                    columns[field].append(_float(fields[field]))
+                for k, flat in enumerate(arrays):
+                    curves[k].append(flat)
+        for field, values in columns.items():
+            self._chunks[field].append(np.array(values, dtype=float))
+        self._values = {}
+        for envelope, table_curves in zip(self.envelopes, curves):
+            envelope.add(table_curves)
+        self.files += len(items)
+
+    def values(self, field):
+        if field not in self._values:
+            values = np.concatenate(self._chunks[field]) if self._chunks[field] else np.empty(0)
+            self._values[field] = values[np.isfinite(values)]
+        return self._values[field]
+
+    def summary(self, field, bins=30):
+        values = self.values(field)
+        if not len(values):
+            return None
+        low, high = values.min(), values.max()
+        counts, edges = np.histogram(values, bins=bins, range=(low, high) if high > low else (low - 0.5, low + 0.5))
+        p5, p50, p95 = np.percentile(values, [5, 50, 95])
+        return {"count": len(values), "min": low, "max": high, "p5": p5, "median": p50, "p95": p95,
+                "counts": counts, "edges": edges}
+
+    def snapshot(self):
+        # Small, self-contained copy of the aggregates for the GUI thread
+        return {"files": self.files, "failed": self.failed,
+                "fields": {field: self.summary(field) for field in SCALAR_FIELDS},
+                "tables": [envelope.snapshot() for envelope in self.envelopes]}
+
+
+def percentile_of(summary, value):
+    # Approximate share of the library below value, from the histogram
+    counts, edges = summary["counts"], summary["edges"]
+    if value <= edges[0]:
+        return 0.0
+    if value >= edges[-1]:
+        return 100.0
+    i = min(int(np.searchsorted(edges, value, side="right")) - 1, len(counts) - 1)
+    below = counts[:i].sum() + counts[i] * (value - edges[i]) / (edges[i + 1] - edges[i])
+    return 100.0 * below / counts.sum()
+
+
+###############################################################################################################
+# Worker thread
+
+class LibraryScanner(QThread):
+    # Reads new files below a directory into LibraryStats and emits snapshots
+    updated = pyqtSignal(object)
+    directories_found = pyqtSignal(list)
+
+    def __init__(self, directory, chunk_size=256, interval=0.25, parent=None):
+        super().__init__(parent)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self.stats = LibraryStats()
+        self.seen = {}  # path -> (mtime_ns, size) when it was read
+        self.scanning = False
+        self._wake = threading.Event()
+        self._stopped = False
+
+    def rescan(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+        self.wait()
+
+    def run(self):
+        cache = plants_cache.default_cache()
+        while not self._stopped:
+            self._wake.clear()
+            self.scan(cache)
+            self._wake.wait()
+
+    def emit_snapshot(self):
+        snapshot = self.stats.snapshot()
+        snapshot["scanning"] = self.scanning
+        self.updated.emit(snapshot)
+
+    def listing(self):
+        # ([directories], {path: (mtime_ns, size)}) of the *.in files below the directory
+        directories, files = [], {}
+        for root, _, names in os.walk(self.directory):
+            directories.append(root)
+            for name in names:
+                if plants_io.strip_compression(name).endswith(".in"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files[path] = (stat.st_mtime_ns, stat.st_size)
+        return directories, files
+
+    def scan(self, cache):
+        self.scanning = True
+        directories, files = self.listing()
+        self.directories_found.emit(directories)
+        if any(files.get(path) != key for path, key in self.seen.items()):
+            # A file already aggregated was rewritten or removed; its values cannot be taken out of
+            # the running aggregates, so they are rebuilt (cheaply, from the parse cache)
+            self.stats = LibraryStats()
+            self.seen = {}
+        batch = []
+        last = time.perf_counter()
+        for path, key in files.items():
+            if self._stopped:
+                return
+            if self.seen.get(path) == key:
+                continue
+            self.seen[path] = key
+            try:
+                batch.append(load_arrays(path, cache))
+            except (OSError, ValueError, UnicodeDecodeError):
+                self.stats.failed += 1
+            if len(batch) >= self.chunk_size:
+                self.stats.add_files(batch)
+                batch = []
+                if time.perf_counter() - last > self.interval:
+                    self.emit_snapshot()
+                    last = time.perf_counter()
+        if batch:
+            self.stats.add_files(batch)
+        self.scanning = False
+        self.emit_snapshot()
+
+
+###############################################################################################################
+# Views
+
+class PlotView(QWidget):
+    # Histogram with a marker, or table envelope with the document's curve
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(220)
+        self.histogram = None
+        self.envelope = None
+        self.marker = None
+        self.curve = None
+
+    def show_histogram(self, summary, marker):
+        self.histogram, self.envelope, self.marker, self.curve = summary, None, marker, None
+        self.update()
+
+    def show_envelope(self, envelope, curve):
+        self.histogram, self.envelope, self.marker, self.curve = None, envelope, None, curve
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        left, top = 50, 10
+        width, height = self.width() - left - 10, self.height() - top - 25
+        if width <= 0 or height <= 0:
+            return
+        if self.histogram is not None:
+            self.paint_histogram(painter, left, top, width, height)
+        elif self.envelope is not None:
+            self.paint_envelope(painter, left, top, width, height)
+        else:
+            painter.drawText(self.rect(), Qt.AlignCenter, "No data")
+
+    def paint_histogram(self, painter, left, top, width, height):
+        counts, edges = self.histogram["counts"], self.histogram["edges"]
+        peak = max(int(counts.max()), 1)
+        bar = width / len(counts)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(100, 140, 200))
+        for i, count in enumerate(counts):
+            h = height * count / peak
+            painter.drawRect(int(left + i * bar), int(top + height - h), max(int(bar) - 1, 1), int(h))
+        painter.setPen(Qt.black)
+        painter.drawText(left, top + height + 18, f"{edges[0]:.4g}")
+        painter.drawText(left + width - 60, top + height + 18, f"{edges[-1]:.4g}")
+        painter.drawText(5, top + 12, str(peak))
+        if self.marker is not None and np.isfinite(self.marker):
+            span = edges[-1] - edges[0]
+            x = left + width * min(max((self.marker - edges[0]) / span, 0.0), 1.0)
+            painter.setPen(QPen(QColor(200, 40, 40), 2))
+            painter.drawLine(int(x), top, int(x), top + height)
+
+    def paint_envelope(self, painter, left, top, width, height):
+        x, lo, hi, mean = self.envelope["x"], self.envelope["lo"], self.envelope["hi"], self.envelope["mean"]
+        curve = self.curve if self.curve is not None and len(self.curve) else None
+        ys = [lo, hi] + ([curve[:, 1]] if curve is not None else [])
+        xs = [x] + ([curve[:, 0]] if curve is not None else [])
+        x0, x1 = min(a.min() for a in xs), max(a.max() for a in xs)
+        y0, y1 = min(a.min() for a in ys), max(a.max() for a in ys)
+        x1 = x1 if x1 > x0 else x0 + 1.0
+        y1 = y1 if y1 > y0 else y0 + 1.0
+
+        def point(px, py):
+            return QPointF(left + width * (px - x0) / (x1 - x0), top + height * (1.0 - (py - y0) / (y1 - y0)))
+
+        band = [point(a, b) for a, b in zip(x, hi)] + [point(a, b) for a, b in zip(x[::-1], lo[::-1])]
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(100, 140, 200, 90))
+        painter.drawPolygon(QPolygonF(band))
+        painter.setBrush(Qt.NoBrush)
+        painter.setPen(QPen(QColor(60, 90, 160), 1.5))
+        painter.drawPolyline(QPolygonF([point(a, b) for a, b in zip(x, mean)]))
+        if curve is not None:
+            painter.setPen(QPen(QColor(200, 40, 40), 2))
+            painter.drawPolyline(QPolygonF([point(a, b) for a, b in curve]))
+        painter.setPen(Qt.black)
+        painter.drawText(left, top + height + 18, f"{x0:.4g}")
+        painter.drawText(left + width - 60, top + height + 18, f"{x1:.4g}")
+        painter.drawText(5, top + 12, f"{y1:.3g}")
+        painter.drawText(5, top + height, f"{y0:.3g}")
+
+
+class DashboardPanel(QWidget):
+    # Library tab: file count, parameter list with the document's percentile, and the selected plot
+
+    def __init__(self, current_document, parent=None):
+        # current_document: callable returning (PlantsDocument, plant index) of the open document
+        super().__init__(parent)
+        self.current_document = current_document
+        self.scanner = None
+        self.snapshot = None
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(lambda _: self.rescan_timer.start())
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.setSingleShot(True)
+        self.rescan_timer.setInterval(500)
+        self.rescan_timer.timeout.connect(self.rescan)
+
+        layout = QVBoxLayout(self)
+        top = QHBoxLayout()
+        open_button = QPushButton("Open Library...")
+        open_button.clicked.connect(self.open_dialog)
+        top.addWidget(open_button)
+        self.path_label = QLabel("No library open")
+        top.addWidget(self.path_label, 1)
+        self.status_label = QLabel()
+        top.addWidget(self.status_label)
+        layout.addLayout(top)
+
+        splitter = QSplitter(Qt.Horizontal)
+        self.item_list = QListWidget()
+        self.item_list.setMaximumWidth(360)
+        for field in SCALAR_FIELDS:
+            self.item_list.addItem(field.upper())
+        for number, header in enumerate(plants_io.TABLE_HEADERS, start=1):
+            self.item_list.addItem(f"Tab.{number}: {header}")
+        self.item_list.currentRowChanged.connect(self.show_selected)
+        splitter.addWidget(self.item_list)
+        right = QWidget()
+        right_layout = QVBoxLayout(right)
+        self.plot = PlotView()
+        right_layout.addWidget(self.plot, 1)
+        self.detail_label = QLabel()
+        self.detail_label.setWordWrap(True)
+        right_layout.addWidget(self.detail_label)
+        splitter.addWidget(right)
+        layout.addWidget(splitter, 1)
+        self.item_list.setCurrentRow(0)
+        QApplication.instance().aboutToQuit.connect(self.stop)
+
+    ##########################################
+
+    def open_dialog(self):
+        directory = QFileDialog.getExistingDirectory(self, "Open Configuration Library")
+        if directory:
+            self.open_library(directory)
+
+    def open_library(self, directory):
+        self.stop()
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        self.watcher.addPath(directory)
+        self.path_label.setText(directory)
+        self.snapshot = None
+        self.scanner = LibraryScanner(directory, parent=self)
+        self.scanner.updated.connect(self.update_snapshot)
+        self.scanner.directories_found.connect(self.watch_directories)
+        self.status_label.setText("scanning...")
+        self.scanner.start()
+
+    def rescan(self):
+        if self.scanner is not None:
+            self.scanner.rescan()
+
+    def watch_directories(self, directories):
+        # Subdirectories found by the scanner are watched too, so files added below them are seen
+        new = set(directories) - set(self.watcher.directories())
+        if new:
+            self.watcher.addPaths(sorted(new))
+
+    def stop(self):
+        if self.scanner is not None:
+            self.scanner.updated.disconnect(self.update_snapshot)
+            self.scanner.directories_found.disconnect(self.watch_directories)
+            self.scanner.stop()
+            self.scanner = None
+
+    def update_snapshot(self, snapshot):
+        self.snapshot = snapshot
+        state = "scanning..." if snapshot["scanning"] else "up to date"
+        failed = f", {snapshot['failed']} unreadable" if snapshot["failed"] else ""
+        self.status_label.setText(f"{snapshot['files']} files{failed}, {state}")
+        self.show_selected(self.item_list.currentRow())
+
+    def showEvent(self, event):
+        # The open document may have been edited while another tab was shown
+        super().showEvent(event)
+        self.show_selected(self.item_list.currentRow())
+
+    ##########################################
+
+    def show_selected(self, row):
+        if row < 0:
+            return
+        doc, plant_index = self.current_document()
+        plant = doc.plants[plant_index]
+        if row < len(SCALAR_FIELDS):
+            field = SCALAR_FIELDS[row]
+            value = _float(doc.header[field] if field in plants_io.HEADER_FIELDS else plant.fields[field])
+            summary = self.snapshot["fields"][field] if self.snapshot else None
+            self.plot.show_histogram(summary, value)
+            if summary is None:
+                self.detail_label.setText(f"{field.upper()}: {value:g} (no library data)")
+                return
+            self.detail_label.setText(
+                f"{field.upper()} = {value:g} in the open document: {percentile_of(summary, value):.0f}th percentile "
+                f"of {summary['count']} values (min {summary['min']:.4g}, 5% {summary['p5']:.4g}, "
+                f"median {summary['median']:.4g}, 95% {summary['p95']:.4g}, max {summary['max']:.4g})")
+        else:
+            number = row - len(SCALAR_FIELDS) + 1
+            envelope = self.snapshot["tables"][number - 1] if self.snapshot else None
+            curve = np.array(plants_io.table_values(plant.tables[number - 1]), dtype=float).reshape(-1, 2)
+            self.plot.show_envelope(envelope, curve)
+            self.detail_label.setText(
+                f"Tab.{number}: band = minimum to maximum over {envelope['count']} tables, line = mean, "
+                f"red = open document" if envelope else f"Tab.{number}: no library data")
+
+
+###############################################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the parameter distributions of a plants.in library")
+    parser.add_argument("directory", help="directory searched for *.in files")
+    args = parser.parse_args(argv)
+
+    stats = LibraryStats()
+    cache = plants_cache.default_cache()
+    start = time.perf_counter()
+    batch = []
+    for _, path in iter_library([args.directory]):
+        try:
+            batch.append(load_arrays(path, cache))
+        except (OSError, ValueError, UnicodeDecodeError):
+            stats.failed += 1
+        if len(batch) >= 256:
+            stats.add_files(batch)
+            batch = []
+    if batch:
+        stats.add_files(batch)
+    print(f"{stats.files} files ({stats.failed} unreadable) in {time.perf_counter() - start:.2f} s")
+    print(f"{'parameter':<12}{'count':>8}{'min':>12}{'5%':>12}{'median':>12}{'95%':>12}{'max':>12}")
+    for field in SCALAR_FIELDS:
+        s = stats.summary(field)
+        if s is not None:
+            print(f"{field.upper():<12}{s['count']:>8}{s['min']:>12.4g}{s['p5']:>12.4g}{s['median']:>12.4g}"
+                  f"{s['p95']:>12.4g}{s['max']:>12.4g}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
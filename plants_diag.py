@@ -0,0 +1,224 @@
+#############################################################################################################
+
+"""
+Description:
+Memory diagnostics for long editing sessions of the AgroC plants.in editor.
+
+Three measures are sampled together: the resident set size of the process, the Python heap as seen
+by tracemalloc, and the live Qt objects by class. Qt objects are counted by walking the object
+trees of the top-level widgets (layouts, actions, timers and other children included); table
+cells are counted as QTableWidgetItem although they are not QObjects. A sample is cheap enough to
+be taken every few seconds, so a growing curve over a working day shows which class leaks.
+
+The editor has a Debug > Memory Diagnostics... window with the current counts, the top allocating
+source lines and the samples so far. With --diag [PATH] (or AGROC_DIAG=PATH) tracemalloc runs from
+the start, a sample is taken every 10 seconds and the samples are written as JSON lines at exit.
+The soak mode of bench_gui.py uses the same measures to fail when memory keeps growing.
+
+Usage:
+    python plants_gui.py --diag agroc_diag.jsonl
+
+    import plants_diag
+    diag = plants_diag.Diagnostics()
+    diag.sample()
+    print(plants_diag.format_counts(diag.samples[-1]["qt_objects"]))
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import atexit
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+
+###############################################################################################################
+
+ENV_VAR = "AGROC_DIAG"
+SAMPLE_INTERVAL_MS = 10000
+
+
+def rss_bytes():
+    # Current resident set size; falls back to the peak RSS where /proc is unavailable
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def qt_object_counts(app=None):
+    # {class name: live count} for the object trees of the application and its top-level widgets
+    from PyQt5.QtWidgets import QApplication, QTableWidget
+    app = app or QApplication.instance()
+    counts = {}
+    if app is None:
+        return counts
+    seen = {}  # id -> wrapper; holding the wrappers keeps their ids from being reused during the walk
+    stack = [app] + app.topLevelWidgets()
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen[id(obj)] = obj
+        name = obj.metaObject().className()
+        counts[name] = counts.get(name, 0) + 1
+        if isinstance(obj, QTableWidget):
+            items = sum(obj.item(row, col) is not None
+                        for row in range(obj.rowCount()) for col in range(obj.columnCount()))
+            counts["QTableWidgetItem"] = counts.get("QTableWidgetItem", 0) + items
+        stack += obj.children()
+    return counts
+
+
+def count_growth(before, after):
+    # [(class name, change)] of the classes whose count changed, largest growth first
+    names = set(before) | set(after)
+    changes = [(name, after.get(name, 0) - before.get(name, 0)) for name in names]
+    return sorted((change for change in changes if change[1]), key=lambda change: (-change[1], change[0]))
+
+
+def top_allocators(limit=10, group_by="lineno", baseline=None):
+    # [(source line, size in bytes, count)] of the largest live allocations (or of the growth
+    # since a baseline snapshot); empty while tracemalloc is off
+    if not tracemalloc.is_tracing():
+        return []
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    if baseline is not None:
+        stats = [(stat.traceback, stat.size_diff, stat.count_diff)
+                 for stat in snapshot.compare_to(baseline, group_by) if stat.size_diff > 0]
+    else:
+        stats = [(stat.traceback, stat.size, stat.count) for stat in snapshot.statistics(group_by)]
+    return [(f"{trace[0].filename}:{trace[0].lineno}", size, count) for trace, size, count in stats[:limit]]
+
+
+def format_counts(counts, limit=25):
+    rows = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    width = max([len("class")] + [len(name) for name, _ in rows])
+    return "\n".join([f"{'class':<{width}}  {'count':>8}"] + [f"{name:<{width}}  {count:>8}" for name, count in rows])
+
+
+def format_allocators(rows):
+    if not rows:
+        return "tracemalloc is not running"
+    return "\n".join([f"{'KiB':>10}  {'blocks':>8}  source line"] +
+                     [f"{size / 1024:>10.1f}  {count:>8}  {line}" for line, size, count in rows])
+
+
+##########################################
+
+class Diagnostics:
+    # Samples of RSS, Python heap and Qt object counts over the life of the process
+    def __init__(self, path=None):
+        self.path = path
+        self.samples = []
+        self.t0 = time.perf_counter()
+        self.baseline = None
+        self.timer = None
+
+    def start_tracing(self, frames=1):
+        # Python allocations are only seen from this call on
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.baseline = tracemalloc.take_snapshot()
+
+    def sample(self):
+        heap, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+        counts = qt_object_counts()
+        entry = {"seconds": round(time.perf_counter() - self.t0, 3), "rss_bytes": rss_bytes(),
+                 "heap_bytes": heap, "heap_peak_bytes": peak,
+                 "qt_total": sum(counts.values()), "qt_objects": counts}
+        self.samples.append(entry)
+        return entry
+
+    def start(self, interval_ms=SAMPLE_INTERVAL_MS):
+        # Samples periodically on the Qt event loop (needs a QApplication)
+        from PyQt5.QtCore import QTimer
+        if self.timer is None:
+            self.timer = QTimer()
+            self.timer.timeout.connect(self.sample)
+        self.timer.start(interval_ms)
+
+    def report(self, limit=15):
+        # Text report: the latest sample, its class counts, the changes since the first sample and
+        # the source lines that allocated most since tracing started
+        if not self.samples:
+            self.sample()
+        first, last = self.samples[0], self.samples[-1]
+        lines = [f"{len(self.samples)} samples over {last['seconds']:.0f} s",
+                 f"RSS:         {last['rss_bytes'] / 1048576:.1f} MiB "
+                 f"({(last['rss_bytes'] - first['rss_bytes']) / 1024:+.0f} KiB)"]
+        if last["heap_bytes"] is not None:
+            start = first["heap_bytes"] if first["heap_bytes"] is not None else last["heap_bytes"]
+            lines.append(f"Python heap: {last['heap_bytes'] / 1048576:.1f} MiB "
+                         f"({(last['heap_bytes'] - start) / 1024:+.0f} KiB, peak {last['heap_peak_bytes'] / 1048576:.1f} MiB)")
+        lines += [f"Qt objects:  {last['qt_total']} ({last['qt_total'] - first['qt_total']:+d})", "",
+                  format_counts(last["qt_objects"], limit)]
+        growth = count_growth(first["qt_objects"], last["qt_objects"])
+        if growth:
+            lines += ["", "Changed since the first sample:"] + [f"  {name}: {change:+d}" for name, change in growth[:limit]]
+        lines += ["", "Top allocations since tracing started:" if self.baseline is not None else "Top allocations:",
+                  format_allocators(top_allocators(limit, baseline=self.baseline))]
+        return "\n".join(lines)
+
+    def write(self, path=None):
+        with open(path or self.path, "w") as file:
+            for entry in self.samples:
+                file.write(json.dumps(entry) + "\n")
+
+
+_diagnostics = None
+
+
+def diagnostics():
+    # The process-wide Diagnostics, created on first use
+    global _diagnostics
+    if _diagnostics is None:
+        _diagnostics = Diagnostics()
+    return _diagnostics
+
+
+def enable(path=None):
+    # Traces allocations from now on and writes the samples to path (if given) at exit; periodic
+    # sampling is started with diagnostics().start() once the QApplication exists
+    diag = diagnostics()
+    diag.path = path
+    diag.start_tracing()
+    atexit.register(_flush_at_exit)
+    return diag
+
+
+def enable_from_argv(argv):
+    # Strip a "--diag [PATH]" option from argv (in place), or read AGROC_DIAG, and enable diagnostics
+    path = os.environ.get(ENV_VAR)
+    found = bool(path)
+    for i, arg in enumerate(argv):
+        if arg == "--diag":
+            path = argv.pop(i + 1) if i + 1 < len(argv) and not argv[i + 1].startswith("-") else None
+            argv.pop(i)
+            found = True
+            break
+        if arg.startswith("--diag="):
+            path = argv.pop(i).split("=", 1)[1] or None
+            found = True
+            break
+    if found:
+        enable(None if path in (None, "1", "true", "yes") else path)
+    return found
+
+
+def _flush_at_exit():
+    diag = diagnostics()
+    diag.sample()
+    if diag.path:
+        diag.write()
+        print(f"Memory samples written to {diag.path}", file=sys.stderr)
+    print(diag.report(), file=sys.stderr)
+
+#####################################################################################################################
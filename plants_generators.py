@@ -0,0 +1,245 @@
+#############################################################################################################
+
+"""
+Description:
+Lookup tables generated from analytic curves.
+
+Several tables of plants.in follow known functional forms. A generator fills a table from a curve
+with a few shape parameters, sampled at a chosen number of rows over a chosen x range:
+
+    exponential   y = y_min + (y0 - y_min) * exp(-k * x)
+                  root density against relative root depth (Tab.12)
+    beta          y = y_max * [(T - t_min) / (t_opt - t_min) * ((t_max - T) / (t_max - t_opt)) ** a] ** c,
+                  a = (t_max - t_opt) / (t_opt - t_min), 0 outside t_min .. t_max
+                  temperature response with a single optimum (Tab.2-4)
+    cardinal      y rises linearly from 0 at t_min to y_max at t_opt_low, stays there until
+                  t_opt_high and falls to 0 at t_max (Tab.2-4)
+
+Curves are evaluated with NumPy over all rows at once. A parameter can also be an array of values,
+so a whole family of tables is computed in one call (one table per row of the result). The editor
+uses the generators in the Generate... dialog of the Tabular Data tab, plants_transform.py in its
+"generate" transform. Run from the command line, this module writes a family of plants.in files
+with one table taken from every combination of the given parameter values.
+
+Usage:
+    python plants_generators.py --list
+    python plants_generators.py plants.in exponential --table tab12 --vary k=2:10:9 --rows 21 -o roots.pack
+    python plants_generators.py plants.in beta --table tab2 --vary t_opt=18,20,22 c=0.5,1 -o variants/
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import itertools
+import sys
+import time
+
+import numpy as np
+
+import plants_archive
+import plants_io
+from plants_template import PlantsTemplate
+
+
+###############################################################################################################
+# Curves: x is an array of n points; a parameter is a number or an array of m values (one per table)
+
+def exponential(x, y0, k, y_min):
+    return y_min + (y0 - y_min) * np.exp(-k * x)
+
+
+def beta(x, t_min, t_opt, t_max, c, y_max):
+    if np.any(t_opt <= t_min) or np.any(t_max <= t_opt):
+        raise ValueError("beta needs t_min < t_opt < t_max")
+    inside = (x > t_min) & (x < t_max)
+    rise = np.clip((x - t_min) / (t_opt - t_min), 0.0, None)
+    fall = np.clip((t_max - x) / (t_max - t_opt), 0.0, None)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        y = (rise * fall ** ((t_max - t_opt) / (t_opt - t_min))) ** c
+    return np.where(inside, y_max * y, 0.0)
+
+
+def cardinal(x, t_min, t_opt_low, t_opt_high, t_max, y_max):
+    if np.any(t_opt_low <= t_min) or np.any(t_opt_high < t_opt_low) or np.any(t_max <= t_opt_high):
+        raise ValueError("cardinal needs t_min < t_opt_low <= t_opt_high < t_max")
+    rise = (x - t_min) / (t_opt_low - t_min)
+    fall = (t_max - x) / (t_max - t_opt_high)
+    return y_max * np.clip(np.minimum(np.minimum(rise, fall), 1.0), 0.0, None)
+
+
+class Generator:
+    __slots__ = ("name", "function", "params", "x_range", "rows", "tables", "description")
+
+    def __init__(self, name, function, params, x_range, rows, tables, description):
+        self.name = name
+        self.function = function
+        self.params = params  # {parameter: default value}, in the order of the function arguments
+        self.x_range = x_range
+        self.rows = rows
+        self.tables = tables  # table numbers (1-based) the curve is meant for
+        self.description = description
+
+
+# Defaults reproduce the tables of the bundled plants.in approximately
+GENERATORS = {generator.name: generator for generator in (
+    Generator("exponential", exponential, {"y0": 0.4568, "k": 6.12, "y_min": 0.0}, (0.0, 1.0), 11, (12,),
+              "exponential decay, e.g. root density against relative root depth"),
+    Generator("beta", beta, {"t_min": 0.0, "t_opt": 20.0, "t_max": 32.0, "c": 1.0, "y_max": 1.0},
+              (-10.0, 40.0), 26, (2, 3, 4),
+              "beta temperature response with one optimum"),
+    Generator("cardinal", cardinal, {"t_min": 0.0, "t_opt_low": 15.0, "t_opt_high": 25.0, "t_max": 35.0,
+                                     "y_max": 1.0},
+              (-10.0, 40.0), 26, (2, 3, 4),
+              "cardinal temperatures: linear rise, plateau, linear fall"),
+)}
+
+
+def generator_for_table(number):
+    # The first generator meant for a table number, or None
+    return next((generator for generator in GENERATORS.values() if number in generator.tables), None)
+
+
+##########################################
+
+def _generator(name):
+    if name not in GENERATORS:
+        raise ValueError(f"unknown generator {name!r}; choose from {', '.join(GENERATORS)}")
+    return GENERATORS[name]
+
+
+def sample(name, params=None, x_range=None, rows=None):
+    # (x of shape (n,), y of shape (n,) or (m, n)); array-valued parameters give one row of y per value
+    generator = _generator(name)
+    values = dict(generator.params)
+    for key, value in (params or {}).items():
+        if key not in values:
+            raise ValueError(f"{name} has no parameter {key!r}; parameters: {', '.join(values)}")
+        values[key] = value
+    rows = rows or generator.rows
+    if rows < 2:
+        raise ValueError("a generated table needs at least 2 rows")
+    x_start, x_stop = x_range or generator.x_range
+    x = np.linspace(float(x_start), float(x_stop), rows)
+    arrays = {key: np.asarray(value, dtype=float) for key, value in values.items()}
+    arrays = {key: value[:, None] if value.ndim == 1 else value for key, value in arrays.items()}
+    y = generator.function(x, **arrays)
+    return x, np.broadcast_to(y, np.broadcast(y, x).shape)
+
+
+def _format_column(values, digits=6):
+    # One %-format call per column is much faster than formatting the numbers one by one
+    return ((f"%.{digits}g " * len(values)) % tuple(values.tolist())).split()
+
+
+def format_rows(x, y, digits=6):
+    # Text rows of a table; digits significant digits keep generated tables readable
+    return [list(row) for row in zip(_format_column(x, digits), _format_column(y, digits))]
+
+
+def generate(name, params=None, x_range=None, rows=None, digits=6):
+    # Text rows of one generated table
+    x, y = sample(name, params, x_range, rows)
+    if y.ndim != 1:
+        raise ValueError("generate() makes one table; use family() for array-valued parameters")
+    return format_rows(x, y, digits)
+
+
+def family(name, grid, x_range=None, rows=None, digits=6):
+    # Iterator of (parameter values, text rows) for every combination of the values in grid
+    # {parameter: [values]}; all tables are computed at once (bad parameters raise here), then
+    # formatted one at a time as the iterator is consumed
+    keys = list(grid)
+    combinations = list(itertools.product(*(list(np.atleast_1d(grid[key])) for key in keys)))
+    columns = np.array(combinations, dtype=float).reshape(len(combinations), len(keys))
+    x, y = sample(name, {key: columns[:, i] for i, key in enumerate(keys)}, x_range, rows)
+    y = np.broadcast_to(y, (len(combinations), len(x)))
+    xs = _format_column(x, digits)
+    return ((dict(zip(keys, map(float, combination))), [list(row) for row in zip(xs, _format_column(table, digits))])
+            for combination, table in zip(combinations, y))
+
+
+def parse_values(spec):
+    # "k=4,6,8" -> ("k", [4, 6, 8]); "k=2:10:5" -> ("k", 5 values from 2 to 10)
+    key, _, text = spec.partition("=")
+    if not key or not text:
+        raise ValueError(f"expected NAME=VALUES, got {spec!r}")
+    if ":" in text:
+        parts = text.split(":")
+        if len(parts) != 3:
+            raise ValueError(f"a range is START:STOP:COUNT, got {text!r}")
+        return key.strip(), np.linspace(float(parts[0]), float(parts[1]), int(parts[2])).tolist()
+    return key.strip(), [float(value) for value in text.split(",")]
+
+
+###############################################################################################################
+# Families of plants.in files
+
+def _value_text(value):
+    # Short text for a parameter value that still tells close values apart (1 and 1.000001)
+    text = f"{value:g}"
+    return text if float(text) == value else repr(value)
+
+
+def _variant_name(name, params):
+    return name + "".join(f"_{key}{_value_text(value)}" for key, value in params.items())
+
+
+def iter_family(doc, table, name, grid, x_range=None, rows=None, digits=6):
+    # Iterator of (ID, plants.in text) with table replaced by every member of the family; raises
+    # before anything is generated if two members would get the same ID
+    members = family(name, grid, x_range, rows, digits)
+    keys = list(grid)
+    names = [_variant_name(name, dict(zip(keys, map(float, combination))))
+             for combination in itertools.product(*(list(np.atleast_1d(grid[key])) for key in keys))]
+    seen, duplicates = set(), set()
+    for member in names:
+        (duplicates if member in seen else seen).add(member)
+    if duplicates:
+        raise ValueError(f"repeated parameter values give duplicate IDs: {', '.join(sorted(duplicates)[:5])}")
+    template = PlantsTemplate(doc, [table])
+    return ((member, template.render({table: table_rows})) for member, (_, table_rows) in zip(names, members))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate lookup tables from analytic curves")
+    parser.add_argument("base", nargs="?", help="base plants.in file")
+    parser.add_argument("generator", nargs="?", help=f"one of {', '.join(GENERATORS)}")
+    parser.add_argument("--table", help="table to replace, e.g. tab12 or tab2@2 (default: the generator's first table)")
+    parser.add_argument("--vary", nargs="+", default=[], metavar="NAME=VALUES",
+                        help="parameter values, as a list (k=4,6,8) or a range (k=2:10:5)")
+    parser.add_argument("--x", nargs=2, type=float, metavar=("START", "STOP"), help="x range of the table")
+    parser.add_argument("--rows", type=int, default=None, help="number of table rows")
+    parser.add_argument("--digits", type=int, default=6, help="significant digits of the written values")
+    parser.add_argument("-o", "--output", default="generated",
+                        help="output directory, or an archive (.zip, .tar, .tar.gz, .pack)")
+    parser.add_argument("--list", action="store_true", help="list the generators and their default parameters")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for generator in GENERATORS.values():
+            params = ", ".join(f"{key}={value:g}" for key, value in generator.params.items())
+            print(f"{generator.name:12} Tab.{'/'.join(map(str, generator.tables))}: {generator.description}")
+            print(f"{'':12} {params}; x {generator.x_range[0]:g} .. {generator.x_range[1]:g}, "
+                  f"{generator.rows} rows")
+        return 0
+    if not args.base or not args.generator:
+        parser.error("a base file and a generator are required")
+
+    start = time.perf_counter()
+    try:
+        generator = _generator(args.generator)
+        grid = dict(parse_values(spec) for spec in args.vary)
+        table = args.table or f"tab{generator.tables[0]}"
+        doc = plants_io.read(args.base)
+        variants = iter_family(doc, table, generator.name, grid, args.x, args.rows, args.digits)
+        count = plants_archive.write_archive(variants, args.output)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(f"Wrote {count} variants to {args.output} in {time.perf_counter() - start:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
@@ -21,13 +21,59 @@ import os
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QFormLayout, QLineEdit, QCheckBox, QDateEdit, QSpinBox, QComboBox,
                              QPushButton, QFileDialog, QMessageBox, QScrollArea, QLabel,
-                             QTableWidget, QTableWidgetItem, QTabWidget, QListWidget)
-from PyQt5.QtCore import Qt, QDate
+                             QTableWidget, QTableWidgetItem, QTabWidget, QListWidget,
+                             QInputDialog, QShortcut, QTabBar, QAction, QDialog, QPlainTextEdit,
+                             QDoubleSpinBox, QStackedWidget, QDialogButtonBox)
+from PyQt5.QtCore import Qt, QDate, QSettings
+from PyQt5.QtGui import QKeySequence, QFontDatabase
 from PyQt5.QtWidgets import QTableWidget, QTableWidgetItem
 
+import plants_diag
+import plants_io
+import plants_overlay
+import plants_scenarios
+import plants_trace
+from plants_plot import TablePlot
+from plants_run_panel import RunPanel
+from plants_trace import traced
+
 
 ###############################################################################################################
 
+def parse_clipboard_table(text):
+    # Split spreadsheet text into rows of cells in one pass. Excel separates cells with tabs;
+    # other sources use spaces. Decimal commas (e.g. from a German Excel) are turned into points.
+    rows = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if "\t" in line:
+            cells = [cell.strip().replace(",", ".") for cell in line.split("\t")]
+        else:
+            cells = line.replace(";", " ").split()
+        rows.append(cells)
+    return rows
+
+
+class OpenDocument:
+    # A document open in the editor with its scenario branches; inactive documents exist only in
+    # this headless form. 'doc' is the snapshot of the current branch; 'base' is the base file of a
+    # document opened from (or saved as) an overlay.
+    __slots__ = ("path", "scenarios", "base")
+
+    def __init__(self, path, doc, base=None):
+        self.path = path
+        self.scenarios = plants_scenarios.ScenarioSet(doc)
+        self.base = base
+
+    @property
+    def doc(self):
+        return self.scenarios.document()
+
+    @doc.setter
+    def doc(self, value):
+        self.scenarios.commit(value)
+
 
 class AgroCInputEditor(QMainWindow):
 # Main class for the AgroC Plants.in Input Editor
@@ -46,9 +92,31 @@ class AgroCInputEditor(QMainWindow):
         self.tab_widget = QTabWidget()
         self.tab_widget.addTab(self.central_widget, "General Settings")
         self.tab_widget.addTab(self.create_tabular_data(), "Tabular Data")
-        self.setCentralWidget(self.tab_widget)
+        self.run_panel = RunPanel(lambda: plants_io.serialize(self.document_from_widgets()))
+        self.tab_widget.addTab(self.run_panel, "Run")
         self.create_buttons()
 
+        # Several documents can be open; only the active one is bound to the widgets above,
+        # the others are kept as headless PlantsDocuments
+        self.documents = []
+        self.active_document = -1
+        self.dashboard = None
+        self.diagnostics_window = None
+        self.document_bar = QTabBar()
+        self.document_bar.setTabsClosable(True)
+        self.document_bar.setExpanding(False)
+        self.document_bar.currentChanged.connect(self.switch_document)
+        self.document_bar.tabCloseRequested.connect(self.close_document)
+        main_widget = QWidget()
+        main_layout = QVBoxLayout(main_widget)
+        main_layout.setContentsMargins(0, 0, 0, 0)
+        main_layout.addWidget(self.document_bar)
+        main_layout.addLayout(self.create_scenario_bar())
+        main_layout.addWidget(self.tab_widget)
+        self.setCentralWidget(main_widget)
+        self.create_menus()
+        self.setAcceptDrops(True)
+
         self.default_file = "plants.in"
         self.modified_file = "plants_mod.in"
         
@@ -59,6 +127,7 @@ class AgroCInputEditor(QMainWindow):
     ##########################################
     # Create the form layout for user input
 
+    @traced
     def create_form(self):
         # Scroll area to accommodate all input fields dynamically
         scroll = QScrollArea()
@@ -67,7 +136,7 @@ class AgroCInputEditor(QMainWindow):
 
         # General Settings
         self.version_input = QLineEdit()
-        self.form_layout.addRow("Software Version:", self.version_input)
+        self.form_layout.addRow(plants_io.FIELD_LABELS["version"] + ":", self.version_input)
 
         # Boolean settings
         self.bool_settings = {
@@ -84,164 +153,46 @@ class AgroCInputEditor(QMainWindow):
             self.form_layout.addRow(label, checkbox)
 
         self.daily_timestep = QCheckBox()
-        self.form_layout.addRow("Daily Timestep Enabled:", self.daily_timestep)
+        self.form_layout.addRow(plants_io.FIELD_LABELS["daily_timestep"] + ":", self.daily_timestep)
 
         self.start_date = QDateEdit()
         self.start_date.setDisplayFormat("yyyy-MM-dd")
-        self.form_layout.addRow("Simulation Start Date:", self.start_date)
+        self.form_layout.addRow(plants_io.FIELD_LABELS["start_date"] + ":", self.start_date)
 
         self.num_plant_types = QSpinBox()
         self.num_plant_types.setMinimum(1)
-        self.form_layout.addRow("Number of Plant Types:", self.num_plant_types)
+        self.num_plant_types.valueChanged.connect(self.set_plant_type_count)
+        self.form_layout.addRow(plants_io.FIELD_LABELS["num_plant_types"] + ":", self.num_plant_types)
 
         self.unit_soilco2 = QComboBox()
         self.unit_soilco2.addItems(["mm", "cm", "dm", "m", "km"])
-        self.form_layout.addRow("Soil CO2 Measurement Unit:", self.unit_soilco2)
+        self.form_layout.addRow(plants_io.FIELD_LABELS["unit_soilco2"] + ":", self.unit_soilco2)
 
         self.interception_model = QComboBox()
         self.interception_model.addItems(["Bormann", "Hoyningen-Huene"])
-        self.form_layout.addRow("Rainfall Interception Model:", self.interception_model)
+        self.form_layout.addRow(plants_io.FIELD_LABELS["interception_model"] + ":", self.interception_model)
 
         self.latitude = QLineEdit()
-        self.form_layout.addRow("Site Latitude (degrees):", self.latitude)
-
-        # Plant Type 1 Settings
-        self.form_layout.addRow(QLabel("Plant Type 1 Settings"))
-
-        self.plant_type_name = QLineEdit()
-        self.form_layout.addRow("Plant Type Name:", self.plant_type_name)
-
-        self.table_rows = QLineEdit()
-        self.form_layout.addRow("number of rows in the 17 tables:", self.table_rows)
-
-        self.planting_dates = QLineEdit()
-        self.form_layout.addRow("Planting/Emergence and Harvest Dates:", self.planting_dates)
-
-        self.num_parameters = QLineEdit()
-        self.form_layout.addRow("Number of Parameters:", self.num_parameters)
-
-        self.kc_calculation = QLineEdit()
-        self.form_layout.addRow("Kc Calculation Method:", self.kc_calculation)
-
-        self.senescence = QLineEdit()
-        self.form_layout.addRow("Senescence Start and End (DOY):", self.senescence)
-
-        self.p_values = QLineEdit()
-        self.form_layout.addRow("P Values (mm):", self.p_values)
-
-        self.ceres_temperatures = QLineEdit()
-        self.form_layout.addRow("CERES Temperatures (C):", self.ceres_temperatures)
-
-        self.ceres_photoperiod = QLineEdit()
-        self.form_layout.addRow("CERES Photoperiod:", self.ceres_photoperiod)
-
-        self.ceres_max_dev_rate = QLineEdit()
-        self.form_layout.addRow("CERES Max Development Rate:", self.ceres_max_dev_rate)
-
-        # Additional fields
-        self.rna_max = QLineEdit()
-        self.form_layout.addRow("RNA_MAX - Max Root Depth Without Water Uptake (mm):", self.rna_max)
-        self.rna_max.setToolTip("Maximum depth above which no root water uptake is considered in the model.")
-
-        self.root_max = QLineEdit()
-        self.form_layout.addRow("ROOT_MAX - Maximum Rooting Depth (mm):", self.root_max)
-        self.root_max.setToolTip("The deepest extent of the root zone from which the plant can uptake water.")
-
-        self.root_init = QLineEdit()
-        self.form_layout.addRow("ROOT_INIT - Initial Rooting Depth (mm):", self.root_init)
-        self.root_init.setToolTip("Initial depth of the plant's roots at the beginning of the simulation.")
-
-        self.exu_fact = QLineEdit()
-        self.form_layout.addRow("EXU_FACT - Root Exudation Factor:", self.exu_fact)
-        self.exu_fact.setToolTip("Factor controlling the rate of root exudation, affecting soil chemistry and microbe interactions.")
-
-        self.deathfacmax = QLineEdit()
-        self.form_layout.addRow("DEATHFACMAX - Maximum Death Factor:", self.deathfacmax)
-        self.deathfacmax.setToolTip("Controls the maximum rate of plant death due to various stress factors.")
-
-        self.nsl = QLineEdit()
-        self.form_layout.addRow("NSL - Number of Seedlings per m²:", self.nsl)
-        self.nsl.setToolTip("Specifies the density of seedlings planted per square meter.")
-
-        self.rgr = QLineEdit()
-        self.form_layout.addRow("RGR - Relative Growth Rate (ha/ha/C/day):", self.rgr)
-        self.rgr.setToolTip("The rate at which the plant's growth area increases relative to the temperature.")
-
-        self.tempbase = QLineEdit()
-        self.form_layout.addRow("TEMPBASE - Base Temperature for Growth (°C):", self.tempbase)
-        self.tempbase.setToolTip("The lowest temperature at which the plant begins to grow.")
-
-        self.sla = QLineEdit()
-        self.form_layout.addRow("SLA - Specific Leaf Area (ha leaf/kg DM):", self.sla)
-        self.sla.setToolTip("Area of leaves produced per kilogram of dry matter.")
-
-        self.rsla = QLineEdit()
-        self.form_layout.addRow("RSLA - Rate of Change in Specific Leaf Area (ha leaf/kg DM/°C/day):", self.rsla)
-        self.rsla.setToolTip("Change in specific leaf area per unit of thermal time.")
-
-        self.amx = QLineEdit()
-        self.form_layout.addRow("AMX - Max Assimilation Rate (kg CO2/ha leaf/h):", self.amx)
-        self.amx.setToolTip("Maximum rate at which the plant can assimilate carbon dioxide under ideal conditions.")
-
-        self.eff = QLineEdit()
-        self.form_layout.addRow("EFF - Initial Light Use Efficiency (kg CO2/ha leaf/h)/(J/m²/s):", self.eff)
-        self.eff.setToolTip("Efficiency with which the plant converts absorbed light into stored energy via photosynthesis.")
-
-        self.rkdf = QLineEdit()
-        self.form_layout.addRow("RKDF - Diffuse Light Extinction Coefficient:", self.rkdf)
-        self.rkdf.setToolTip("Coefficient that determines how much light is lost due to diffusion within the canopy.")
-
-        self.scp = QLineEdit()
-        self.form_layout.addRow("SCP - Scattering Coefficient for PAR (Photosynthetically Active Radiation):", self.scp)
-        self.scp.setToolTip("Determines the fraction of PAR that is scattered by leaves in the canopy.")
-
-        self.rmainso = QLineEdit()
-        self.form_layout.addRow("RMAINSO - Maintenance Respiration Rate of Storage Organs (kg CH₂O/kg DM/day):", self.rmainso)
-        self.rmainso.setToolTip("Rate at which storage organs respire, consuming sugars to maintain living tissues.")
-
-        self.asrqso = QLineEdit()
-        self.form_layout.addRow("ASRQSO - Assimilation Requirement for Storage Organs (kg CH₂O/kg DM):", self.asrqso)
-        self.asrqso.setToolTip("Amount of carbohydrates required to produce a kilogram of dry matter in storage organs.")
-
-        self.tempstart = QLineEdit()
-        self.form_layout.addRow("TEMPSTART - Start Temperature for Plant Growth (°C*day):", self.tempstart)
-        self.tempstart.setToolTip("Cumulative temperature from emergence until growth begins in spring.")
-
-        self.debr_fac = QLineEdit()
-        self.form_layout.addRow("DEBR_FAC - Dead Leaf Debris Factor:", self.debr_fac)
-        self.debr_fac.setToolTip("Factor that determines the rate at which dead leaves are added to soil organic matter.")
-
-        self.ls = QLineEdit()
-        self.form_layout.addRow("LS - Leaf Area Index Switch from Temperature to Radiation Limitation (ha/ha):", self.ls)
-        self.ls.setToolTip("Leaf area index at which growth switches from being temperature-limited to radiation-limited.")
-
-        self.rlaicr = QLineEdit()
-        self.form_layout.addRow("RLAICR - Critical Leaf Area Index for Self-Shading (ha/ha):", self.rlaicr)
-        self.rlaicr.setToolTip("Leaf area index beyond which leaves begin to shade each other, affecting photosynthesis.")
-
-        self.eai = QLineEdit()
-        self.form_layout.addRow("EAI - Ear Area Index (2-sided) at Emergence:", self.eai)
-        self.eai.setToolTip("Index measuring the area of ears (grain-bearing part of the plant) relative to ground area at emergence.")
-
-        self.rmatr = QLineEdit()
-        self.form_layout.addRow("RMATR - Maturity Class at Emergence:", self.rmatr)
-        self.rmatr.setToolTip("Maturity classification of the crop at emergence, affecting growth and development stages.")
-
-        self.ssl = QLineEdit()
-        self.form_layout.addRow("SSL - Specific Seedling Leaf Area (m² leaf/seedling):", self.ssl)
-        self.ssl.setToolTip("Leaf area of a single seedling, important for early growth stage modeling.")
-
-        self.srw = QLineEdit()
-        self.form_layout.addRow("SRW - Specific Root Weight (m/g):", self.srw)
-        self.srw.setToolTip("Mass of roots per meter, used to calculate the total biomass of roots.")
-
-        self.slaid_off = QLineEdit()
-        self.form_layout.addRow("SLAID_OFF - Seasonal Leaf Area Index Decline (ha/ha):", self.slaid_off)
-        self.slaid_off.setToolTip("Reduction in leaf area index after the growing season ends, reflecting leaf drop and senescence.")
-
-        self.emergence_harvest_dates = QLineEdit()
-        self.form_layout.addRow("Emergence and Harvest Dates:", self.emergence_harvest_dates)
-        self.emergence_harvest_dates.setToolTip("Specific dates for plant emergence and harvest, critical for seasonal management.")
+        self.form_layout.addRow(plants_io.FIELD_LABELS["latitude"] + ":", self.latitude)
+
+        # Plant type settings; the selector chooses which plant type the form and tables show
+        self.plant_type_selector = QComboBox()
+        self.plant_type_selector.currentIndexChanged.connect(self.switch_plant_type)
+        self.form_layout.addRow("Edit Plant Type:", self.plant_type_selector)
+        self.plant_type_label = QLabel("Plant Type 1 Settings")
+        self.form_layout.addRow(self.plant_type_label)
+
+        # Plant type fields; the labels and tooltips are defined in plants_io, where the HTML reports
+        # (plants_report.py) take them from as well
+        for key in plants_io.PLANT_FIELDS:
+            widget = QLineEdit()
+            setattr(self, key, widget)
+            self.form_layout.addRow(plants_io.FIELD_LABELS[key] + ":", widget)
+            if key in plants_io.FIELD_DESCRIPTIONS:
+                widget.setToolTip(plants_io.FIELD_DESCRIPTIONS[key])
+            if key == "plant_type_name":
+                self.table_rows = QLineEdit()
+                self.form_layout.addRow("number of rows in the 17 tables:", self.table_rows)
 
 
         scroll.setWidget(form_widget)
@@ -262,119 +213,378 @@ class AgroCInputEditor(QMainWindow):
         button_layout.addWidget(save_button)
         self.layout.addLayout(button_layout)
 
+    ##########################################
+    # Menus and multi-document handling
+
+    def create_menus(self):
+        file_menu = self.menuBar().addMenu("&File")
+        open_action = QAction("&Open...", self)
+        open_action.setShortcut(QKeySequence.Open)
+        open_action.triggered.connect(self.open_dialog)
+        file_menu.addAction(open_action)
+        self.recent_menu = file_menu.addMenu("Open &Recent")
+        self.recent_menu.aboutToShow.connect(self.fill_recent_menu)
+        library_action = QAction("Open &Library...", self)
+        library_action.triggered.connect(self.open_library_dialog)
+        file_menu.addAction(library_action)
+        save_as_action = QAction("Save &As...", self)
+        save_as_action.setShortcut(QKeySequence.SaveAs)
+        save_as_action.triggered.connect(self.save_as_dialog)
+        file_menu.addAction(save_as_action)
+        close_action = QAction("&Close Document", self)
+        close_action.setShortcut(QKeySequence.Close)
+        close_action.triggered.connect(lambda: self.close_document(self.active_document))
+        file_menu.addAction(close_action)
+        debug_menu = self.menuBar().addMenu("&Debug")
+        diagnostics_action = QAction("&Memory Diagnostics...", self)
+        diagnostics_action.triggered.connect(self.show_diagnostics)
+        debug_menu.addAction(diagnostics_action)
+
+    def show_diagnostics(self):
+        # Non-modal window with RSS, Python heap, live Qt objects by class and the top allocators
+        if self.diagnostics_window is None:
+            window = QDialog(self)
+            window.setWindowTitle("Memory Diagnostics")
+            window.resize(700, 600)
+            layout = QVBoxLayout(window)
+            self.diagnostics_text = QPlainTextEdit()
+            self.diagnostics_text.setReadOnly(True)
+            self.diagnostics_text.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+            layout.addWidget(self.diagnostics_text)
+            buttons = QHBoxLayout()
+            refresh_button = QPushButton("Refresh")
+            refresh_button.clicked.connect(self.refresh_diagnostics)
+            self.trace_button = QPushButton("Trace Python Allocations")
+            self.trace_button.setToolTip("Record which source lines allocate memory from now on (slows the editor down).")
+            self.trace_button.clicked.connect(lambda: (plants_diag.diagnostics().start_tracing(),
+                                                       self.refresh_diagnostics()))
+            buttons.addWidget(refresh_button)
+            buttons.addWidget(self.trace_button)
+            layout.addLayout(buttons)
+            self.diagnostics_window = window
+        self.refresh_diagnostics()
+        self.diagnostics_window.show()
+        self.diagnostics_window.raise_()
+
+    def refresh_diagnostics(self):
+        diag = plants_diag.diagnostics()
+        diag.sample()
+        self.trace_button.setEnabled(diag.baseline is None)
+        self.diagnostics_text.setPlainText(diag.report())
+
+    def open_dialog(self):
+        filenames, _ = QFileDialog.getOpenFileNames(self, "Open plants.in Files", "",
+                                                    "AgroC plant input (*.in *.in.gz *.in.xz *.in.zst *.overlay);;All files (*)")
+        for filename in filenames:
+            self.open_document(filename)
+
+    def open_library_dialog(self):
+        directory = QFileDialog.getExistingDirectory(self, "Open Configuration Library")
+        if directory:
+            self.open_library(directory)
+
+    def open_library(self, directory):
+        # Shows the parameter distributions of a directory of plants.in files in a "Library" tab
+        if self.dashboard is None:
+            import plants_dashboard  # needs NumPy, which the editor itself does not
+            self.dashboard = plants_dashboard.DashboardPanel(lambda: (self.document_from_widgets(), self.plant_index))
+            self.tab_widget.addTab(self.dashboard, "Library")
+        self.dashboard.open_library(directory)
+        self.tab_widget.setCurrentWidget(self.dashboard)
+
+    def save_as_dialog(self):
+        filename, _ = QFileDialog.getSaveFileName(self, "Save plants.in As", "",
+                                                  "AgroC plant input (*.in);;Compressed plant input (*.in.gz *.in.xz *.in.zst);;"
+                                                  "Overlay on a base file (*.overlay);;"
+                                                  "All files (*)")
+        if filename:
+            if plants_overlay.is_overlay(filename):
+                if not self.save_overlay(filename):
+                    return
+            else:
+                self.generate_plants_in(filename)
+            self.documents[self.active_document].path = filename
+            self.document_bar.setTabText(self.active_document, os.path.basename(filename))
+            self.document_bar.setTabToolTip(self.active_document, os.path.abspath(filename))
+            self.setWindowTitle(f"AgroC Plants.in Input Editor - {os.path.basename(filename)}")
+            self.add_recent_file(filename)
+
+    def save_overlay(self, filename):
+        # Saves only the differences of the active document from its base file; documents that were
+        # not opened from an overlay ask for the base (by default the file they were opened from)
+        document = self.documents[self.active_document]
+        base = document.base
+        if base is None:
+            base, _ = QFileDialog.getOpenFileName(self, "Choose the Base plants.in", document.path,
+                                                  "AgroC plant input (*.in);;All files (*)")
+            if not base:
+                return False
+        try:
+            base_doc = plants_overlay.default_resolver().base(base)
+            plants_overlay.make_overlay(base_doc, self.document_from_widgets(), os.path.abspath(base)).save(filename)
+        except Exception as e:
+            QMessageBox.critical(self, "Error Saving Overlay", f"{filename} could not be saved: {str(e)}")
+            return False
+        document.base = base
+        print(f"File saved successfully: {filename}")
+        return True
+
+    def open_document(self, filename):
+        # Opens a file as a new document and makes it the active one
+        try:
+            if plants_overlay.is_overlay(filename):
+                overlay = plants_overlay.Overlay.load(filename)
+                base, doc = overlay.base_path(), plants_overlay.default_resolver().resolve(overlay)
+            else:
+                base, doc = None, plants_io.read(filename)
+        except Exception as e:
+            QMessageBox.critical(self, "Error Opening File", f"{filename} could not be opened: {str(e)}")
+            return False
+        self.documents.append(OpenDocument(filename, doc, base))
+        index = self.document_bar.addTab(os.path.basename(filename))
+        self.document_bar.setTabToolTip(index, os.path.abspath(filename))
+        self.document_bar.setCurrentIndex(index)
+        self.switch_document(index)
+        self.add_recent_file(filename)
+        return True
+
+    def switch_document(self, index):
+        # Keeps the widget state of the active document and rebinds the widgets to another one
+        if index < 0 or index >= len(self.documents) or index == self.active_document:
+            return
+        if 0 <= self.active_document < len(self.documents):
+            self.documents[self.active_document].doc = self.document_from_widgets()
+        self.active_document = index
+        self.bind_document(self.documents[index].doc)
+        self.update_scenario_selector()
+        self.update_compare_selector()
+        self.setWindowTitle(f"AgroC Plants.in Input Editor - {os.path.basename(self.documents[index].path)}")
+
+    def close_document(self, index):
+        # Unsaved edits of a closed document are dropped; the last document stays open
+        if len(self.documents) <= 1 or not 0 <= index < len(self.documents):
+            return
+        del self.documents[index]
+        if index < self.active_document:
+            self.active_document -= 1
+        elif index == self.active_document:
+            self.active_document = -1
+        self.document_bar.removeTab(index)
+        if self.active_document == -1:
+            self.switch_document(self.document_bar.currentIndex())
+        self.update_compare_selector()
+
+    ##########################################
+    # Scenario branches of the active document
+
+    def create_scenario_bar(self):
+        scenario_layout = QHBoxLayout()
+        scenario_layout.addWidget(QLabel("Scenario:"))
+        self.scenario_selector = QComboBox()
+        self.scenario_selector.setMinimumWidth(160)
+        self.scenario_selector.currentIndexChanged.connect(self.switch_scenario)
+        scenario_layout.addWidget(self.scenario_selector)
+        for label, slot in (("Fork...", self.fork_scenario), ("Compare...", self.compare_scenarios),
+                            ("Delete", self.delete_scenario), ("Save All...", self.save_scenarios)):
+            button = QPushButton(label)
+            button.clicked.connect(slot)
+            scenario_layout.addWidget(button)
+        scenario_layout.addStretch()
+        return scenario_layout
+
+    def update_scenario_selector(self):
+        scenarios = self.documents[self.active_document].scenarios
+        self.scenario_selector.blockSignals(True)
+        self.scenario_selector.clear()
+        self.scenario_selector.addItems(scenarios.names())
+        self.scenario_selector.setCurrentIndex(scenarios.names().index(scenarios.current))
+        self.scenario_selector.blockSignals(False)
+
+    def switch_scenario(self, index):
+        # Commits the widgets to the current branch and rebinds them to another branch
+        document = self.documents[self.active_document]
+        names = document.scenarios.names()
+        if not 0 <= index < len(names) or names[index] == document.scenarios.current:
+            return
+        document.doc = self.document_from_widgets()
+        doc = document.scenarios.checkout(names[index])
+        self.bind_document(doc, min(self.plant_index, len(doc.plants) - 1))
+
+    def fork_scenario(self):
+        name, ok = QInputDialog.getText(self, "Fork Scenario", "Name of the new scenario:")
+        if ok:
+            self.create_scenario(name.strip())
+
+    def create_scenario(self, name):
+        # New branch from the current widget state; the widgets stay bound to it
+        document = self.documents[self.active_document]
+        document.doc = self.document_from_widgets()
+        try:
+            self.bound_document = document.scenarios.fork(name)
+        except ValueError as e:
+            QMessageBox.warning(self, "Fork Scenario", str(e))
+            return False
+        self.update_scenario_selector()
+        return True
+
+    def compare_scenarios(self):
+        scenarios = self.documents[self.active_document].scenarios
+        others = [name for name in scenarios.names() if name != scenarios.current]
+        if not others:
+            QMessageBox.information(self, "Compare Scenarios", "Fork a scenario first to compare it with this one.")
+            return
+        other, ok = QInputDialog.getItem(self, "Compare Scenarios", f"Compare '{scenarios.current}' with:",
+                                         others, 0, False)
+        if not ok:
+            return
+        self.documents[self.active_document].doc = self.document_from_widgets()
+        changes = scenarios.compare(scenarios.current, other)
+        lines = [f"{key}:  {a}  ->  {b}" for key, a, b in changes[:40]]
+        if len(changes) > 40:
+            lines.append(f"... and {len(changes) - 40} more")
+        QMessageBox.information(self, "Compare Scenarios",
+                                f"{scenarios.current} -> {other}\n\n" + ("\n".join(lines) or "No differences."))
+
+    def delete_scenario(self):
+        document = self.documents[self.active_document]
+        try:
+            document.scenarios.delete(document.scenarios.current)
+        except ValueError as e:
+            QMessageBox.warning(self, "Delete Scenario", str(e))
+            return
+        doc = document.scenarios.document()
+        self.bind_document(doc, min(self.plant_index, len(doc.plants) - 1))
+        self.update_scenario_selector()
+
+    def save_scenarios(self):
+        directory = QFileDialog.getExistingDirectory(self, "Save Every Scenario To")
+        if directory:
+            document = self.documents[self.active_document]
+            document.doc = self.document_from_widgets()
+            paths = document.scenarios.write_all(directory)
+            QMessageBox.information(self, "Scenarios Saved", f"{len(paths)} scenario(s) saved to {directory}.")
+
+    ##########################################
+
+    def add_recent_file(self, filename):
+        settings = QSettings("AgroC", "PlantsEditor")
+        path = os.path.abspath(filename)
+        recent = [p for p in (settings.value("recent_files") or []) if p != path]
+        settings.setValue("recent_files", [path] + recent[:9])
+
+    def fill_recent_menu(self):
+        self.recent_menu.clear()
+        for path in QSettings("AgroC", "PlantsEditor").value("recent_files") or []:
+            action = self.recent_menu.addAction(path)
+            action.triggered.connect(lambda checked=False, path=path: self.open_document(path))
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        for url in event.mimeData().urls():
+            if url.isLocalFile():
+                self.open_document(url.toLocalFile())
+        event.acceptProposedAction()
+
     ##########################################
 
     def load_default_values(self):
         # Attempt to load settings from the bundled default plants.in file.
         try:
-            self.load_file(self.default_file)
+            if not self.documents:
+                self.open_document(self.default_file)
+            else:
+                self.load_file(self.default_file)
         except Exception as e:
             QMessageBox.critical(self, "Error Loading Defaults", f"An error occurred while loading the default settings: {str(e)}\nPlease check that the default file is correctly placed and not corrupted.")
 
     ##########################################
 
+    @traced
     def load_file(self, filename):
     # Reads the file and sets the GUI fields to the file's values
     # Error handling included to capture and debug issues during file read
         try:
-            with open(filename, 'r') as file:
-                lines = file.readlines()
-
-            self.version_input.setText(lines[1].split()[0])
-
-            bool_settings = lines[2].split()
-            for i, (label, checkbox) in enumerate(self.bool_settings.items()):
-                checkbox.setChecked(bool_settings[i].lower() == 't')
-
-            self.daily_timestep.setChecked(lines[4].strip().lower().startswith('t'))
-
-            start_date = lines[5].split()[:3]
-            self.start_date.setDate(QDate(int(start_date[0]), int(start_date[1]), int(start_date[2])))
-
-            self.num_plant_types.setValue(int(lines[6].split()[0]))
-            self.unit_soilco2.setCurrentIndex(int(lines[7].split()[0]) - 1)
-            self.interception_model.setCurrentIndex(int(lines[8].split()[0]) - 1)
-            self.latitude.setText(lines[9].split()[0])
-
-            # Plant Type 1 Settings
-            self.plant_type_name.setText(lines[11].strip())
-            self.table_rows.setText(' '.join(lines[12].split()[:17]))
-            self.planting_dates.setText(lines[13].split()[0])
-            self.num_parameters.setText(lines[14].split()[0])
-            self.kc_calculation.setText(lines[15].split()[0])
-            self.senescence.setText(' '.join(lines[16].split()[:2]))
-            self.p_values.setText(' '.join(lines[17].split()[:5]))
-            self.ceres_temperatures.setText(' '.join(lines[18].split()[:13]))
-            self.ceres_photoperiod.setText(' '.join(lines[19].split()[:3]))
-            self.ceres_max_dev_rate.setText(' '.join(lines[20].split()[:3]))
-
-            # Additional fields
-            self.rna_max.setText(lines[21].split()[0])
-            self.root_max.setText(lines[22].split()[0])
-            self.root_init.setText(lines[23].split()[0])
-            self.exu_fact.setText(lines[24].split()[0])
-            self.deathfacmax.setText(lines[25].split()[0])
-            self.nsl.setText(lines[26].split()[0])
-            self.rgr.setText(lines[27].split()[0])
-            self.tempbase.setText(lines[28].split()[0])
-            self.sla.setText(lines[29].split()[0])
-            self.rsla.setText(lines[30].split()[0])
-            self.amx.setText(lines[31].split()[0])
-            self.eff.setText(lines[32].split()[0])
-            self.rkdf.setText(lines[33].split()[0])
-            self.scp.setText(lines[34].split()[0])
-            self.rmainso.setText(lines[35].split()[0])
-            self.asrqso.setText(lines[36].split()[0])
-            self.tempstart.setText(lines[37].split()[0])
-            self.debr_fac.setText(lines[38].split()[0])
-            self.ls.setText(lines[39].split()[0])
-            self.rlaicr.setText(lines[40].split()[0])
-            self.eai.setText(lines[41].split()[0])
-            self.rmatr.setText(lines[42].split()[0])
-            self.ssl.setText(lines[43].split()[0])
-            self.srw.setText(lines[44].split()[0])
-            self.slaid_off.setText(lines[45].split()[0])
-
-            self.emergence_harvest_dates.setText(lines[47].strip())
-
-            # Load tabular data
-            current_table = -1
-            table_rows = list(map(int, self.table_rows.text().split()))
-            for line in lines[49:]:  # Start from line 49 (0-indexed) which is the start of tabular data
-                if line.strip().startswith('#'):
-                    current_table += 1
-                    continue
-                
-                if current_table >= len(self.tables):
-                    break
-
-                values = line.strip().split()
-                if values:
-                    row = self.tables[current_table].rowCount() - 1  # -1 because we start with one empty row
-                    if row < table_rows[current_table]:
-                        for col, value in enumerate(values):
-                            if col < self.tables[current_table].columnCount():
-                                self.tables[current_table].setItem(row, col, QTableWidgetItem(value))
-                        if row < table_rows[current_table] - 1:  # Don't add extra row for the last entry
-                            self.tables[current_table].insertRow(row + 1)
-
-            # Remove extra rows
-            for i, table in enumerate(self.tables):
-                while table.rowCount() > table_rows[i]:
-                    table.removeRow(table.rowCount() - 1)
-
-            # Update the table list selection
-            self.table_list.setCurrentRow(0)
-            self.show_selected_table(self.table_list.item(0))
-
+            self.bind_document(plants_io.read(filename))
         except Exception as e:
             print(f"An error occurred while loading the file: {str(e)}")
             import traceback
             traceback.print_exc()
 
+    ##########################################
+
+    def bind_document(self, doc, plant_index=0):
+    # Sets the GUI fields and tables from a headless PlantsDocument. The plant types that are not
+    # shown stay in 'doc' (unparsed until they are opened) and are written back from there.
+        self.bound_document = doc
+        header = doc.header
+        self.version_input.setText(header["version"])
+
+        flags = header["flags"].split()
+        for i, checkbox in enumerate(self.bool_settings.values()):
+            checkbox.setChecked(i < len(flags) and flags[i].upper() == 'T')
+
+        self.daily_timestep.setChecked(header["daily_timestep"].upper().startswith('T'))
+
+        start_date = header["start_date"].split()[:3]
+        self.start_date.setDate(QDate(int(start_date[0]), int(start_date[1]), int(start_date[2])))
+
+        self.num_plant_types.blockSignals(True)
+        self.num_plant_types.setValue(len(doc.plants))
+        self.num_plant_types.blockSignals(False)
+        self.unit_soilco2.setCurrentIndex(int(header["unit_soilco2"]) - 1)
+        self.interception_model.setCurrentIndex(int(header["interception_model"]) - 1)
+        self.latitude.setText(header["latitude"])
+
+        self.update_plant_type_selector()
+        self.bind_plant_type(plant_index)
+
+    def bind_plant_type(self, plant_index):
+    # Shows plant type plant_index (0-based) of the bound document in the form and tables
+        self.plant_index = plant_index
+        plant = self.bound_document.plants[plant_index]
+        for key in plants_io.PLANT_FIELDS:
+            getattr(self, key).setText(plant.fields[key])
+        for i, rows in enumerate(plant.tables):
+            self.fill_table(i, rows, 0, 0, len(rows))
+        self.plant_type_label.setText(f"Plant Type {plant_index + 1} Settings")
+        self.plant_type_selector.blockSignals(True)
+        self.plant_type_selector.setCurrentIndex(plant_index)
+        self.plant_type_selector.blockSignals(False)
+
+        # Update the table list selection
+        self.table_list.setCurrentRow(0)
+        self.show_selected_table(self.table_list.item(0))
+
+    def update_plant_type_selector(self):
+        self.plant_type_selector.blockSignals(True)
+        self.plant_type_selector.clear()
+        self.plant_type_selector.addItems([f"Plant type {n}" for n in range(1, len(self.bound_document.plants) + 1)])
+        self.plant_type_selector.blockSignals(False)
+
+    def switch_plant_type(self, index):
+        # Keeps the edits of the shown plant type and shows another one
+        if index < 0 or index == self.plant_index:
+            return
+        self.bound_document = self.document_from_widgets()
+        self.bind_plant_type(index)
+
+    def set_plant_type_count(self, count):
+        # New plant types start as copies of the last one; removed ones are dropped from the end
+        doc = self.document_from_widgets()
+        while len(doc.plants) < count:
+            doc.plants.append(doc.plants[-1].copy())
+        del doc.plants[count:]
+        self.bound_document = doc
+        self.update_plant_type_selector()
+        self.bind_plant_type(min(self.plant_index, count - 1))
+
     ##########################################
     # Setup tabular data UI, including list and display of data tables
 
+    @traced
     def create_tabular_data(self):
         # Main widget and layout for tabular data section
         tabular_data_widget = QWidget()
@@ -391,26 +601,24 @@ class AgroCInputEditor(QMainWindow):
         self.table_display_layout = QVBoxLayout(self.table_display)
         tabular_layout.addWidget(self.table_display)
 
+        # Plot of the displayed table, optionally over the same table of another document
+        plot_panel = QWidget()
+        plot_layout = QVBoxLayout(plot_panel)
+        compare_layout = QHBoxLayout()
+        compare_layout.addWidget(QLabel("Compare with:"))
+        self.compare_selector = QComboBox()
+        self.compare_selector.addItem("None", None)
+        self.compare_selector.addItem("Default plants.in", "default")
+        self.compare_selector.currentIndexChanged.connect(self.update_plot_overlay)
+        compare_layout.addWidget(self.compare_selector, 1)
+        plot_layout.addLayout(compare_layout)
+        self.table_plot = TablePlot()
+        plot_layout.addWidget(self.table_plot, 1)
+        tabular_layout.addWidget(plot_panel, 1)
+        self.plotted_table = 0
+
         # Populate table list
-        table_headers = [
-            "Temperature sum against reduction factor of the maximal light assimilation rate",
-            "Effective temperature against reduction factor of the maximal light assimilation rate",
-            "Effective temperature against reduction factor of the development rate, if DVS < 1",
-            "Effective temperature against reduction factor of the development rate, if DVS > 1",
-            "DVS against fraction of dry matter allocated to the shoot",
-            "Temperature sum against fraction of dry matter allocated to the leaves",
-            "Temperature sum against fraction of dry matter allocated to the stem",
-            "Temperature sum against fraction of dry matter allocated to the cob/root",
-            "DVS against death rate of leaves reduction function",
-            "Effective temperature against death rate of the leaves",
-            "DVS or time against akc",
-            "Relative root depth against root density",
-            "DVS against N content leaves",
-            "DVS against N content stems",
-            "DVS against N content roots",
-            "DVS against N content storage organs",
-            "DVS against N content crowns"
-        ]
+        table_headers = plants_io.TABLE_HEADERS
 
         for i, header in enumerate(table_headers):
             self.table_list.addItem(f"Table {i+1}: {header}")
@@ -425,6 +633,12 @@ class AgroCInputEditor(QMainWindow):
             table.horizontalHeader().setStretchLastSection(True)
             table.verticalHeader().setVisible(False)
             table.setEditTriggers(QTableWidget.AllEditTriggers)
+            # Multi-cell copy/paste of spreadsheet blocks (tab- or whitespace-separated text)
+            paste = QShortcut(QKeySequence.Paste, table, context=Qt.WidgetWithChildrenShortcut)
+            paste.activated.connect(lambda index=i: self.paste_into_table(index))
+            copy = QShortcut(QKeySequence.Copy, table, context=Qt.WidgetWithChildrenShortcut)
+            copy.activated.connect(lambda index=i: self.copy_from_table(index))
+            table.cellChanged.connect(lambda row, col, index=i: self.table_cell_changed(index, row, col))
             self.tables.append(table)
 
         # Add buttons to the tabular data tab
@@ -443,6 +657,7 @@ class AgroCInputEditor(QMainWindow):
         return tabular_data_widget
 
     # Show the selected data table from the list when clicked
+    @traced
     def show_selected_table(self, item):
         # Clear the display and setup the selected table along with + and - buttons
         for i in reversed(range(self.table_display_layout.count())):
@@ -453,33 +668,79 @@ class AgroCInputEditor(QMainWindow):
         # Get the index of the selected table
         table_index = self.table_list.row(item)
 
-        # Ensure the buttons exist; if not, create them
+        # Ensure the buttons exist; if not, create them (once: the layout stays in the display,
+        # only the table below it is swapped)
         if not hasattr(self, 'add_button'):
             self.add_button = QPushButton("+")
             self.remove_button = QPushButton("-")
-        
-        # Disconnect existing connections if any (important to avoid multiple connections leading to multiple actions)
-        try:
-            self.add_button.clicked.disconnect()
-        except TypeError:
-            pass  # no connections
-        try:
-            self.remove_button.clicked.disconnect()
-        except TypeError:
-            pass  # no connections
-        
-        # Connect the buttons with the new table index
-        self.add_button.clicked.connect(lambda: self.add_row_to_table(table_index))
-        self.remove_button.clicked.connect(lambda: self.remove_row_from_table(table_index))
-
-        # Add buttons to layout
-        button_layout = QHBoxLayout()
-        button_layout.addWidget(self.add_button)
-        button_layout.addWidget(self.remove_button)
-        self.table_display_layout.addLayout(button_layout)
+            self.simplify_button = QPushButton("Simplify...")
+            self.simplify_button.setToolTip("Remove rows that linear interpolation reproduces within a tolerance.")
+            self.simplify_button.clicked.connect(self.simplify_current_table)
+            self.generate_button = QPushButton("Generate...")
+            self.generate_button.setToolTip("Fill the table from an analytic curve (exponential, beta, cardinal temperatures).")
+            self.generate_button.clicked.connect(self.generate_current_table)
+            # The buttons act on the displayed table. They are connected once: PyQt keeps the slot
+            # objects of disconnected lambdas alive, so reconnecting on every switch leaked memory.
+            self.add_button.clicked.connect(lambda: self.add_row_to_table(self.plotted_table))
+            self.remove_button.clicked.connect(lambda: self.remove_row_from_table(self.plotted_table))
+            button_layout = QHBoxLayout()
+            button_layout.addWidget(self.add_button)
+            button_layout.addWidget(self.remove_button)
+            button_layout.addWidget(self.simplify_button)
+            button_layout.addWidget(self.generate_button)
+            self.table_display_layout.addLayout(button_layout)
 
         # Add the selected table to the display
         self.table_display_layout.addWidget(self.tables[table_index])
+        self.plot_table(table_index)
+
+    # Redraw the plot pane for a table from its cells
+    def plot_table(self, table_index):
+        self.plotted_table = table_index
+        self.table_plot.set_rows(self.table_widget_rows(table_index), f"Table {table_index + 1}")
+        self.update_plot_overlay()
+
+    def table_cell_changed(self, table_index, row, col):
+        if table_index == self.plotted_table:
+            item = self.tables[table_index].item(row, col)
+            self.table_plot.set_cell(row, col, item.text() if item else "")
+
+    def table_widget_rows(self, table_index):
+        table = self.tables[table_index]
+        rows = []
+        for row in range(table.rowCount()):
+            items = [table.item(row, col) for col in range(table.columnCount())]
+            rows.append([item.text() if item and item.text() else "0" for item in items])
+        return rows
+
+    # Keep the choices of the "Compare with" list in step with the open documents
+    def update_compare_selector(self):
+        selected = self.compare_selector.currentData()
+        self.compare_selector.blockSignals(True)
+        while self.compare_selector.count() > 2:
+            self.compare_selector.removeItem(2)
+        for i, document in enumerate(self.documents):
+            if i != self.active_document:
+                self.compare_selector.addItem(os.path.basename(document.path), document)
+        index = self.compare_selector.findData(selected)
+        self.compare_selector.setCurrentIndex(index if index >= 0 else 0)
+        self.compare_selector.blockSignals(False)
+        self.update_plot_overlay()
+
+    def update_plot_overlay(self):
+        source = self.compare_selector.currentData()
+        if source is None:
+            self.table_plot.set_overlay(None)
+            return
+        try:
+            doc = plants_io.read(self.default_file) if source == "default" else source.doc
+        except Exception as e:
+            print(f"An error occurred while loading the comparison table: {str(e)}")
+            self.table_plot.set_overlay(None)
+            return
+        plant = doc.plants[min(self.plant_index, len(doc.plants) - 1)]
+        label = "default plants.in" if source == "default" else os.path.basename(source.path)
+        self.table_plot.set_overlay(plant.tables[self.plotted_table], label)
 
 
     # Add a new row to the currently displayed table
@@ -489,15 +750,195 @@ class AgroCInputEditor(QMainWindow):
         table.insertRow(row_count)
         table.setItem(row_count, 0, QTableWidgetItem("0"))  # Initialize new row with default values
         table.setItem(row_count, 1, QTableWidgetItem("0"))
+        if table_index == self.plotted_table:
+            self.table_plot.append_row()
 
     # Remove the last row from the currently displayed table
     def remove_row_from_table(self, table_index):
         table = self.tables[table_index]
         if table.rowCount() > 0:
             table.removeRow(table.rowCount() - 1)  # Remove the last row
-
-
-
+            if table_index == self.plotted_table:
+                self.table_plot.pop_row()
+
+
+
+    # Reduce the rows of the displayed table while keeping the interpolation error below a tolerance
+    @traced
+    def simplify_current_table(self):
+        import plants_simplify  # needs numpy, which the rest of the editor does not
+        table_index = self.table_list.currentRow()
+        if table_index < 0:
+            table_index = 0
+        tolerance, ok = QInputDialog.getDouble(self, "Simplify Table",
+                                               "Maximum interpolation error (column 2 units):",
+                                               0.001, 0.0, 1e9, 6)
+        if not ok:
+            return
+        rows = self.table_widget_rows(table_index)
+        try:
+            kept, error = plants_simplify.simplify_table(rows, tolerance)
+        except ValueError as e:
+            QMessageBox.warning(self, "Simplify Table", f"The table could not be simplified: {e}")
+            return
+        self.set_table_rows(table_index, kept)
+        QMessageBox.information(self, "Simplify Table",
+                                f"Table {table_index + 1}: {len(rows)} -> {len(kept)} rows, "
+                                f"maximum interpolation error {error:.3g}")
+
+    # Fill the displayed table from an analytic curve; the plot previews the curve while the
+    # parameters are edited
+    def generate_current_table(self):
+        import plants_generators  # needs numpy, which the rest of the editor does not
+        table_index = self.plotted_table
+        dialog = QDialog(self)
+        dialog.setWindowTitle(f"Generate Table {table_index + 1}")
+        layout = QVBoxLayout(dialog)
+        form = QFormLayout()
+        curve_selector = QComboBox()
+        form.addRow("Curve:", curve_selector)
+
+        def spin_box(value, low=-1e6, high=1e6, decimals=4):
+            box = QDoubleSpinBox()
+            box.setRange(low, high)
+            box.setDecimals(decimals)
+            box.setValue(value)
+            return box
+
+        # One page of parameter fields per curve
+        pages = QStackedWidget()
+        fields = {}
+        for generator in plants_generators.GENERATORS.values():
+            page = QWidget()
+            page_form = QFormLayout(page)
+            page_form.setContentsMargins(0, 0, 0, 0)
+            fields[generator.name] = {}
+            for key, value in generator.params.items():
+                fields[generator.name][key] = spin_box(value)
+                page_form.addRow(f"{key}:", fields[generator.name][key])
+            pages.addWidget(page)
+            curve_selector.addItem(f"{generator.name} - {generator.description}", generator.name)
+        x_start, x_stop = spin_box(0.0), spin_box(1.0)
+        row_count = QSpinBox()
+        row_count.setRange(2, 1000000)
+        form.addRow("From x:", x_start)
+        form.addRow("To x:", x_stop)
+        form.addRow("Rows:", row_count)
+        layout.addLayout(form)
+        layout.addWidget(pages)
+        error_label = QLabel()
+        layout.addWidget(error_label)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        layout.addWidget(buttons)
+
+        def current_rows():
+            name = curve_selector.currentData()
+            params = {key: box.value() for key, box in fields[name].items()}
+            return plants_generators.generate(name, params, (x_start.value(), x_stop.value()), row_count.value())
+
+        def select_curve(index):
+            # Start every curve from its defaults for this table
+            generator = plants_generators.GENERATORS[curve_selector.itemData(index)]
+            pages.setCurrentIndex(index)
+            for box in (x_start, x_stop, row_count):
+                box.blockSignals(True)
+            x_start.setValue(generator.x_range[0])
+            x_stop.setValue(generator.x_range[1])
+            row_count.setValue(generator.rows)
+            for box in (x_start, x_stop, row_count):
+                box.blockSignals(False)
+            preview()
+
+        def preview():
+            try:
+                rows = current_rows()
+            except ValueError as e:
+                error_label.setText(str(e))
+                buttons.button(QDialogButtonBox.Ok).setEnabled(False)
+                return
+            error_label.setText("")
+            buttons.button(QDialogButtonBox.Ok).setEnabled(True)
+            self.table_plot.set_overlay(rows, "generated")
+
+        for box in [x_start, x_stop, row_count] + [box for page in fields.values() for box in page.values()]:
+            box.valueChanged.connect(preview)
+        suggested = plants_generators.generator_for_table(table_index + 1)
+        curve_selector.currentIndexChanged.connect(select_curve)
+        curve_selector.setCurrentIndex(list(plants_generators.GENERATORS).index(suggested.name) if suggested else 0)
+        select_curve(curve_selector.currentIndex())
+        try:
+            if dialog.exec_() == QDialog.Accepted:
+                self.set_table_rows(table_index, current_rows())
+        finally:
+            self.update_plot_overlay()
+
+    # Replace the contents of a table and keep the row-count field in step
+    def set_table_rows(self, table_index, rows):
+        self.fill_table(table_index, rows, 0, 0, len(rows))
+
+    # Write a block of cell texts into a table starting at (start_row, start_col).
+    # The table is resized once and filled with signals and repaints suspended.
+    def fill_table(self, table_index, rows, start_row=0, start_col=0, row_count=None):
+        table = self.tables[table_index]
+        if row_count is None:
+            row_count = max(table.rowCount(), start_row + len(rows))
+        table.setUpdatesEnabled(False)
+        table.blockSignals(True)
+        try:
+            table.setRowCount(row_count)
+            columns = table.columnCount()
+            for r, row in enumerate(rows, start=start_row):
+                for col, value in enumerate(row[:columns - start_col], start=start_col):
+                    table.setItem(r, col, QTableWidgetItem(value))
+        finally:
+            table.blockSignals(False)
+            table.setUpdatesEnabled(True)
+        self.table_rows.setText(' '.join(str(t.rowCount()) for t in self.tables))
+        if table_index == self.plotted_table:
+            self.plot_table(table_index)
+
+    # Paste clipboard text at the current cell; pasting onto a fully selected table replaces it
+    def paste_into_table(self, table_index):
+        table = self.tables[table_index]
+        rows = parse_clipboard_table(QApplication.clipboard().text())
+        if not rows:
+            return
+        ranges = table.selectedRanges()
+        whole_table = (len(ranges) == 1 and ranges[0].rowCount() == table.rowCount()
+                       and ranges[0].columnCount() == table.columnCount())
+        if whole_table or table.rowCount() == 0:
+            self.fill_table(table_index, rows, 0, 0, len(rows))
+            return
+        if ranges:
+            start_row = min(r.topRow() for r in ranges)
+            start_col = min(r.leftColumn() for r in ranges)
+        else:
+            start_row, start_col = max(table.currentRow(), 0), max(table.currentColumn(), 0)
+        self.fill_table(table_index, rows, start_row, start_col)
+
+    # Copy the selected cells (or the whole table) as tab-separated text
+    def copy_from_table(self, table_index):
+        table = self.tables[table_index]
+        ranges = table.selectedRanges()
+        if ranges:
+            top = min(r.topRow() for r in ranges)
+            bottom = max(r.bottomRow() for r in ranges)
+            left = min(r.leftColumn() for r in ranges)
+            right = max(r.rightColumn() for r in ranges)
+        else:
+            top, bottom, left, right = 0, table.rowCount() - 1, 0, table.columnCount() - 1
+        lines = []
+        for row in range(top, bottom + 1):
+            cells = []
+            for col in range(left, right + 1):
+                item = table.item(row, col)
+                cells.append(item.text() if item else "")
+            lines.append("\t".join(cells))
+        QApplication.clipboard().setText("\n".join(lines) + "\n")
+
+    @traced
     def update_table_rows(self):
         try:
             new_rows = list(map(int, self.table_rows.text().split()))
@@ -538,84 +979,49 @@ class AgroCInputEditor(QMainWindow):
 
     ##########################################
 
+    def document_from_widgets(self):
+    # Collects the current settings from the GUI into a headless PlantsDocument
+        header = {
+            "version": self.version_input.text(),
+            "flags": " ".join('T' if checkbox.isChecked() else 'F' for checkbox in self.bool_settings.values()),
+            "daily_timestep": 'T' if self.daily_timestep.isChecked() else 'F',
+            "start_date": self.start_date.date().toString('yyyy MM dd'),
+            "num_plant_types": str(len(self.bound_document.plants)),
+            "unit_soilco2": str(self.unit_soilco2.currentIndex() + 1),
+            "interception_model": str(self.interception_model.currentIndex() + 1),
+            "latitude": self.latitude.text(),
+        }
+        fields = {key: getattr(self, key).text() for key in plants_io.PLANT_FIELDS}
+        tables = []
+        for table in self.tables:
+            rows = []
+            for row in range(table.rowCount()):
+                row_data = []
+                for col in range(table.columnCount()):
+                    item = table.item(row, col)
+                    row_data.append(item.text() if item and item.text() else "0")
+                rows.append(row_data)
+            tables.append(rows)
+        # The other plant types are taken over unchanged (and unparsed, if they were never opened)
+        plants = [plants_io.PlantType(fields, tables) if i == self.plant_index else plant.copy()
+                  for i, plant in enumerate(self.bound_document.plants)]
+        return plants_io.PlantsDocument(header, plants)
+
+    @traced
     def generate_plants_in(self, filename):
     # Writes the current settings from the GUI back to a new plants.in file
-        with open(filename, 'w') as file:
-            file.write("soilco2 plant input\n")
-            file.write(f"{self.version_input.text()}  version number\n")
-
-            bool_settings = ['T' if checkbox.isChecked() else 'F' for checkbox in self.bool_settings.values()]
-            file.write("CO2_fluxes   respiration   maint_growth   waterstress   rootExudation   rootDeath   harvestresidues   farquhar\n")
-            file.write("     " + "     ".join(bool_settings) + "\n")
-
-            file.write("T " if self.daily_timestep.isChecked() else "F ")
-            file.write("daily timestep (T = daily, F = hourly)\n")
-
-            file.write(f"{self.start_date.date().toString('yyyy MM dd')}  start date of the simulation ( yyyy mm dd )\n")
-            file.write(f"{self.num_plant_types.value()}  no of plant types\n")
-            file.write(f"{self.unit_soilco2.currentIndex() + 1}  unit in SOILCO2 1=mm 2=cm 3=dm 4=m 5=km\n")
-            file.write(f"{self.interception_model.currentIndex() + 1}  interception 1=Bormann, 2=Hoyningen-Huene\n")
-            file.write(f"{self.latitude.text()}  latitude of the site                                                 (LATITUDE)\n")
-
-            file.write("# plant type 1 **************************************************\n")
-            file.write(f"{self.plant_type_name.text()}\n")
-            # Dynamically write the number of rows for each table
-            table_rows = [str(table.rowCount()) for table in self.tables]
-            file.write(f"{' '.join(table_rows)}   number of rows in the 17 tables\n")
-            file.write(f"{self.planting_dates.text()}  no of dates for planting/emergence and harvests\n")
-            file.write(f"{self.num_parameters.text()} no of parameters\n")
-            file.write(f"{self.kc_calculation.text()}  Kc calculation 1=dvs  2=time 3=computed from LAI                             (AKCTYPE)\n")
-            file.write(f"{self.senescence.text()}   tstart, tend for senescence (day of year, i.e. Julian Date)\n")
-            file.write(f"{self.p_values.text()}  p0, p1, p2h, p2l, p3 (mm)\n")
-            file.write(f"{self.ceres_temperatures.text()}  CERES: temperatures (C) (first number: flag for 1=new or 0=old Model)\n")
-            file.write(f"{self.ceres_photoperiod.text()}  CERES: photoperiod: Popt, Pcrit (h), omega (h(-1))\n")
-            file.write(f"{self.ceres_max_dev_rate.text()}  CERES: maximum development rate (h(-1))                          (RMAX)\n")
-
-            file.write(f"{self.rna_max.text()}     + max depth above there is no root water uptake (mm)                  (RNA_MAX)\n")
-            file.write(f"{self.root_max.text()}      + max rooting depth (mm)                                    (ROOT_MAX)\n")
-            file.write(f"{self.root_init.text()}     + initial rooting depth (mm)                                          (ROOT_INIT)\n")
-            file.write(f"{self.exu_fact.text()}      + exudation factor                                                    (EXU_FACT)\n")
-            file.write(f"{self.deathfacmax.text()}    + max factor used for deathfac                                        (DEATHFACMAX)\n")
-            file.write(f"{self.nsl.text()}       + number of seedlings per m2                                          (NSL)\n")
-            file.write(f"{self.rgr.text()}     + relative growth rate during exponential leaf area growth (ha/ha/C/d) (RGR)\n")
-            file.write(f"{self.tempbase.text()}       + base temperature for juvenile leaf area growth (C)                  (TEMPBASE)\n")
-            file.write(f"{self.sla.text()}    + specific leaf area of new leaves (ha leaf/kg DM)                    (SLA)\n")
-            file.write(f"{self.rsla.text()} + change of specific leaf area per unit thermal time (ha leaf/kg DM/C/d) (RSLA)\n")
-            file.write(f"{self.amx.text()} 	  + potential CO2-assimilation rate of a unit leaf area for light saturation (kg CO2/ha leaf/h) (AMX)\n")
-            file.write(f"{self.eff.text()}      + initial light use efficiency ((kg CO2/ha leaf/h)/(J/m2/s))          (EFF) (is changed from ha to L2 in plants.f90)\n")
-            file.write(f"{self.rkdf.text()}      + extinction coefficient for diffuse PAR flux                         (RKDF)\n")
-            file.write(f"{self.scp.text()}       + scattering coefficient of leaves for PAR                            (SCP)\n")
-            file.write(f"{self.rmainso.text()}      + maintenance demand rate for storage organs per unit dry matter (kg CH2O/kg DM/d) (RMAINSO)\n")
-            file.write(f"{self.asrqso.text()}      + conversion efficiency coefficient (assimilation requirement of DM for storage organs) (kg CH2O/kg DM) (ASRQSO)\n")
-            file.write(f"{self.tempstart.text()}       + start temperature for plant growth (C*day) (crop 1: temp_sum from emergence till 31.Dec + tempstart for spring growth) (TEMPSTART)\n")
-            file.write(f"{self.debr_fac.text()}      + dead LAI debris factor                                              (DEBR_FAC)\n")
-            file.write(f"{self.ls.text()}      + LAI as switch from temperature to radiation-limited LAI expansion (ha/ha) (LS)\n")
-            file.write(f"{self.rlaicr.text()}       + critical LAI for leaf death due to self shading (ha/ha)             (RLAICR)\n")
-            file.write(f"{self.eai.text()}         + initial value of the ear area index (2sided) (crop 1-3,5)           (EAI)\n")
-            file.write(f"{self.rmatr.text()}       + initial value of the maturity class (crop 4)                        (RMATR)\n")
-            file.write(f"{self.ssl.text()}    + leaf area of one seedling (m2 leaf/seedling)                        (SSL)\n")
-            file.write(f"{self.srw.text()}    + specific root weight (m/g)                                          (SRW)\n")
-            file.write(f"{self.slaid_off.text()}       + dead leaf area for outside the season (ha/ha)                       (SLAID_OFF)\n")
-            file.write("# emergence and harvest date(s)\n")
-            file.write(f"{self.emergence_harvest_dates.text()}\n")
-            # Write tabular data
-            # Dynamically fetch and write the number of rows for each table
-            table_rows = [str(table.rowCount()) for table in self.tables]
-            file.write(f"{' '.join(table_rows)}   number of rows in the 17 tables\n")
-            # Write tabular data for each table
-            for i, table in enumerate(self.tables):
-                file.write(f"# (Tab.{i+1}) [for crop 1 2 3 5] #    {self.table_list.item(i).text().split(': ', 1)[1]}\n")
-                for row in range(table.rowCount()):
-                    row_data = []
-                    for col in range(table.columnCount()):
-                        item = table.item(row, col)
-                        row_data.append(item.text() if item and item.text() else "0")
-                    file.write("    " + "        ".join(row_data) + "\n")
+        plants_io.write(self.document_from_widgets(), filename)
         print(f"File saved successfully: {filename}")
 
 if __name__ == "__main__":
     # Create the application instance, set up the main window, and start the event loop
+    # --trace [PATH] (or AGROC_TRACE=PATH) records timing spans and writes a Chrome trace at exit
+    plants_trace.enable_from_argv(sys.argv)
+    # --diag [PATH] (or AGROC_DIAG=PATH) samples memory and Qt object counts and writes them at exit
+    diagnostics = plants_diag.enable_from_argv(sys.argv)
     app = QApplication(sys.argv)
+    if diagnostics:
+        plants_diag.diagnostics().start()
     window = AgroCInputEditor()
     window.show()
     sys.exit(app.exec_())
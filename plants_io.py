@@ -0,0 +1,562 @@
+#############################################################################################################
+
+"""
+Description:
+Headless reader and writer for the AgroC 'plants.in' configuration file.
+
+The editor (plants_gui.py) and the batch tools share this module so that there is exactly one
+definition of the file layout. A parsed file is held as a PlantsDocument: the general settings in
+'header', and one PlantType per "# plant type" block with its scalar parameters in 'fields' and the
+17 lookup tables in 'tables'. All values are kept as the text found in the file (the same text the
+editor shows in its widgets), so reading and writing a file does not reformat numbers.
+
+Field names follow the editor's widget names (e.g. 'latitude', 'amx', 'tempstart'). The tags used
+in the file comments (AMX, TEMPSTART, AKCTYPE, ...) are accepted as aliases, and fields of plant
+type N are addressed as 'name@N' (plant type 1 when no suffix is given).
+
+parse() only splits a file into its plant type blocks; a block is parsed when its fields or tables
+are first used, so files with many plant types open as fast as single-crop files.
+
+read() and write() handle gzip, xz and zstd compressed files (plants.in.gz, .xz, .zst) on the fly:
+compressed input is recognized by its first bytes, output is compressed by its file name suffix.
+zstd needs the zstandard package.
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import gzip
+import io
+import lzma
+import re
+
+from plants_trace import span, traced
+
+
+###############################################################################################################
+# File layout
+
+# Descriptions of the 17 lookup tables, in file order
+TABLE_HEADERS = [
+    "Temperature sum against reduction factor of the maximal light assimilation rate",
+    "Effective temperature against reduction factor of the maximal light assimilation rate",
+    "Effective temperature against reduction factor of the development rate, if DVS < 1",
+    "Effective temperature against reduction factor of the development rate, if DVS > 1",
+    "DVS against fraction of dry matter allocated to the shoot",
+    "Temperature sum against fraction of dry matter allocated to the leaves",
+    "Temperature sum against fraction of dry matter allocated to the stem",
+    "Temperature sum against fraction of dry matter allocated to the cob/root",
+    "DVS against death rate of leaves reduction function",
+    "Effective temperature against death rate of the leaves",
+    "DVS or time against akc",
+    "Relative root depth against root density",
+    "DVS against N content leaves",
+    "DVS against N content stems",
+    "DVS against N content roots",
+    "DVS against N content storage organs",
+    "DVS against N content crowns"
+]
+NUM_TABLES = len(TABLE_HEADERS)
+
+# Names of the eight output/process switches, in file order
+FLAG_NAMES = ["CO2_fluxes", "respiration", "maint_growth", "waterstress",
+              "rootExudation", "rootDeath", "harvestresidues", "farquhar"]
+
+# General settings: (field, format of the written line). The field value replaces "{}".
+HEADER_LINES = [
+    (None, "soilco2 plant input"),
+    ("version", "{}  version number"),
+    (None, "CO2_fluxes   respiration   maint_growth   waterstress   rootExudation   rootDeath   harvestresidues   farquhar"),
+    ("flags", "     {}"),
+    ("daily_timestep", "{} daily timestep (T = daily, F = hourly)"),
+    ("start_date", "{}  start date of the simulation ( yyyy mm dd )"),
+    ("num_plant_types", "{}  no of plant types"),
+    ("unit_soilco2", "{}  unit in SOILCO2 1=mm 2=cm 3=dm 4=m 5=km"),
+    ("interception_model", "{}  interception 1=Bormann, 2=Hoyningen-Huene"),
+    ("latitude", "{}  latitude of the site                                                 (LATITUDE)"),
+]
+
+# Scalar part of a plant type block, following its "# plant type N" line
+PLANT_LINES = [
+    ("plant_type_name", "{}"),
+    ("table_rows", "{}   number of rows in the 17 tables"),
+    ("planting_dates", "{}  no of dates for planting/emergence and harvests"),
+    ("num_parameters", "{} no of parameters"),
+    ("kc_calculation", "{}  Kc calculation 1=dvs  2=time 3=computed from LAI                             (AKCTYPE)"),
+    ("senescence", "{}   tstart, tend for senescence (day of year, i.e. Julian Date)"),
+    ("p_values", "{}  p0, p1, p2h, p2l, p3 (mm)"),
+    ("ceres_temperatures", "{}  CERES: temperatures (C) (first number: flag for 1=new or 0=old Model)"),
+    ("ceres_photoperiod", "{}  CERES: photoperiod: Popt, Pcrit (h), omega (h(-1))"),
+    ("ceres_max_dev_rate", "{}  CERES: maximum development rate (h(-1))                          (RMAX)"),
+    ("rna_max", "{}     + max depth above there is no root water uptake (mm)                  (RNA_MAX)"),
+    ("root_max", "{}      + max rooting depth (mm)                                    (ROOT_MAX)"),
+    ("root_init", "{}     + initial rooting depth (mm)                                          (ROOT_INIT)"),
+    ("exu_fact", "{}      + exudation factor                                                    (EXU_FACT)"),
+    ("deathfacmax", "{}    + max factor used for deathfac                                        (DEATHFACMAX)"),
+    ("nsl", "{}       + number of seedlings per m2                                          (NSL)"),
+    ("rgr", "{}     + relative growth rate during exponential leaf area growth (ha/ha/C/d) (RGR)"),
+    ("tempbase", "{}       + base temperature for juvenile leaf area growth (C)                  (TEMPBASE)"),
+    ("sla", "{}    + specific leaf area of new leaves (ha leaf/kg DM)                    (SLA)"),
+    ("rsla", "{} + change of specific leaf area per unit thermal time (ha leaf/kg DM/C/d) (RSLA)"),
+    ("amx", "{} \t  + potential CO2-assimilation rate of a unit leaf area for light saturation (kg CO2/ha leaf/h) (AMX)"),
+    ("eff", "{}      + initial light use efficiency ((kg CO2/ha leaf/h)/(J/m2/s))          (EFF) (is changed from ha to L2 in plants.f90)"),
+    ("rkdf", "{}      + extinction coefficient for diffuse PAR flux                         (RKDF)"),
+    ("scp", "{}       + scattering coefficient of leaves for PAR                            (SCP)"),
+    ("rmainso", "{}      + maintenance demand rate for storage organs per unit dry matter (kg CH2O/kg DM/d) (RMAINSO)"),
+    ("asrqso", "{}      + conversion efficiency coefficient (assimilation requirement of DM for storage organs) (kg CH2O/kg DM) (ASRQSO)"),
+    ("tempstart", "{}       + start temperature for plant growth (C*day) (crop 1: temp_sum from emergence till 31.Dec + tempstart for spring growth) (TEMPSTART)"),
+    ("debr_fac", "{}      + dead LAI debris factor                                              (DEBR_FAC)"),
+    ("ls", "{}      + LAI as switch from temperature to radiation-limited LAI expansion (ha/ha) (LS)"),
+    ("rlaicr", "{}       + critical LAI for leaf death due to self shading (ha/ha)             (RLAICR)"),
+    ("eai", "{}         + initial value of the ear area index (2sided) (crop 1-3,5)           (EAI)"),
+    ("rmatr", "{}       + initial value of the maturity class (crop 4)                        (RMATR)"),
+    ("ssl", "{}    + leaf area of one seedling (m2 leaf/seedling)                        (SSL)"),
+    ("srw", "{}    + specific root weight (m/g)                                          (SRW)"),
+    ("slaid_off", "{}       + dead leaf area for outside the season (ha/ha)                       (SLAID_OFF)"),
+    (None, "# emergence and harvest date(s)"),
+    ("emergence_harvest_dates", "{}"),
+    ("table_rows", "{}   number of rows in the 17 tables"),
+]
+
+HEADER_FIELDS = [key for key, _ in HEADER_LINES if key is not None]
+# The row counts are not stored; they are always derived from the tables when writing
+PLANT_FIELDS = [key for key, _ in PLANT_LINES[:-1] if key not in (None, "table_rows")]
+# The one-value-per-line parameters RNA_MAX .. SLAID_OFF
+PARAMETER_FIELDS = PLANT_FIELDS[PLANT_FIELDS.index("rna_max"):PLANT_FIELDS.index("slaid_off") + 1]
+
+# Labels of the fields as shown in the editor form (units in parentheses)
+FIELD_LABELS = {
+    "version": "Software Version",
+    "flags": "Process Switches",
+    "daily_timestep": "Daily Timestep Enabled",
+    "start_date": "Simulation Start Date",
+    "num_plant_types": "Number of Plant Types",
+    "unit_soilco2": "Soil CO2 Measurement Unit",
+    "interception_model": "Rainfall Interception Model",
+    "latitude": "Site Latitude (degrees)",
+    "plant_type_name": "Plant Type Name",
+    "planting_dates": "Planting/Emergence and Harvest Dates",
+    "num_parameters": "Number of Parameters",
+    "kc_calculation": "Kc Calculation Method",
+    "senescence": "Senescence Start and End (DOY)",
+    "p_values": "P Values (mm)",
+    "ceres_temperatures": "CERES Temperatures (C)",
+    "ceres_photoperiod": "CERES Photoperiod",
+    "ceres_max_dev_rate": "CERES Max Development Rate",
+    "rna_max": "RNA_MAX - Max Root Depth Without Water Uptake (mm)",
+    "root_max": "ROOT_MAX - Maximum Rooting Depth (mm)",
+    "root_init": "ROOT_INIT - Initial Rooting Depth (mm)",
+    "exu_fact": "EXU_FACT - Root Exudation Factor",
+    "deathfacmax": "DEATHFACMAX - Maximum Death Factor",
+    "nsl": "NSL - Number of Seedlings per m²",
+    "rgr": "RGR - Relative Growth Rate (ha/ha/C/day)",
+    "tempbase": "TEMPBASE - Base Temperature for Growth (°C)",
+    "sla": "SLA - Specific Leaf Area (ha leaf/kg DM)",
+    "rsla": "RSLA - Rate of Change in Specific Leaf Area (ha leaf/kg DM/°C/day)",
+    "amx": "AMX - Max Assimilation Rate (kg CO2/ha leaf/h)",
+    "eff": "EFF - Initial Light Use Efficiency (kg CO2/ha leaf/h)/(J/m²/s)",
+    "rkdf": "RKDF - Diffuse Light Extinction Coefficient",
+    "scp": "SCP - Scattering Coefficient for PAR (Photosynthetically Active Radiation)",
+    "rmainso": "RMAINSO - Maintenance Respiration Rate of Storage Organs (kg CH₂O/kg DM/day)",
+    "asrqso": "ASRQSO - Assimilation Requirement for Storage Organs (kg CH₂O/kg DM)",
+    "tempstart": "TEMPSTART - Start Temperature for Plant Growth (°C*day)",
+    "debr_fac": "DEBR_FAC - Dead Leaf Debris Factor",
+    "ls": "LS - Leaf Area Index Switch from Temperature to Radiation Limitation (ha/ha)",
+    "rlaicr": "RLAICR - Critical Leaf Area Index for Self-Shading (ha/ha)",
+    "eai": "EAI - Ear Area Index (2-sided) at Emergence",
+    "rmatr": "RMATR - Maturity Class at Emergence",
+    "ssl": "SSL - Specific Seedling Leaf Area (m² leaf/seedling)",
+    "srw": "SRW - Specific Root Weight (m/g)",
+    "slaid_off": "SLAID_OFF - Seasonal Leaf Area Index Decline (ha/ha)",
+    "emergence_harvest_dates": "Emergence and Harvest Dates",
+}
+
+# Descriptions of the parameters (the editor's tooltips)
+FIELD_DESCRIPTIONS = {
+    "rna_max": "Maximum depth above which no root water uptake is considered in the model.",
+    "root_max": "The deepest extent of the root zone from which the plant can uptake water.",
+    "root_init": "Initial depth of the plant's roots at the beginning of the simulation.",
+    "exu_fact": "Factor controlling the rate of root exudation, affecting soil chemistry and microbe interactions.",
+    "deathfacmax": "Controls the maximum rate of plant death due to various stress factors.",
+    "nsl": "Specifies the density of seedlings planted per square meter.",
+    "rgr": "The rate at which the plant's growth area increases relative to the temperature.",
+    "tempbase": "The lowest temperature at which the plant begins to grow.",
+    "sla": "Area of leaves produced per kilogram of dry matter.",
+    "rsla": "Change in specific leaf area per unit of thermal time.",
+    "amx": "Maximum rate at which the plant can assimilate carbon dioxide under ideal conditions.",
+    "eff": "Efficiency with which the plant converts absorbed light into stored energy via photosynthesis.",
+    "rkdf": "Coefficient that determines how much light is lost due to diffusion within the canopy.",
+    "scp": "Determines the fraction of PAR that is scattered by leaves in the canopy.",
+    "rmainso": "Rate at which storage organs respire, consuming sugars to maintain living tissues.",
+    "asrqso": "Amount of carbohydrates required to produce a kilogram of dry matter in storage organs.",
+    "tempstart": "Cumulative temperature from emergence until growth begins in spring.",
+    "debr_fac": "Factor that determines the rate at which dead leaves are added to soil organic matter.",
+    "ls": "Leaf area index at which growth switches from being temperature-limited to radiation-limited.",
+    "rlaicr": "Leaf area index beyond which leaves begin to shade each other, affecting photosynthesis.",
+    "eai": "Index measuring the area of ears (grain-bearing part of the plant) relative to ground area at emergence.",
+    "rmatr": "Maturity classification of the crop at emergence, affecting growth and development stages.",
+    "ssl": "Leaf area of a single seedling, important for early growth stage modeling.",
+    "srw": "Mass of roots per meter, used to calculate the total biomass of roots.",
+    "slaid_off": "Reduction in leaf area index after the growing season ends, reflecting leaf drop and senescence.",
+    "emergence_harvest_dates": "Specific dates for plant emergence and harvest, critical for seasonal management.",
+}
+
+# Number of tokens kept from multi-value lines; None keeps the whole (stripped) line
+_TOKENS = {
+    "start_date": 3, "table_rows": NUM_TABLES, "senescence": 2, "p_values": 5,
+    "ceres_temperatures": 13, "ceres_photoperiod": 3, "ceres_max_dev_rate": 3,
+    "flags": len(FLAG_NAMES), "plant_type_name": None, "emergence_harvest_dates": None,
+}
+
+# Tags used in the file comments that differ from the field name
+ALIASES = {"akctype": "kc_calculation", "rmax": "ceres_max_dev_rate", "name": "plant_type_name",
+           "interception": "interception_model", "unit": "unit_soilco2"}
+
+
+class PlantsFormatError(ValueError):
+    # Raised when a file does not follow the plants.in layout
+    pass
+
+
+###############################################################################################################
+
+class PlantType:
+    # One "# plant type N" block: scalar fields plus the 17 lookup tables (lists of [x, y] text rows).
+    # A block created from 'source' = (function, *args) is built on first access by calling
+    # function(*args), which returns (fields, tables). Each call must return new objects.
+    __slots__ = ("_fields", "_tables", "_source")
+
+    def __init__(self, fields=None, tables=None, source=None):
+        self._source = source
+        if source is None:
+            self._fields = dict(fields) if fields else {key: "" for key in PLANT_FIELDS}
+            self._tables = tables if tables is not None else [[] for _ in range(NUM_TABLES)]
+        else:
+            self._fields = self._tables = None
+
+    def _materialize(self):
+        self._fields, self._tables = self._source[0](*self._source[1:])
+        self._source = None
+
+    @property
+    def loaded(self):
+        return self._source is None
+
+    @property
+    def source(self):
+        # What an unparsed block is built from; None once it is parsed
+        return self._source
+
+    @property
+    def fields(self):
+        if self._source is not None:
+            self._materialize()
+        return self._fields
+
+    @fields.setter
+    def fields(self, value):
+        if self._source is not None:
+            self._materialize()
+        self._fields = value
+
+    @property
+    def tables(self):
+        if self._source is not None:
+            self._materialize()
+        return self._tables
+
+    @tables.setter
+    def tables(self, value):
+        if self._source is not None:
+            self._materialize()
+        self._tables = value
+
+    def copy(self):
+        if self._source is not None:
+            # The source builds new fields and tables on every call, so it can be shared
+            return PlantType(source=self._source)
+        return PlantType(self._fields, [[list(row) for row in table] for table in self._tables])
+
+    def table_rows(self):
+        return " ".join(str(len(table)) for table in self.tables)
+
+
+class PlantsDocument:
+    # A complete plants.in file
+    __slots__ = ("header", "plants")
+
+    def __init__(self, header=None, plants=None):
+        self.header = dict(header) if header else {key: "" for key in HEADER_FIELDS}
+        self.plants = plants if plants is not None else []
+
+    def copy(self):
+        return PlantsDocument(self.header, [plant.copy() for plant in self.plants])
+
+    def get(self, key):
+        where, name = resolve_key(self, key)
+        if name.startswith("tab"):
+            return where.tables[int(name[3:]) - 1]
+        return where[name]
+
+    def set(self, key, value):
+        # Set a field ("amx", "latitude", "tempstart@2") or a whole table ("tab12", rows of [x, y])
+        where, name = resolve_key(self, key)
+        if name.startswith("tab"):
+            where.tables[int(name[3:]) - 1] = table_from_value(value)
+        else:
+            where[name] = value if isinstance(value, str) else format_number(value)
+
+
+def resolve_key(doc, key):
+    # Map "field" / "field@N" / "tabK@N" to (container, name) where container is a dict or PlantType
+    name, _, plant = key.partition("@")
+    name = name.strip()
+    lower = name.lower()
+    lower = ALIASES.get(lower, lower)
+    if lower in HEADER_FIELDS:
+        if plant:
+            raise KeyError(f"{name} is a general setting and has no plant type")
+        return doc.header, lower
+    index = int(plant) - 1 if plant else 0
+    if not 0 <= index < len(doc.plants):
+        raise KeyError(f"{key}: the document has {len(doc.plants)} plant type(s)")
+    if lower.startswith("tab") and lower[3:].isdigit() and 1 <= int(lower[3:]) <= NUM_TABLES:
+        return doc.plants[index], lower
+    if lower in PLANT_FIELDS:
+        return doc.plants[index].fields, lower
+    raise KeyError(f"unknown field: {name}")
+
+
+def format_number(value):
+    # Text for a number computed by a tool (hand-entered text is always kept unchanged)
+    if isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return str(value)
+    return f"{float(value):.10g}"
+
+
+def table_from_value(value):
+    # Table rows from a list of (x, y) pairs or from text such as "0 0.45; 0.1 0.25" (one row per ';' or line)
+    if isinstance(value, str):
+        rows = value.replace(";", "\n").splitlines()
+        return [row.replace(",", " ").split()[:2] for row in rows if row.strip()]
+    return [[format_number(v) for v in row] for row in value]
+
+
+def table_values(rows):
+    # Numeric view of a table: list of (x, y) floats; empty cells count as 0 like in the editor
+    return [tuple(float(cell) if cell else 0.0 for cell in row[:2]) for row in rows]
+
+
+###############################################################################################################
+# Compressed files
+
+# (name, file name suffixes, magic bytes at the start of the file)
+COMPRESSIONS = [
+    ("gzip", (".gz",), b"\x1f\x8b"),
+    ("xz", (".xz",), b"\xfd7zXZ\x00"),
+    ("zstd", (".zst", ".zstd"), b"\x28\xb5\x2f\xfd"),
+]
+COMPRESSED_SUFFIXES = tuple(suffix for _, suffixes, _ in COMPRESSIONS for suffix in suffixes)
+
+
+def compression_of(filename, head=None):
+    # Compression of a file: from its first bytes when head is given, otherwise from its name
+    for name, suffixes, magic in COMPRESSIONS:
+        if head.startswith(magic) if head is not None else filename.lower().endswith(suffixes):
+            return name
+    return None
+
+
+def strip_compression(filename):
+    # "plants.in.gz" -> "plants.in"
+    lower = filename.lower()
+    for suffix in COMPRESSED_SUFFIXES:
+        if lower.endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd-compressed files need zstandard (pip install zstandard)") from None
+    return zstandard
+
+
+def open_file(filename, mode="r", newline=None):
+    # Text file object for reading ("r") or writing ("w") that (de)compresses on the fly
+    if mode == "r":
+        with open(filename, "rb") as file:
+            compression = compression_of(filename, file.read(6))
+    else:
+        compression = compression_of(filename)
+    if compression is None:
+        return open(filename, mode, newline=newline)
+    if compression == "gzip":
+        return gzip.open(filename, mode + "t", newline=newline)
+    if compression == "xz":
+        return lzma.open(filename, mode + "t", newline=newline)
+    zstandard = _zstandard()
+    raw = open(filename, mode + "b")
+    if mode == "r":
+        stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    else:
+        stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+    return io.TextIOWrapper(stream, newline=newline)
+
+
+###############################################################################################################
+# Parsing
+
+def _value(key, line):
+    count = _TOKENS.get(key, 1)
+    if count is None:
+        return line.strip()
+    tokens = line.split()
+    if key == "flags":
+        tokens = [token.upper() for token in tokens]
+    return " ".join(tokens[:count])
+
+
+def _parse_plant(lines, start, end):
+    # Parse one plant type block into (fields, tables); lines[start] is its "# plant type" line,
+    # lines[end] the next block
+    fields = {key: "" for key in PLANT_FIELDS}
+    tables = [[] for _ in range(NUM_TABLES)]
+    pos = start + 1
+    for key, _ in PLANT_LINES[:-1]:
+        if key in fields:
+            fields[key] = _value(key, lines[pos])
+        pos += 1
+
+    current = -1
+    for line in lines[pos:end]:
+        stripped = line.strip()
+        if stripped.startswith("#"):
+            current += 1
+            if current >= NUM_TABLES:
+                break
+            continue
+        # Anything before the first table header (the editor repeats the row counts there) is skipped
+        if current < 0 or not stripped:
+            continue
+        tables[current].append(stripped.split()[:2])
+    return fields, tables
+
+
+def _parse_block(text, start, end):
+    # Parse the plant type block text[start:end] (from its "# plant type" line to the next block)
+    lines = text[start:end].splitlines()
+    return _parse_plant(lines, 0, len(lines))
+
+
+_PLANT_TYPE = re.compile("# plant type", re.IGNORECASE)
+
+
+def _block_starts(text, pos):
+    # Offsets of the lines starting with "# plant type" (any case, after optional indentation)
+    starts = []
+    for match in _PLANT_TYPE.finditer(text, pos):
+        line_start = text.rfind("\n", 0, match.start()) + 1
+        if not text[line_start:match.start()].strip():
+            starts.append(line_start)
+    return starts
+
+
+@traced(name="plants_io.parse")
+def parse(text):
+    # Parse the text of a plants.in file into a PlantsDocument. Only the general settings are parsed
+    # here; the plant type blocks are located and parsed when they are first used.
+    lines = text.split("\n", len(HEADER_LINES))
+    if len(lines) <= len(HEADER_LINES):
+        raise PlantsFormatError("file is too short to be a plants.in file")
+    doc = PlantsDocument()
+    for i, (key, _) in enumerate(HEADER_LINES):
+        if key is not None:
+            doc.header[key] = _value(key, lines[i])
+
+    body = len(text) - len(lines[-1])
+    starts = _block_starts(text, body)
+    if not starts:
+        raise PlantsFormatError("no '# plant type' block found")
+    starts.append(len(text))
+    for start, end in zip(starts, starts[1:]):
+        # Truncated blocks are reported now; everything else is parsed when the block is first used
+        line_count = text.count("\n", start, end) + (not text.endswith("\n", start, end))
+        if line_count < len(PLANT_LINES):
+            line = text.count("\n", 0, start) + 1
+            raise PlantsFormatError(f"plant type block at line {line} is truncated")
+        doc.plants.append(PlantType(source=(_parse_block, text, start, end)))
+    return doc
+
+
+def read(filename, use_cache=True):
+    # Parse a plants.in file; repeated reads of an unchanged file are served by plants_cache
+    if use_cache:
+        import plants_cache
+        cache = plants_cache.default_cache()
+        if cache is not None:
+            return cache.load(filename)
+    with open_file(filename) as file:
+        return parse(file.read())
+
+
+###############################################################################################################
+# Writing
+
+def format_field(key, value):
+    # Text written for a field value (the output switches are spread out under their names)
+    if key == "flags":
+        return "     ".join(value.split())
+    return value
+
+
+def format_table_header(index):
+    # Comment line introducing table number index (0-based)
+    return f"# (Tab.{index + 1}) [for crop 1 2 3 5] #    {TABLE_HEADERS[index]}\n"
+
+
+def format_table_rows(rows):
+    return "".join("    " + "        ".join(cell if cell else "0" for cell in row) + "\n" for row in rows)
+
+
+def format_table(index, rows):
+    # Comment line plus data lines of table number index (0-based)
+    return format_table_header(index) + format_table_rows(rows)
+
+
+def format_plant_header(number):
+    return f"# plant type {number} **************************************************\n"
+
+
+def format_plant(number, plant):
+    out = [format_plant_header(number)]
+    rows = plant.table_rows()
+    for key, line in PLANT_LINES:
+        value = rows if key == "table_rows" else plant.fields.get(key, "") if key else None
+        out.append((line.format(format_field(key, value)) if key else line) + "\n")
+    for i, table in enumerate(plant.tables):
+        out.append(format_table(i, table))
+    return "".join(out)
+
+
+@traced(name="plants_io.serialize")
+def serialize(doc):
+    # Text of a plants.in file in the layout written by the editor
+    out = []
+    for key, line in HEADER_LINES:
+        out.append((line.format(format_field(key, doc.header.get(key, ""))) if key else line) + "\n")
+    for number, plant in enumerate(doc.plants, start=1):
+        with span("plants_io.format_plant"):
+            out.append(format_plant(number, plant))
+    return "".join(out)
+
+
+def write(doc, filename):
+    text = serialize(doc)
+    with open_file(filename, "w") as file:
+        file.write(text)
+
+
+#####################################################################################################################
@@ -0,0 +1,245 @@
+#############################################################################################################
+
+"""
+Description:
+Format migrations for libraries of plants.in files.
+
+Line 2 of a plants.in file holds its format version. A migration step is a function registered
+with @migration(from_version, to_version) that rewrites the lines of a file. Steps from a version
+to a newer one upgrade the format, and the version line is updated after them. Steps with
+from_version == to_version normalize files of that version before they are upgraded further.
+Steps work on the text lines, so everything a step does not touch keeps its layout byte for byte.
+
+Version 2 is the only format so far, written in two dialects: the hand-written plants.in has the
+comment "(output files)" in the flag names line and lower-case t/f switches, the files written by
+the editor (plants_mod.in) have neither. The registered version 2 steps bring the first dialect to
+the second. A future version 3 is added like this:
+
+    @migration("2", "3")
+    def add_new_parameter(lines):
+        ...
+        return lines
+
+Files are streamed from the directory tree through a pool of worker processes. Every changed file
+is reported with the steps applied and the lines they changed (--report writes the details as
+JSON lines), and each result is parsed again before it is written.
+
+Usage:
+    python plants_migrate.py library/ --in-place --dry-run
+    python plants_migrate.py library/ -o migrated/ --report changes.jsonl
+    python plants_migrate.py --list
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import difflib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+import plants_io
+from plants_transform import iter_library
+
+
+###############################################################################################################
+# Registry
+
+# (from version, to version, name, function) in registration order
+MIGRATIONS = []
+
+VERSION_LINE = 1
+FLAG_NAMES_LINE = 2
+FLAGS_LINE = 3
+TIMESTEP_LINE = 4
+
+
+def migration(from_version, to_version, name=None):
+    # Registers function(lines) -> lines as a step from from_version to to_version
+    def register(function):
+        MIGRATIONS.append((str(from_version), str(to_version), name or function.__name__.replace("_", "-"), function))
+        return function
+    return register
+
+
+def latest_version():
+    versions = {to_version for _, to_version, _, _ in MIGRATIONS}
+    upgraded = {from_version for from_version, to_version, _, _ in MIGRATIONS if from_version != to_version}
+    return max(versions - upgraded, key=lambda version: [int(part) for part in version.split(".")])
+
+
+def plan(version, target):
+    # Steps taking a file from version to target, in order
+    steps = []
+    visited = set()
+    while True:
+        steps += [step for step in MIGRATIONS if step[0] == step[1] == version]
+        if version == target:
+            return steps
+        upgrades = [step for step in MIGRATIONS if step[0] == version != step[1]]
+        if not upgrades or version in visited:
+            raise ValueError(f"no migration from version {version} to version {target}")
+        visited.add(version)
+        steps.append(upgrades[0])
+        version = upgrades[0][1]
+
+
+##########################################
+# Version 2 dialects
+
+@migration("2", "2")
+def flag_names_comment(lines):
+    # "maint_growth (output files)   waterstress" -> "maint_growth   waterstress"
+    lines[FLAG_NAMES_LINE] = re.sub(r"\s*\(output files\)", "", lines[FLAG_NAMES_LINE])
+    return lines
+
+
+@migration("2", "2")
+def switch_case(lines):
+    # t/f -> T/F in the switches and the daily time step, keeping the column alignment
+    lines[FLAGS_LINE] = re.sub(r"(?<!\S)[tf](?!\S)", lambda m: m.group().upper(), lines[FLAGS_LINE])
+    lines[TIMESTEP_LINE] = re.sub(r"^(\s*)([tf])(?!\S)", lambda m: m.group(1) + m.group(2).upper(),
+                                  lines[TIMESTEP_LINE])
+    return lines
+
+
+###############################################################################################################
+# Migrating one file
+
+def file_version(lines):
+    tokens = lines[VERSION_LINE].split() if len(lines) > VERSION_LINE else []
+    if not tokens:
+        raise plants_io.PlantsFormatError("no version number in line 2")
+    return tokens[0]
+
+
+def _line_changes(old, new):
+    # [(line number, old line, new line)]; inserted or removed lines have None on the other side
+    changes = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        for k in range(max(i2 - i1, j2 - j1)):
+            changes.append((i1 + k + 1, old[i1 + k] if i1 + k < i2 else None, new[j1 + k] if j1 + k < j2 else None))
+    return changes
+
+
+def migrate_text(text, target=None):
+    # Returns (new text, version before, version after, [(step name, line changes)])
+    newline = "\r\n" if "\r\n" in text else "\n"
+    lines = text.splitlines()
+    version = file_version(lines)
+    target = target or latest_version()
+    report = []
+    for from_version, to_version, name, function in plan(version, target):
+        new_lines = function(list(lines))
+        if from_version != to_version:
+            new_lines[VERSION_LINE] = re.sub(r"^(\s*)\S+", lambda m: m.group(1) + to_version, new_lines[VERSION_LINE])
+        if new_lines != lines:
+            report.append((name, _line_changes(lines, new_lines)))
+            lines = new_lines
+    if not report:
+        return text, version, target, report
+    new_text = newline.join(lines) + (newline if text.endswith(("\n", "\r")) else "")
+    plants_io.parse(new_text)  # a step must not leave a file the editor cannot read
+    return new_text, version, target, report
+
+
+###############################################################################################################
+# Streaming over a library
+
+_worker = {}
+
+
+def _init_worker(target, dry_run):
+    _worker["target"] = target
+    _worker["dry_run"] = dry_run
+
+
+def _process(job):
+    # Runs in a worker: returns (source, version before, version after, report, error or None)
+    source, target = job
+    try:
+        with plants_io.open_file(source, newline="") as file:
+            text = file.read()
+        new_text, before, after, report = migrate_text(text, _worker["target"])
+    except Exception as e:
+        return source, None, None, [], f"{type(e).__name__}: {e}"
+    if (report or source != target) and not _worker["dry_run"]:
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        with plants_io.open_file(target, "w", newline="") as file:
+            file.write(new_text)
+    return source, before, after, report, None
+
+
+def run(paths, target=None, out_dir=None, dry_run=False, jobs=None, chunksize=64):
+    # Yields worker results as files are processed
+    target = target or latest_version()
+
+    def jobs_iter():
+        for root, path in iter_library(paths):
+            yield path, path if out_dir is None else os.path.join(out_dir, os.path.relpath(path, root))
+
+    with multiprocessing.Pool(jobs, _init_worker, (target, dry_run)) as pool:
+        yield from pool.imap_unordered(_process, jobs_iter(), chunksize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate a library of plants.in files to a newer format")
+    parser.add_argument("paths", nargs="*", help="plants.in files or directories (searched for *.in)")
+    parser.add_argument("--to", default=None, help="target format version (default: the latest)")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("-o", "--out-dir", help="write results here, keeping the directory layout")
+    output.add_argument("--in-place", action="store_true", help="overwrite the input files")
+    parser.add_argument("--dry-run", action="store_true", help="only report the changes")
+    parser.add_argument("--report", help="write the changed lines of every file to this JSON lines file")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: number of cores)")
+    parser.add_argument("--list", action="store_true", help="list the registered migration steps")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for from_version, to_version, name, function in MIGRATIONS:
+            kind = "normalize" if from_version == to_version else "upgrade"
+            print(f"{from_version} -> {to_version}  {kind:9}  {name}")
+        return 0
+    if not args.paths:
+        parser.error("no files or directories given")
+    if not (args.out_dir or args.in_place or args.dry_run):
+        parser.error("one of -o/--out-dir, --in-place or --dry-run is required")
+
+    start = time.perf_counter()
+    total = changed = failed = 0
+    report_file = open(args.report, "w") if args.report else None
+    try:
+        for source, before, after, report, error in run(args.paths, args.to, args.out_dir, args.dry_run, args.jobs):
+            total += 1
+            if error:
+                failed += 1
+                print(f"{source}: {error}", file=sys.stderr)
+                continue
+            if not report:
+                continue
+            changed += 1
+            steps = ", ".join(f"{name} ({len(lines)} line{'s' if len(lines) != 1 else ''})" for name, lines in report)
+            print(f"{source}: {before} -> {after}: {steps}")
+            if report_file:
+                report_file.write(json.dumps({"file": source, "from": before, "to": after,
+                                              "steps": [{"step": name, "changes": lines} for name, lines in report]})
+                                  + "\n")
+    finally:
+        if report_file:
+            report_file.close()
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else 0.0
+    action = "would change" if args.dry_run else "changed"
+    print(f"{total} files in {elapsed:.2f} s ({rate:.0f} files/s): {action} {changed}, failed {failed}",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
@@ -0,0 +1,277 @@
+#############################################################################################################
+
+"""
+Description:
+Overlay files: variants stored as a reference to a base plants.in plus the values that differ.
+
+An overlay is a small JSON file (extension .overlay):
+    {
+      "base": "plants.in",
+      "set":  {"AMX": "70", "tempstart@2": "800", "tab12": [[0, 0.5], [1, 0.2]]},
+      "rows": {"tab13": {"2": "0.5 0.031"}}
+    }
+"base" is relative to the overlay's directory. "set" takes any key accepted by
+PlantsDocument.set(): fields, 'field@N' for plant type N, and whole tables (rows of [x, y] or text
+such as "0 0.5; 1 0.2"). "rows" replaces single rows of a table, given as [x, y] or "x y" (row
+numbers start at 1; the number after the last row appends a row).
+
+OverlayResolver parses each base once and keeps it while the file is unchanged. Resolving an
+overlay works on a copy of the cached base, so the base is never modified; plant types that were
+not parsed yet stay unparsed in the copy. Rendering the text of overlays that set the same keys reuses one compiled PlantsTemplate, so
+generating thousands of variants costs little more than formatting their overridden values.
+
+Usage:
+    python plants_overlay.py make plants.in variant.in -o variant.overlay
+    python plants_overlay.py resolve variant.overlay -o variant.in
+    python plants_overlay.py render overlays/ -o variants.pack
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import plants_archive
+import plants_io
+from plants_template import PlantsTemplate
+
+
+###############################################################################################################
+
+OVERLAY_SUFFIX = ".overlay"
+
+
+def is_overlay(path):
+    return path.lower().endswith(OVERLAY_SUFFIX)
+
+
+class Overlay:
+    # base: path of the base file (absolute, or relative to the overlay's directory);
+    # values: {key: value}; rows: {table key: {row number: [x, y]}}
+    __slots__ = ("base", "values", "rows", "path")
+
+    def __init__(self, base, values=None, rows=None, path=None):
+        self.base = base
+        self.values = dict(values or {})
+        self.rows = {key: dict(table_rows) for key, table_rows in (rows or {}).items()}
+        self.path = path
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            data = json.load(file)
+        if not isinstance(data, dict) or "base" not in data:
+            raise plants_io.PlantsFormatError(f"{path}: an overlay needs a 'base' entry")
+        return cls(data["base"], data.get("set"), data.get("rows"), path)
+
+    def save(self, path):
+        # The base is stored relative to the overlay where possible, so both can be moved together
+        base = self.base_path()
+        try:
+            base = os.path.relpath(base, os.path.dirname(os.path.abspath(path)))
+        except ValueError:
+            pass  # different drive on Windows
+        data = {"base": base, "set": self.values}
+        if self.rows:
+            data["rows"] = self.rows
+        with open(path, "w") as file:
+            json.dump(data, file, indent=2)
+            file.write("\n")
+        self.path = path
+
+    def base_path(self):
+        if os.path.isabs(self.base) or self.path is None:
+            return self.base
+        return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(self.path)), self.base))
+
+
+def apply(doc, overlay):
+    # New document with the overlay applied. Its plant types are copies, so editing the result never
+    # changes doc (a cached base); copies of unparsed plant types stay unparsed.
+    result = doc.copy()
+    for key, value in overlay.values.items():
+        result.set(key, value)
+    for key, table_rows in overlay.rows.items():
+        where, name = plants_io.resolve_key(result, key)
+        if not name.startswith("tab"):
+            raise KeyError(f"{key}: row overrides need a table")
+        rows = list(result.get(key))
+        for number, row in sorted(table_rows.items(), key=lambda item: int(item[0])):
+            index = int(number) - 1
+            if not 0 <= index <= len(rows):
+                raise IndexError(f"{key}: row {number} is beyond the {len(rows)} rows of the table")
+            row = row.replace(",", " ").split()[:2] if isinstance(row, str) else [plants_io.format_number(v) for v in row]
+            if index == len(rows):
+                rows.append(row)
+            else:
+                rows[index] = row
+        where.tables[int(name[3:]) - 1] = rows
+    return result
+
+
+def make_overlay(base_doc, doc, base_path):
+    # Overlay turning base_doc into doc: changed fields, changed rows of tables with the same row
+    # count (whole tables when more than half of the rows changed)
+    if len(base_doc.plants) != len(doc.plants):
+        raise ValueError("an overlay cannot add or remove plant types; save a full plants.in instead")
+    overlay = Overlay(base_path)
+    for key in plants_io.HEADER_FIELDS:
+        if doc.header[key] != base_doc.header[key]:
+            overlay.values[key] = doc.header[key]
+    for n, (base_plant, plant) in enumerate(zip(base_doc.plants, doc.plants), start=1):
+        if plant is base_plant:
+            continue
+        suffix = "" if n == 1 else f"@{n}"
+        for key in plants_io.PLANT_FIELDS:
+            if plant.fields[key] != base_plant.fields[key]:
+                overlay.values[key + suffix] = plant.fields[key]
+        for k, (base_rows, rows) in enumerate(zip(base_plant.tables, plant.tables), start=1):
+            if rows == base_rows:
+                continue
+            changed = [i for i, (a, b) in enumerate(zip(base_rows, rows)) if a != b]
+            if len(rows) == len(base_rows) and len(changed) * 2 <= len(rows):
+                overlay.rows[f"tab{k}{suffix}"] = {str(i + 1): " ".join(rows[i]) for i in changed}
+            else:
+                overlay.values[f"tab{k}{suffix}"] = "; ".join(" ".join(row) for row in rows)
+    return overlay
+
+
+###############################################################################################################
+
+class OverlayResolver:
+    # Parses every base file once (while it is unchanged) and applies overlays to the cached base.
+    # The caches are shared by threads (e.g. the connections of plants_service.py) under one lock.
+    def __init__(self, max_bases=16, max_templates=64):
+        self.max_bases = max_bases
+        self.max_templates = max_templates
+        self._bases = OrderedDict()      # path -> (mtime_ns, size, document)
+        self._templates = OrderedDict()  # (path, mtime_ns, keys) -> PlantsTemplate
+        self._lock = threading.Lock()
+
+    def _base_entry(self, path):
+        # (mtime_ns, size, document) of a base file, parsed again when it changed
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._bases.get(path)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                self._bases.move_to_end(path)
+                return entry
+        # Parsed outside the lock; two threads may parse the same new base, the later one is kept
+        entry = (stat.st_mtime_ns, stat.st_size, plants_io.read(path))
+        with self._lock:
+            self._bases[path] = entry
+            self._bases.move_to_end(path)
+            while len(self._bases) > self.max_bases:
+                self._bases.popitem(last=False)
+        return entry
+
+    def base(self, path):
+        return self._base_entry(path)[2]
+
+    def resolve(self, overlay):
+        if isinstance(overlay, str):
+            overlay = Overlay.load(overlay)
+        return apply(self.base(overlay.base_path()), overlay)
+
+    def render(self, overlay):
+        # plants.in text of an overlay; overlays setting the same keys share a compiled template
+        if isinstance(overlay, str):
+            overlay = Overlay.load(overlay)
+        if overlay.rows:
+            return plants_io.serialize(self.resolve(overlay))
+        path = os.path.abspath(overlay.base_path())
+        mtime_ns, _, doc = self._base_entry(path)
+        key = (path, mtime_ns, tuple(sorted(overlay.values)))
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+        if template is None:
+            template = PlantsTemplate(doc, key[2])
+            with self._lock:
+                self._templates[key] = template
+                while len(self._templates) > self.max_templates:
+                    self._templates.popitem(last=False)
+        return template.render(overlay.values)
+
+
+_resolver = []
+
+
+def default_resolver():
+    if not _resolver:
+        _resolver.append(OverlayResolver())
+    return _resolver[0]
+
+
+def read(path):
+    # A document from a plants.in file or an overlay
+    if is_overlay(path):
+        return default_resolver().resolve(path)
+    return plants_io.read(path)
+
+
+###############################################################################################################
+
+def iter_overlays(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if is_overlay(name):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create, resolve and render plants.in overlays")
+    commands = parser.add_subparsers(dest="command", required=True)
+    make_parser = commands.add_parser("make", help="overlay with the differences of a file from a base")
+    make_parser.add_argument("base", help="base plants.in")
+    make_parser.add_argument("variant", help="full plants.in of the variant")
+    make_parser.add_argument("-o", "--output", required=True, help="overlay file to write")
+    resolve_parser = commands.add_parser("resolve", help="write the full plants.in of an overlay")
+    resolve_parser.add_argument("overlay")
+    resolve_parser.add_argument("-o", "--output", help="output file (default: standard output)")
+    render_parser = commands.add_parser("render", help="render many overlays into a directory or archive")
+    render_parser.add_argument("overlays", nargs="+", help="overlay files or directories")
+    render_parser.add_argument("-o", "--output", required=True, help="directory or .zip/.tar/.pack archive")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "make":
+            base = plants_io.read(args.base)
+            overlay = make_overlay(base, plants_io.read(args.variant), os.path.abspath(args.base))
+            overlay.save(args.output)
+            print(f"{args.output}: {len(overlay.values)} values, {sum(map(len, overlay.rows.values()))} rows",
+                  file=sys.stderr)
+        elif args.command == "resolve":
+            text = default_resolver().render(args.overlay)
+            if args.output:
+                with open(args.output, "w") as file:
+                    file.write(text)
+            else:
+                sys.stdout.write(text)
+        else:
+            resolver = default_resolver()
+            start = time.perf_counter()
+            variants = ((os.path.splitext(os.path.basename(path))[0], resolver.render(path))
+                        for path in iter_overlays(args.overlays))
+            count = plants_archive.write_archive(variants, args.output)
+            print(f"rendered {count} overlays in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+    except (OSError, ValueError, KeyError, IndexError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
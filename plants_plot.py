@@ -0,0 +1,235 @@
+#############################################################################################################
+
+"""
+Description:
+Plot pane for the lookup tables of the editor's Tabular Data tab.
+
+TablePlot draws the table shown next to it as a piecewise-linear curve and follows cell edits as
+they happen. For level of detail the values of column 2 are kept in a min/max pyramid: level k
+holds the row indices of the minimum and maximum of every block of 2**(k+1) rows. A redraw picks
+the finest level with no more blocks than the plot is pixels wide and draws the minimum and
+maximum point of every block in row order, so the drawn line keeps every spike of the table while
+a redraw costs the same for ten rows or a million. Editing a cell updates one block per level,
+adding or removing the last row likewise.
+
+A second table (the same table of the default plants.in or of another open document) can be drawn
+behind the curve for comparison.
+
+Usage:
+    plot = TablePlot()
+    plot.set_rows([["0", "0.5"], ["1", "0.2"]])
+    plot.set_cell(1, 1, "0.3")
+    plot.set_overlay(other_rows, "plants.in")
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtCore import Qt, QPointF, QRectF
+from PyQt5.QtGui import QPainter, QColor, QPen, QPolygonF
+
+
+###############################################################################################################
+
+def _float(text):
+    # Empty or unreadable cells count as 0, as the editor writes "0" for empty cells
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class MinMaxPyramid:
+    # Indices of the minimum and maximum of blocks of 2, 4, 8, ... values
+    def __init__(self, values):
+        self.values = values
+        self.levels = []  # [(minimum indices, maximum indices)] per block size 2**(k+1)
+        self.rebuild()
+
+    def rebuild(self):
+        values = self.values
+        self.levels = []
+        lo = hi = range(len(values))
+        while len(lo) > 1:
+            odd = len(lo) % 2
+            lo = [a if values[a] <= values[b] else b for a, b in zip(lo[0::2], lo[1::2])] + ([lo[-1]] if odd else [])
+            hi = [a if values[a] >= values[b] else b for a, b in zip(hi[0::2], hi[1::2])] + ([hi[-1]] if odd else [])
+            self.levels.append((lo, hi))
+
+    def update(self, index):
+        # Recomputes the blocks containing index after values[index] changed, was appended or removed
+        values = self.values
+        size = len(values)
+        below_lo = below_hi = None  # None: the blocks below are the values themselves
+        k = 0
+        while size > 1:
+            below_size = size
+            size = (size + 1) // 2
+            if k == len(self.levels):
+                self.levels.append(([], []))
+            lo, hi = self.levels[k]
+            del lo[size:], hi[size:]
+            block = index >> (k + 1)
+            if block < size:
+                children = [c for c in (2 * block, 2 * block + 1) if c < below_size]
+                low = [below_lo[c] for c in children] if below_lo is not None else children
+                high = [below_hi[c] for c in children] if below_hi is not None else children
+                low, high = min(low, key=values.__getitem__), max(high, key=values.__getitem__)
+                if block == len(lo):
+                    lo.append(low)
+                    hi.append(high)
+                else:
+                    lo[block], hi[block] = low, high
+            below_lo, below_hi = lo, hi
+            k += 1
+        del self.levels[k:]
+
+    def extremes(self):
+        # (index of the minimum, index of the maximum), or None without values
+        if not self.values:
+            return None
+        if not self.levels:
+            return 0, 0
+        lo, hi = self.levels[-1]
+        return lo[0], hi[0]
+
+    def decimate(self, blocks):
+        # Row indices to draw with at most about 2 * blocks points
+        count = len(self.values)
+        if count <= 2 * blocks:
+            return list(range(count))
+        k = 0
+        while (count + (2 << k) - 1) >> (k + 1) > blocks:
+            k += 1
+        lo, hi = self.levels[k]
+        indices = [0]
+        for a, b in zip(lo, hi):
+            indices += (a, b) if a <= b else (b, a)
+        indices.append(count - 1)
+        return indices
+
+
+class Curve:
+    # Column 1 and 2 of a table as floats with min/max pyramids for both
+    def __init__(self, rows):
+        self.xs = [_float(row[0]) if len(row) > 0 else 0.0 for row in rows]
+        self.ys = [_float(row[1]) if len(row) > 1 else 0.0 for row in rows]
+        self.x_pyramid = MinMaxPyramid(self.xs)
+        self.y_pyramid = MinMaxPyramid(self.ys)
+
+    def __len__(self):
+        return len(self.xs)
+
+    def set(self, row, column, text):
+        (self.xs if column == 0 else self.ys)[row] = _float(text)
+        (self.x_pyramid if column == 0 else self.y_pyramid).update(row)
+
+    def append(self, x=0.0, y=0.0):
+        self.xs.append(x)
+        self.ys.append(y)
+        self.x_pyramid.update(len(self.xs) - 1)
+        self.y_pyramid.update(len(self.ys) - 1)
+
+    def pop(self):
+        self.xs.pop()
+        self.ys.pop()
+        self.x_pyramid.update(len(self.xs))
+        self.y_pyramid.update(len(self.ys))
+
+    def bounds(self):
+        # (x min, x max, y min, y max), or None for an empty table
+        x, y = self.x_pyramid.extremes() or (None, None), self.y_pyramid.extremes() or (None, None)
+        if x[0] is None:
+            return None
+        return self.xs[x[0]], self.xs[x[1]], self.ys[y[0]], self.ys[y[1]]
+
+    def points(self, blocks):
+        xs, ys = self.xs, self.ys
+        return [(xs[i], ys[i]) for i in self.y_pyramid.decimate(blocks)]
+
+
+###############################################################################################################
+
+class TablePlot(QWidget):
+    # Curve of one table, with an optional comparison curve drawn behind it
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumSize(260, 220)
+        self.curve = Curve([])
+        self.overlay = None
+        self.overlay_label = ""
+        self.title = ""
+
+    def set_rows(self, rows, title=""):
+        self.curve = Curve(rows)
+        self.title = title
+        self.update()
+
+    def set_cell(self, row, column, text):
+        if 0 <= row < len(self.curve) and column in (0, 1):
+            self.curve.set(row, column, text)
+            self.update()
+
+    def append_row(self, x=0.0, y=0.0):
+        self.curve.append(x, y)
+        self.update()
+
+    def pop_row(self):
+        if len(self.curve):
+            self.curve.pop()
+            self.update()
+
+    def set_overlay(self, rows, label=""):
+        self.overlay = Curve(rows) if rows is not None else None
+        self.overlay_label = label
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        left, top = 55, 22
+        width, height = self.width() - left - 10, self.height() - top - 25
+        curves = [c for c in (self.overlay, self.curve) if c is not None and len(c)]
+        if width <= 0 or height <= 0 or not curves:
+            painter.drawText(self.rect(), Qt.AlignCenter, "No rows")
+            return
+        bounds = [c.bounds() for c in curves]
+        x0, x1 = min(b[0] for b in bounds), max(b[1] for b in bounds)
+        y0, y1 = min(b[2] for b in bounds), max(b[3] for b in bounds)
+        x1 = x1 if x1 > x0 else x0 + 1.0
+        y1 = y1 if y1 > y0 else y0 + 1.0
+        sx, sy = width / (x1 - x0), height / (y1 - y0)
+
+        def polygon(points):
+            return QPolygonF([QPointF(left + (x - x0) * sx, top + height - (y - y0) * sy) for x, y in points])
+
+        # Wide or antialiased pens make Qt stroke a long zigzag line as one slow path, so they are
+        # only used for tables with few rows
+        detailed = all(len(c) <= width // 8 for c in curves)
+        painter.setRenderHint(QPainter.Antialiasing, detailed)
+        painter.setPen(QColor(200, 200, 200))
+        painter.drawRect(QRectF(left, top, width, height))
+        if self.overlay is not None and len(self.overlay):
+            painter.setPen(QPen(QColor(150, 150, 150), 1.5 if detailed else 0, Qt.DashLine))
+            painter.drawPolyline(polygon(self.overlay.points(width)))
+        if len(self.curve):
+            line = polygon(self.curve.points(width))
+            painter.setPen(QPen(QColor(60, 90, 160), 2 if detailed else 0))
+            painter.drawPolyline(line)
+            if detailed:
+                # Few rows: mark the table points themselves
+                painter.setBrush(QColor(60, 90, 160))
+                for point in line:
+                    painter.drawEllipse(point, 2.5, 2.5)
+        painter.setPen(Qt.black)
+        painter.drawText(left, 15, self.title)
+        if self.overlay is not None:
+            painter.setPen(QColor(120, 120, 120))
+            painter.drawText(QRectF(left, 2, width, 16), Qt.AlignRight, f"- - {self.overlay_label}")
+            painter.setPen(Qt.black)
+        painter.drawText(left, top + height + 18, f"{x0:.4g}")
+        painter.drawText(QRectF(left, top + height + 5, width, 16), Qt.AlignRight, f"{x1:.4g}")
+        painter.drawText(5, top + 12, f"{y1:.3g}")
+        painter.drawText(5, top + height, f"{y0:.3g}")
+
+
+#####################################################################################################################
@@ -0,0 +1,257 @@
+#############################################################################################################
+
+"""
+Description:
+HTML review reports for sets of plants.in configurations.
+
+Every configuration gets one HTML page: the general settings and, per plant type, the scalar
+parameters with their units and descriptions (the labels and tooltips of the editor form) and a
+plot of each of the 17 tables with its rows. Plots are inline SVG, so a page needs no scripts,
+images or network access; all pages share one style sheet (assets/report.css) and are listed on
+an index page (index.html). Pages are rendered by a pool of worker processes while the inputs are
+streamed from files, directories (searched for *.in) and archives (.zip/.tar/.pack).
+
+Usage:
+    python plants_report.py library/ -o reports/
+    python plants_report.py variants.pack plants.in -o reports/ -j 4
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import html
+import multiprocessing
+import os
+import sys
+import time
+from urllib.parse import quote
+
+import plants_archive
+import plants_io
+from plants_columnar import iter_sources
+
+
+###############################################################################################################
+# Shared assets
+
+ASSET_DIR = "assets"
+STYLE_SHEET = "report.css"
+
+STYLE = """\
+body { font-family: sans-serif; margin: 2em; color: #222; }
+h1 { font-size: 1.5em; } h2 { font-size: 1.25em; margin-top: 2em; border-bottom: 1px solid #ccc; }
+table.fields { border-collapse: collapse; margin: 0.5em 0 1.5em; }
+table.fields td, table.fields th { border-bottom: 1px solid #eee; padding: 0.2em 0.8em; text-align: left; }
+table.fields td.value { font-family: monospace; white-space: nowrap; }
+td.description { color: #666; font-size: 0.9em; }
+tr[title] { cursor: help; }
+.tables { display: flex; flex-wrap: wrap; gap: 1em; }
+figure { margin: 0; width: 300px; }
+figcaption { font-size: 0.85em; height: 3em; }
+svg .axes { fill: none; stroke: #ccc; } svg .curve { fill: none; stroke: #3c5aa0; stroke-width: 1.5; }
+svg circle { fill: #3c5aa0; } svg text { font-size: 10px; fill: #444; }
+details table { font-family: monospace; font-size: 0.85em; }
+details td { padding: 0 0.8em; text-align: right; }
+.error { color: #b00; }
+"""
+
+
+def write_assets(out_dir):
+    os.makedirs(os.path.join(out_dir, ASSET_DIR), exist_ok=True)
+    with open(os.path.join(out_dir, ASSET_DIR, STYLE_SHEET), "w") as file:
+        file.write(STYLE)
+
+
+###############################################################################################################
+# One report
+
+def _decimate(points, buckets):
+    # Keeps the lowest and highest point of every bucket of rows, so long tables keep their peaks
+    if len(points) <= 2 * buckets:
+        return points
+    size = len(points) / buckets
+    kept = []
+    for b in range(buckets):
+        block = range(int(b * size), int((b + 1) * size))
+        low = min(block, key=lambda i: points[i][1])
+        high = max(block, key=lambda i: points[i][1])
+        kept += [points[i] for i in sorted((low, high))]
+    return [points[0]] + kept + [points[-1]]
+
+
+def svg_plot(rows, width=300, height=170):
+    # Piecewise-linear curve of a table as an inline SVG element
+    left, top, right, bottom = 42, 8, 8, 18
+    w, h = width - left - right, height - top - bottom
+    out = [f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}">',
+           f'<rect class="axes" x="{left}" y="{top}" width="{w}" height="{h}"/>']
+    points = plants_io.table_values(rows)
+    if not points:
+        out.append(f'<text x="{left + w / 2}" y="{top + h / 2}" text-anchor="middle">no rows</text></svg>')
+        return "".join(out)
+    xs, ys = [x for x, _ in points], [y for _, y in points]
+    x0, x1, y0, y1 = min(xs), max(xs), min(ys), max(ys)
+    x1 = x1 if x1 > x0 else x0 + 1.0
+    y1 = y1 if y1 > y0 else y0 + 1.0
+    pixels = [(left + w * (x - x0) / (x1 - x0), top + h * (1.0 - (y - y0) / (y1 - y0)))
+              for x, y in _decimate(points, w)]
+    out.append('<polyline class="curve" points="' + " ".join(f"{px:.1f},{py:.1f}" for px, py in pixels) + '"/>')
+    if len(points) <= 40:
+        out += [f'<circle cx="{px:.1f}" cy="{py:.1f}" r="2"/>' for px, py in pixels]
+    out.append(f'<text x="{left}" y="{height - 4}">{x0:.4g}</text>'
+               f'<text x="{width - right}" y="{height - 4}" text-anchor="end">{x1:.4g}</text>'
+               f'<text x="{left - 4}" y="{top + 9}" text-anchor="end">{y1:.3g}</text>'
+               f'<text x="{left - 4}" y="{top + h}" text-anchor="end">{y0:.3g}</text></svg>')
+    return "".join(out)
+
+
+def _field_rows(items):
+    # <tr> elements for (key, value) pairs; the description doubles as the row's tooltip
+    out = []
+    for key, value in items:
+        description = plants_io.FIELD_DESCRIPTIONS.get(key, "")
+        title = f' title="{html.escape(description)}"' if description else ""
+        out.append(f'<tr{title}><th>{html.escape(plants_io.FIELD_LABELS.get(key, key))}</th>'
+                   f'<td class="value">{html.escape(value)}</td>'
+                   f'<td class="description">{html.escape(description)}</td></tr>')
+    return "".join(out)
+
+
+def render_report(member, doc, asset_prefix=""):
+    # HTML page for one configuration; asset_prefix leads from the page to the report directory
+    header = doc.header
+    flags = header.get("flags", "").split()
+    out = ["<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">",
+           f"<title>{html.escape(member)}</title>",
+           f'<link rel="stylesheet" href="{asset_prefix}{ASSET_DIR}/{STYLE_SHEET}">',
+           f'</head><body>\n<p><a href="{asset_prefix}index.html">All configurations</a></p>',
+           f"<h1>{html.escape(member)}</h1>",
+           '<h2>General settings</h2>\n<table class="fields">',
+           _field_rows((key, header.get(key, "")) for key in plants_io.HEADER_FIELDS if key != "flags"),
+           _field_rows((name, flags[i] if i < len(flags) else "") for i, name in enumerate(plants_io.FLAG_NAMES)),
+           "</table>"]
+    for number, plant in enumerate(doc.plants, start=1):
+        out.append(f"<h2>Plant type {number}: {html.escape(plant.fields['plant_type_name'])}</h2>")
+        out.append('<table class="fields">')
+        out.append(_field_rows((key, plant.fields[key]) for key in plants_io.PLANT_FIELDS if key != "plant_type_name"))
+        out.append('</table>\n<div class="tables">')
+        for k, rows in enumerate(plant.tables):
+            cells = "".join(f"<tr><td>{html.escape(' '.join(row[:1]))}</td><td>{html.escape(' '.join(row[1:2]))}</td></tr>"
+                            for row in rows)
+            out.append(f"<figure><figcaption>Table {k + 1}: {html.escape(plants_io.TABLE_HEADERS[k])}</figcaption>"
+                       f"{svg_plot(rows)}<details><summary>{len(rows)} rows</summary><table>{cells}</table>"
+                       f"</details></figure>")
+        out.append("</div>")
+    out.append("</body></html>\n")
+    return "\n".join(out)
+
+
+def page_path(member):
+    # Page of a configuration, relative to the report directory
+    return member.replace(os.sep, "/") + ".html"
+
+
+def summary(member, doc):
+    return {"id": member, "plants": [plant.fields["plant_type_name"] for plant in doc.plants],
+            "start_date": doc.header["start_date"], "latitude": doc.header["latitude"]}
+
+
+###############################################################################################################
+# Index page and pool
+
+def write_index(out_dir, summaries, failed):
+    out = ["<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>plants.in reports</title>",
+           f'<link rel="stylesheet" href="{ASSET_DIR}/{STYLE_SHEET}"></head><body>',
+           f"<h1>{len(summaries)} configurations</h1>",
+           '<table class="fields"><tr><th>Configuration</th><th>Plant types</th><th>Start date</th>'
+           "<th>Latitude</th></tr>"]
+    for entry in sorted(summaries, key=lambda entry: entry["id"]):
+        out.append(f'<tr><td><a href="{quote(page_path(entry["id"]))}">{html.escape(entry["id"])}</a></td>'
+                   f'<td>{html.escape(", ".join(entry["plants"]))}</td>'
+                   f'<td class="value">{html.escape(entry["start_date"])}</td>'
+                   f'<td class="value">{html.escape(entry["latitude"])}</td></tr>')
+    out.append("</table>")
+    if failed:
+        out.append(f"<h2>{len(failed)} configurations could not be read</h2><ul>")
+        out += [f'<li><span class="error">{html.escape(member)}</span>: {html.escape(error)}</li>'
+                for member, error in sorted(failed)]
+        out.append("</ul>")
+    out.append("</body></html>\n")
+    with open(os.path.join(out_dir, "index.html"), "w") as file:
+        file.write("\n".join(out))
+
+
+_worker = {}
+
+
+def _init_worker(out_dir):
+    _worker["out_dir"] = out_dir
+
+
+def _render(job):
+    # Runs in a worker: returns (ID, summary or None, error or None)
+    member, text = job
+    try:
+        doc = plants_io.parse(text)
+        path = os.path.join(_worker["out_dir"], page_path(member))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        page = render_report(member, doc, "../" * page_path(member).count("/"))
+        with open(path, "w") as file:
+            file.write(page)
+        return member, summary(member, doc), None
+    except Exception as e:
+        return member, None, f"{type(e).__name__}: {e}"
+
+
+def _jobs(sources, out_dir, failed):
+    # (ID, text) jobs for the pool. IDs whose page would lie outside the report directory are added
+    # to failed; a repeated ID gets a suffix (ID_2, ...), so no page overwrites another one
+    seen = {"index.html"}
+    for member, text in iter_sources(sources):
+        try:
+            plants_archive.safe_path(out_dir, page_path(member))
+        except ValueError as e:
+            failed.append((member, str(e)))
+            continue
+        name = member
+        suffix = 1
+        while os.path.normpath(page_path(name)) in seen:
+            suffix += 1
+            name = f"{member}_{suffix}"
+        seen.add(os.path.normpath(page_path(name)))
+        yield name, text
+
+
+def generate(sources, out_dir, jobs=None, chunksize=16):
+    # Writes a page per configuration, the shared assets and the index; returns (pages, failed)
+    write_assets(out_dir)
+    summaries, failed = [], []
+    with multiprocessing.Pool(jobs, _init_worker, (out_dir,)) as pool:
+        for member, entry, error in pool.imap_unordered(_render, _jobs(sources, out_dir, failed), chunksize):
+            if error:
+                failed.append((member, error))
+            else:
+                summaries.append(entry)
+    write_index(out_dir, summaries, failed)
+    return len(summaries), failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render HTML review reports for plants.in configurations")
+    parser.add_argument("sources", nargs="+", help="plants.in files, directories or archives")
+    parser.add_argument("-o", "--out-dir", default="reports", help="report directory (default: reports)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: number of cores)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    count, failed = generate(args.sources, args.out_dir, args.jobs)
+    for member, error in failed:
+        print(f"{member}: {error}", file=sys.stderr)
+    print(f"wrote {count} reports to {os.path.join(args.out_dir, 'index.html')} in "
+          f"{time.perf_counter() - start:.2f} s" + (f", {len(failed)} failed" if failed else ""), file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
@@ -0,0 +1,298 @@
+#############################################################################################################
+
+"""
+Description:
+"Run" tab of the AgroC plants.in editor.
+
+Queuing a run saves the current document to its own run directory (<work dir>/<run name>/plants.in)
+and adds it to a queue. A small pool of QProcess workers starts the configured simulator on queued
+runs as slots become free. Output arrives through Qt signals, so the GUI thread never waits on a
+process (except for a short bounded wait when the application quits); the log of the selected run is shown live. The simulator command defaults to the
+AGROC_EXE environment variable and can be pointed at the stand-in script agroc_stub.py.
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import os
+import time
+
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QFormLayout, QLineEdit, QSpinBox,
+                             QPushButton, QFileDialog, QListWidget, QListWidgetItem, QPlainTextEdit,
+                             QSplitter, QLabel, QApplication)
+from PyQt5.QtCore import Qt, QProcess, QTimer
+
+import plants_runner
+
+
+###############################################################################################################
+
+class QueuedRun:
+    # One queued/running/finished simulation and its captured output
+    def __init__(self, name, workdir, command, timeout):
+        self.name = name
+        self.workdir = workdir
+        self.command = command
+        self.timeout = timeout
+        self.status = "pending"
+        self.log = []
+        self.process = None
+        self.start_time = None
+        self.duration = None
+        self.item = None
+
+    def label(self):
+        text = f"{self.name}  [{self.status}]"
+        if self.duration is not None:
+            text += f"  {self.duration:.1f} s"
+        return text
+
+
+class RunPanel(QWidget):
+    # Queue of simulator runs executed by a bounded pool of QProcess workers
+
+    def __init__(self, document_text, parent=None):
+        # document_text: callable returning the plants.in text of the current document
+        super().__init__(parent)
+        self.document_text = document_text
+        self.runs = {}  # run number (the queue item's UserRole data) -> QueuedRun, until cleared
+        self.next_run = 0
+        self.pending = []
+        self.running = []
+        self.counter = 0
+
+        layout = QVBoxLayout(self)
+        settings = QFormLayout()
+
+        exe_layout = QHBoxLayout()
+        self.exe_input = QLineEdit(os.environ.get(plants_runner.ENV_EXE, "agroc"))
+        self.exe_input.setToolTip("Simulator command, e.g. ./agroc or \"python agroc_stub.py\".")
+        browse_button = QPushButton("Browse...")
+        browse_button.clicked.connect(self.browse_executable)
+        exe_layout.addWidget(self.exe_input)
+        exe_layout.addWidget(browse_button)
+        settings.addRow("Simulator Command:", exe_layout)
+
+        self.workdir_input = QLineEdit(os.path.abspath("runs"))
+        self.workdir_input.setToolTip("Each run gets its own directory below this one.")
+        settings.addRow("Run Directory:", self.workdir_input)
+
+        self.jobs_input = QSpinBox()
+        self.jobs_input.setRange(1, 256)
+        self.jobs_input.setValue(os.cpu_count() or 1)
+        self.jobs_input.valueChanged.connect(self.start_pending)
+        settings.addRow("Parallel Runs:", self.jobs_input)
+
+        self.timeout_input = QSpinBox()
+        self.timeout_input.setRange(0, 7 * 24 * 3600)
+        self.timeout_input.setSuffix(" s")
+        self.timeout_input.setSpecialValueText("no timeout")
+        settings.addRow("Timeout:", self.timeout_input)
+
+        self.name_input = QLineEdit()
+        self.name_input.setPlaceholderText("optional, e.g. wet_year")
+        settings.addRow("Run Name:", self.name_input)
+        layout.addLayout(settings)
+
+        button_layout = QHBoxLayout()
+        queue_button = QPushButton("Queue Current Document")
+        queue_button.clicked.connect(self.queue_current)
+        cancel_button = QPushButton("Cancel Selected")
+        cancel_button.clicked.connect(self.cancel_selected)
+        clear_button = QPushButton("Clear Finished")
+        clear_button.clicked.connect(self.clear_finished)
+        button_layout.addWidget(queue_button)
+        button_layout.addWidget(cancel_button)
+        button_layout.addWidget(clear_button)
+        layout.addLayout(button_layout)
+
+        splitter = QSplitter(Qt.Vertical)
+        self.queue_list = QListWidget()
+        self.queue_list.currentItemChanged.connect(self.show_selected_log)
+        self.log_view = QPlainTextEdit()
+        self.log_view.setReadOnly(True)
+        self.log_view.setMaximumBlockCount(20000)
+        splitter.addWidget(self.queue_list)
+        splitter.addWidget(self.log_view)
+        layout.addWidget(splitter)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+        self.update_status()
+        QApplication.instance().aboutToQuit.connect(self.shutdown)
+
+    ##########################################
+
+    def browse_executable(self):
+        filename, _ = QFileDialog.getOpenFileName(self, "Select Simulator")
+        if filename:
+            self.exe_input.setText(filename)
+
+    def queue_current(self):
+        # Save the current document into a fresh run directory and queue it
+        self.counter += 1
+        base = self.name_input.text().strip() or f"run_{self.counter:03d}"
+        if "/" in base or "\\" in base or base in (os.curdir, os.pardir):
+            self.status_label.setText(f"Invalid run name {base!r}: a run name cannot contain / or \\")
+            return None
+        root = self.workdir_input.text().strip() or "runs"
+        name = base
+        suffix = 1
+        while os.path.exists(os.path.join(root, name)):
+            suffix += 1
+            name = f"{base}_{suffix}"
+        try:
+            workdir = plants_runner.prepare_workdir(root, name, self.document_text())
+        except (OSError, ValueError) as e:
+            self.status_label.setText(f"Could not create run directory: {e}")
+            return None
+        # The command and timeout are fixed when queuing, so later edits only affect new runs
+        command = plants_runner.simulator_command(self.exe_input.text().strip())
+        run = QueuedRun(name, workdir, command, self.timeout_input.value())
+        run.item = QListWidgetItem(run.label())
+        run.item.setData(Qt.UserRole, self.next_run)
+        self.runs[self.next_run] = run
+        self.next_run += 1
+        self.pending.append(run)
+        self.queue_list.addItem(run.item)
+        self.start_pending()
+        return run
+
+    def start_pending(self):
+        # Fill free worker slots from the queue
+        while self.pending and len(self.running) < self.jobs_input.value():
+            self.start_run(self.pending.pop(0))
+        self.update_status()
+
+    def start_run(self, run):
+        process = QProcess(self)
+        process.setWorkingDirectory(run.workdir)
+        process.readyReadStandardOutput.connect(lambda: self.read_output(run, process.readAllStandardOutput()))
+        process.readyReadStandardError.connect(lambda: self.read_output(run, process.readAllStandardError()))
+        process.finished.connect(lambda code, exit_status: self.run_finished(run, code, exit_status))
+        process.errorOccurred.connect(lambda error: self.run_error(run, error))
+        run.process = process
+        run.status = "running"
+        run.start_time = time.perf_counter()
+        self.running.append(run)
+        self.refresh_item(run)
+        process.start(run.command[0], run.command[1:])
+        if run.timeout:
+            QTimer.singleShot(run.timeout * 1000, lambda: self.timeout_run(run))
+
+    ##########################################
+
+    def read_output(self, run, data):
+        text = bytes(data).decode(errors="replace")
+        run.log.append(text)
+        if self.selected_run() is run:
+            self.log_view.moveCursor(self.log_view.textCursor().End)
+            self.log_view.insertPlainText(text)
+
+    def run_finished(self, run, code, exit_status):
+        if run not in self.running:
+            return
+        self.running.remove(run)
+        run.duration = time.perf_counter() - run.start_time
+        if run.status == "running":
+            run.status = "finished" if exit_status == QProcess.NormalExit and code == 0 else f"failed ({code})"
+        self.write_logs(run)
+        self.release_process(run)
+        self.refresh_item(run)
+        self.start_pending()
+
+    def run_error(self, run, error):
+        # Only start failures end a run here; crashes are reported through finished()
+        if error == QProcess.FailedToStart and run in self.running:
+            self.running.remove(run)
+            run.status = "could not start"
+            run.log.append(f"Could not start simulator: {run.process.errorString()}\n")
+            self.release_process(run)
+            self.refresh_item(run)
+            self.start_pending()
+
+    def timeout_run(self, run):
+        if run in self.running:
+            run.status = "timed out"
+            run.process.kill()
+
+    def cancel_selected(self):
+        run = self.selected_run()
+        if run is None:
+            return
+        if run in self.pending:
+            self.pending.remove(run)
+            run.status = "cancelled"
+            self.refresh_item(run)
+        elif run in self.running:
+            run.status = "cancelled"
+            run.process.kill()
+        self.update_status()
+
+    def kill_all(self):
+        # Cancels the queue and kills the running processes without waiting; finished() then cleans
+        # up each run as usual
+        for run in self.pending:
+            run.status = "cancelled"
+            self.refresh_item(run)
+        self.pending = []
+        for run in self.running:
+            run.status = "cancelled"
+            run.process.kill()
+        self.update_status()
+
+    def shutdown(self, timeout_ms=500):
+        # Stops all runs when the application quits, before Qt destroys the running processes. The
+        # event loop has ended, so finished() never arrives: this is the one place that waits on a
+        # process, for at most timeout_ms for all of them together.
+        for run in self.running:
+            run.process.blockSignals(True)
+        self.kill_all()
+        deadline = time.perf_counter() + timeout_ms / 1000.0
+        for run in self.running:
+            remaining = int((deadline - time.perf_counter()) * 1000)
+            if run.process.state() != QProcess.NotRunning and remaining > 0:
+                run.process.waitForFinished(remaining)
+        self.running = []
+
+    def clear_finished(self):
+        # Drops finished runs from the list and from memory; their logs stay in the run directories
+        for row in reversed(range(self.queue_list.count())):
+            key = self.queue_list.item(row).data(Qt.UserRole)
+            run = self.runs[key]
+            if run not in self.pending and run not in self.running:
+                self.queue_list.takeItem(row)
+                del self.runs[key]
+        self.update_status()
+
+    ##########################################
+
+    def release_process(self, run):
+        # Finished QProcess objects are owned by the panel; free them instead of keeping one per run
+        run.process.deleteLater()
+        run.process = None
+
+    def write_logs(self, run):
+        try:
+            with open(os.path.join(run.workdir, "run.log"), "w") as file:
+                file.write("".join(run.log))
+        except OSError:
+            pass
+
+    def selected_run(self):
+        item = self.queue_list.currentItem()
+        return self.runs[item.data(Qt.UserRole)] if item is not None else None
+
+    def show_selected_log(self, item, _previous=None):
+        run = self.runs[item.data(Qt.UserRole)] if item is not None else None
+        self.log_view.setPlainText("".join(run.log) if run else "")
+
+    def refresh_item(self, run):
+        if run.item is not None:
+            run.item.setText(run.label())
+        self.update_status()
+
+    def update_status(self):
+        done = len(self.runs) - len(self.pending) - len(self.running)
+        self.status_label.setText(f"{len(self.running)} running, {len(self.pending)} queued, {done} done")
+
+
+#####################################################################################################################
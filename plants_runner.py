@@ -0,0 +1,230 @@
+#############################################################################################################
+
+"""
+Description:
+Asyncio orchestrator that runs the AgroC simulator over a set of generated plants.in files.
+
+Every input gets its own working directory (<work-dir>/<ID>/) containing the input as plants.in
+plus any shared files given with --include; a repeated ID gets a suffix (<ID>_2, ...). The simulator is started there with bounded
+concurrency (one process per core by default). stdout and stderr are streamed line by line to
+the console and to stdout.log/stderr.log in the working directory; a run that exceeds the timeout
+is killed. A summary with exit codes, durations and the files each run produced is written to
+<work-dir>/runs.json.
+
+The simulator command is configurable (--exe or the AGROC_EXE environment variable), so the local
+stand-in script agroc_stub.py can replace AgroC for testing.
+
+Usage:
+    python plants_runner.py variants/ --exe ./agroc --include climate.in soil.in -j 8
+    python plants_runner.py variants.pack --exe "python agroc_stub.py" --timeout 60
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import shutil
+import sys
+import time
+
+import plants_archive
+import plants_io
+
+
+###############################################################################################################
+
+ENV_EXE = "AGROC_EXE"
+INPUT_NAME = "plants.in"
+
+
+class RunResult:
+    __slots__ = ("run_id", "workdir", "returncode", "timed_out", "duration", "outputs", "error")
+
+    def __init__(self, run_id, workdir):
+        self.run_id = run_id
+        self.workdir = workdir
+        self.returncode = None
+        self.timed_out = False
+        self.duration = 0.0
+        self.outputs = []
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out and self.error is None
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def simulator_command(exe=None):
+    # The simulator command as an argument list, from exe, AGROC_EXE, or "agroc" on the PATH
+    exe = exe or os.environ.get(ENV_EXE) or "agroc"
+    return shlex.split(exe, posix=os.name != "nt")
+
+
+def prepare_workdir(root, run_id, text, include=(), input_name=INPUT_NAME):
+    # Creates root/run_id with the input file and copies of the shared files; IDs that would lead
+    # outside root raise ValueError
+    workdir = plants_archive.safe_path(root, run_id)
+    os.makedirs(workdir, exist_ok=True)
+    with open(os.path.join(workdir, input_name), "w") as file:
+        file.write(text)
+    for path in include:
+        shutil.copy2(path, os.path.join(workdir, os.path.basename(path)))
+    return workdir
+
+
+##########################################
+
+async def _pump(stream, log_path, run_id, label, echo):
+    # Copies a process stream line by line into its log file (and to the console)
+    with open(log_path, "wb") as log:
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+            log.write(line)
+            if echo is not None:
+                echo(run_id, label, line.decode(errors="replace").rstrip("\n"))
+
+
+async def run_one(command, run_id, workdir, timeout=None, echo=None):
+    # Runs the simulator once in workdir; never raises for a failing simulation
+    result = RunResult(run_id, workdir)
+    before = set(os.listdir(workdir))
+    start = time.perf_counter()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command, cwd=workdir, stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    except OSError as e:
+        result.error = f"could not start {command[0]}: {e}"
+        return result
+
+    pumps = asyncio.gather(
+        _pump(process.stdout, os.path.join(workdir, "stdout.log"), run_id, "out", echo),
+        _pump(process.stderr, os.path.join(workdir, "stderr.log"), run_id, "err", echo))
+    try:
+        await asyncio.wait_for(process.wait(), timeout)
+    except asyncio.TimeoutError:
+        result.timed_out = True
+        process.kill()
+        await process.wait()
+    await pumps
+    result.duration = time.perf_counter() - start
+    result.returncode = process.returncode
+    result.outputs = sorted(set(os.listdir(workdir)) - before - {"stdout.log", "stderr.log"})
+    return result
+
+
+async def run_all(inputs, command, work_root, jobs=None, timeout=None, include=(), echo=None,
+                  on_result=None):
+    # Runs every (ID, text) input with at most jobs simulator processes at a time. Inputs are pulled
+    # from the iterable through a bounded queue, so only a few input texts are in memory at once;
+    # the results are returned in input order
+    jobs = jobs or os.cpu_count() or 1
+    queue = asyncio.Queue(maxsize=jobs)
+    results = []
+
+    async def feed():
+        for index, (run_id, text) in enumerate(unique_ids(inputs)):
+            await queue.put((index, run_id, text))
+        for _ in range(jobs):
+            await queue.put(None)
+
+    async def work():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            index, run_id, text = item
+            try:
+                workdir = prepare_workdir(work_root, run_id, text, include)
+            except (OSError, ValueError) as e:
+                result = RunResult(run_id, None)
+                result.error = f"could not prepare the working directory: {e}"
+            else:
+                result = await run_one(command, run_id, workdir, timeout, echo)
+            if on_result is not None:
+                on_result(result)
+            results.append((index, result))
+
+    await asyncio.gather(feed(), *(work() for _ in range(jobs)))
+    return [result for _, result in sorted(results, key=lambda item: item[0])]
+
+
+def unique_ids(inputs):
+    # (ID, text) pairs with repeated IDs renamed to ID_2, ID_3, ... (as in the Run tab), so that
+    # every run gets its own working directory
+    seen = set()
+    for run_id, text in inputs:
+        name = run_id
+        suffix = 1
+        while name in seen:
+            suffix += 1
+            name = f"{run_id}_{suffix}"
+        seen.add(name)
+        yield name, text
+
+
+def iter_inputs(sources):
+    # (ID, text) pairs from plants.in files, directories of .in files and archives
+    for source in sources:
+        if os.path.isfile(source) and not _is_archive(source):
+            with plants_io.open_file(source) as file:
+                yield os.path.splitext(plants_io.strip_compression(os.path.basename(source)))[0], file.read()
+        else:
+            yield from plants_archive.iter_members(source)
+
+
+def _is_archive(path):
+    try:
+        plants_archive.archive_kind(path)
+        return True
+    except ValueError:
+        return False
+
+
+###############################################################################################################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the AgroC simulator over many plants.in inputs")
+    parser.add_argument("inputs", nargs="+", help="plants.in files, directories or archives")
+    parser.add_argument("--exe", help=f"simulator command (default: ${ENV_EXE} or 'agroc')")
+    parser.add_argument("-w", "--work-dir", default="runs", help="root of the per-run working directories")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="concurrent runs (default: number of cores)")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds before a run is killed")
+    parser.add_argument("--include", nargs="*", default=[], help="shared files copied into every working directory")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not echo simulator output")
+    args = parser.parse_args(argv)
+
+    command = simulator_command(args.exe)
+    inputs = iter_inputs(args.inputs)
+    os.makedirs(args.work_dir, exist_ok=True)
+
+    def echo(run_id, label, line):
+        print(f"[{run_id}:{label}] {line}", flush=True)
+
+    def report(result):
+        status = "ok" if result.ok else "TIMEOUT" if result.timed_out else result.error or f"exit {result.returncode}"
+        print(f"[{result.run_id}] {status} ({result.duration:.2f} s)", flush=True)
+
+    start = time.perf_counter()
+    results = asyncio.run(run_all(inputs, command, args.work_dir, args.jobs, args.timeout, args.include,
+                                  None if args.quiet else echo, report))
+    elapsed = time.perf_counter() - start
+
+    with open(os.path.join(args.work_dir, "runs.json"), "w") as file:
+        json.dump([result.to_dict() for result in results], file, indent=2)
+    failed = sum(not result.ok for result in results)
+    print(f"{len(results)} runs in {elapsed:.2f} s, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
@@ -0,0 +1,145 @@
+#############################################################################################################
+
+"""
+Description:
+Named scenario branches of one plants.in document ("wet year", "late sowing", ...) with
+structural sharing.
+
+A branch is a PlantsDocument snapshot. Forking a branch shares the whole snapshot; committing an
+edited document to a branch keeps the objects of the previous snapshot for every part that did not
+change (the general settings, the fields of each plant type and each of the 17 tables), so only the
+edited parts are stored again. Dozens of branches therefore cost little more memory than one, and
+comparing two branches skips all shared parts. Snapshots are shared between branches and must not
+be changed in place: edit a copy (or the editor widgets) and commit it.
+
+Usage:
+    scenarios = ScenarioSet(plants_io.read("plants.in"))
+    scenarios.fork("wet year")
+    doc = scenarios.document().copy(); doc.set("amx", "70")
+    scenarios.commit(doc)
+    scenarios.write_all("scenarios/")     # scenarios/base.in, scenarios/wet year.in
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import os
+
+import plants_io
+
+
+###############################################################################################################
+
+def _share_plant(old, new):
+    # new, with the fields dict and the tables of old reused where they are equal
+    if new is old or (new.source is not None and new.source is old.source):
+        return old
+    if new.source is not None:
+        return new  # a different unparsed block
+    tables = [old_rows if old_rows is new_rows or old_rows == new_rows else new_rows
+              for old_rows, new_rows in zip(old.tables, new.tables)]
+    if new.fields == old.fields and all(a is b for a, b in zip(tables, old.tables)):
+        return old
+    plant = plants_io.PlantType(tables=tables)
+    plant.fields = old.fields if new.fields == old.fields else new.fields
+    return plant
+
+
+def share_unchanged(old, new):
+    # Returns a document equal to new that shares every unchanged part with old
+    doc = plants_io.PlantsDocument(plants=[_share_plant(o, n) for o, n in zip(old.plants, new.plants)]
+                                   + new.plants[len(old.plants):])
+    doc.header = old.header if new.header == old.header else new.header
+    if doc.header is old.header and len(old.plants) == len(new.plants) and all(
+            a is b for a, b in zip(doc.plants, old.plants)):
+        return old
+    return doc
+
+
+def differences(a, b):
+    # [(key, value in a, value in b)] for the fields and tables that differ; tables are reported
+    # as 'tabK@N' with their row counts
+    changes = []
+    if a.header is not b.header:
+        changes += [(key, a.header[key], b.header[key]) for key in plants_io.HEADER_FIELDS
+                    if a.header[key] != b.header[key]]
+    for n in range(1, max(len(a.plants), len(b.plants)) + 1):
+        if n > len(a.plants) or n > len(b.plants):
+            changes.append((f"plant type {n}", "present" if n <= len(a.plants) else "missing",
+                            "present" if n <= len(b.plants) else "missing"))
+            continue
+        pa, pb = a.plants[n - 1], b.plants[n - 1]
+        if pa is pb:
+            continue
+        if pa.fields is not pb.fields:
+            changes += [(f"{key}@{n}", pa.fields[key], pb.fields[key]) for key in plants_io.PLANT_FIELDS
+                        if pa.fields[key] != pb.fields[key]]
+        for k, (ta, tb) in enumerate(zip(pa.tables, pb.tables), start=1):
+            if ta is not tb and ta != tb:
+                changes.append((f"tab{k}@{n}", f"{len(ta)} rows", f"{len(tb)} rows"))
+    return changes
+
+
+class ScenarioSet:
+    # Named branches of one document; 'current' is the branch being edited
+    def __init__(self, doc, name="base"):
+        self.branches = {name: doc}
+        self.current = name
+
+    def names(self):
+        return list(self.branches)
+
+    def document(self, name=None):
+        return self.branches[name or self.current]
+
+    def fork(self, name, source=None):
+        # New branch sharing the whole snapshot of source (default: the current branch); made current
+        if not name or name in self.branches:
+            raise ValueError(f"a scenario named {name!r} already exists" if name else "scenario name is empty")
+        self.branches[name] = self.branches[source or self.current]
+        self.current = name
+        return self.branches[name]
+
+    def commit(self, doc, name=None):
+        # Stores doc as the new snapshot of a branch, sharing what did not change
+        name = name or self.current
+        self.branches[name] = share_unchanged(self.branches[name], doc)
+        return self.branches[name]
+
+    def checkout(self, name):
+        if name not in self.branches:
+            raise KeyError(f"no scenario named {name!r}")
+        self.current = name
+        return self.branches[name]
+
+    def delete(self, name):
+        if len(self.branches) == 1:
+            raise ValueError("the last scenario cannot be deleted")
+        del self.branches[name]
+        if self.current == name:
+            self.current = next(iter(self.branches))
+
+    def compare(self, a, b):
+        return differences(self.branches[a], self.branches[b])
+
+    def shared_parts(self):
+        # (distinct, total) count of header/fields/table objects over all branches
+        seen, total = set(), 0
+        for doc in self.branches.values():
+            parts = [doc.header]
+            for plant in doc.plants:
+                parts += [plant] if plant.source is not None else [plant.fields] + plant.tables
+            total += len(parts)
+            seen.update(id(part) for part in parts)
+        return len(seen), total
+
+    def write_all(self, directory):
+        # Writes every branch as <directory>/<name>.in; returns the written paths
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for name, doc in self.branches.items():
+            path = os.path.join(directory, name.replace(os.sep, "_") + ".in")
+            plants_io.write(doc, path)
+            paths.append(path)
+        return paths
+
+
+#####################################################################################################################
@@ -0,0 +1,362 @@
+#############################################################################################################
+
+"""
+Description:
+Long-running local JSON-RPC service that renders, validates and compares plants.in files.
+
+Workflow engines that need many plants.in files call this service over HTTP instead of starting a
+Python process per file. The server speaks JSON-RPC 2.0 on POST /rpc over HTTP/1.1 keep-alive
+connections. A request body can be a JSON array of calls (a batch), which are answered together in
+one response. Connections are handled on threads. With --workers N, large batches are split across
+N worker processes. Bases are parsed once and cached (plants_overlay.OverlayResolver), so
+base-plus-override renders only format the overridden values.
+
+A configuration ("source") is given in one of these forms:
+    {"text": "<plants.in text>"}
+    {"path": "runs/plants.in"}                  a file or .overlay (relative to --root)
+    {"document": {"header": {...}, "plants": [{"fields": {...}, "tables": [[[x, y], ...], ...]}]}}
+    {"base": "plants.in", "set": {"AMX": 70, "tab12": [[0, 0.5], [1, 0.2]]}, "rows": {"tab13": {"2": [0.5, 0.03]}}}
+"set" and "rows" may be added to every form (see plants_overlay.py for the keys).
+
+Methods (the params of render, parse and validate are the source itself):
+    render(source)              -> {"text": plants.in text}
+    parse(source)               -> {"document": JSON document}
+    validate(source)            -> {"valid": bool, "errors": [...], "warnings": [...]}
+    diff(a, b, text=false)      -> {"changes": [[key, value in a, value in b]], "diff": unified diff}
+    ping()                      -> "pong"
+
+Usage:
+    python plants_service.py --port 8765 --root /data/campaign --workers 4
+    curl -d '{"jsonrpc": "2.0", "id": 1, "method": "render",
+              "params": {"base": "plants.in", "set": {"AMX": 70}}}' http://127.0.0.1:8765/rpc
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import concurrent.futures
+import datetime
+import difflib
+import http.client
+import json
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import plants_io
+import plants_overlay
+import plants_scenarios
+
+
+###############################################################################################################
+# Sources and JSON documents
+
+def document_to_json(doc):
+    return {"header": dict(doc.header),
+            "plants": [{"fields": dict(plant.fields), "tables": plant.tables} for plant in doc.plants]}
+
+
+def document_from_json(data):
+    header = {key: plants_io.format_number(value) for key, value in data.get("header", {}).items()}
+    plants = []
+    for plant in data.get("plants", []):
+        fields = {key: "" for key in plants_io.PLANT_FIELDS}
+        fields.update((key, plants_io.format_number(value)) for key, value in plant.get("fields", {}).items())
+        tables = [plants_io.table_from_value(rows) for rows in plant.get("tables", [])]
+        tables += [[] for _ in range(plants_io.NUM_TABLES - len(tables))]
+        plants.append(plants_io.PlantType(fields, tables))
+    if not plants:
+        raise ValueError("a document needs at least one plant type")
+    doc = plants_io.PlantsDocument(plants=plants)
+    doc.header.update(header)
+    return doc
+
+
+def _path(root, path):
+    return path if os.path.isabs(path) else os.path.join(root, path)
+
+
+def _overrides(source):
+    return source.get("set"), source.get("rows")
+
+
+def load_source(source, root="."):
+    # PlantsDocument for a source (see the module description)
+    if not isinstance(source, dict):
+        raise ValueError("a source must be a JSON object")
+    if "base" in source:
+        overlay = plants_overlay.Overlay(_path(root, source["base"]), *_overrides(source))
+        return plants_overlay.default_resolver().resolve(overlay)
+    if "text" in source:
+        doc = plants_io.parse(source["text"])
+    elif "path" in source:
+        doc = plants_overlay.read(_path(root, source["path"]))
+    elif "document" in source:
+        doc = document_from_json(source["document"])
+    else:
+        raise ValueError("a source needs 'text', 'path', 'document' or 'base'")
+    values, rows = _overrides(source)
+    if values or rows:
+        doc = plants_overlay.apply(doc, plants_overlay.Overlay(None, values, rows))
+    return doc
+
+
+def render_source(source, root="."):
+    if isinstance(source, dict) and "base" in source:
+        # Base-plus-override: rendered through the resolver's cached templates
+        overlay = plants_overlay.Overlay(_path(root, source["base"]), *_overrides(source))
+        return plants_overlay.default_resolver().render(overlay)
+    return plants_io.serialize(load_source(source, root))
+
+
+###############################################################################################################
+# Validation
+
+def _numbers(text, what, errors):
+    values = []
+    for token in text.split():
+        try:
+            values.append(float(token))
+        except ValueError:
+            errors.append(f"{what}: {token!r} is not a number")
+    return values
+
+
+def validate(doc):
+    # (errors, warnings): values AgroC cannot read, and values that are readable but suspicious
+    errors, warnings = [], []
+    header = doc.header
+    flags = header["flags"].split()
+    if len(flags) != len(plants_io.FLAG_NAMES) or any(flag.upper() not in ("T", "F") for flag in flags):
+        errors.append(f"flags: expected {len(plants_io.FLAG_NAMES)} T/F values, got {header['flags']!r}")
+    if header["daily_timestep"].upper() not in ("T", "F"):
+        errors.append(f"daily_timestep: expected T or F, got {header['daily_timestep']!r}")
+    try:
+        datetime.date(*map(int, header["start_date"].split()))
+    except (TypeError, ValueError):
+        errors.append(f"start_date: {header['start_date']!r} is not a date (yyyy mm dd)")
+    for key, choices in (("unit_soilco2", "12345"), ("interception_model", "12")):
+        if header[key] not in choices:
+            errors.append(f"{key}: expected one of {', '.join(choices)}, got {header[key]!r}")
+    latitude = _numbers(header["latitude"], "latitude", errors)
+    if latitude and not -90.0 <= latitude[0] <= 90.0:
+        errors.append(f"latitude: {latitude[0]} is outside -90 .. 90")
+    if header["num_plant_types"] != str(len(doc.plants)):
+        warnings.append(f"num_plant_types is {header['num_plant_types']!r}, the file has {len(doc.plants)} plant types "
+                        "(written from the blocks)")
+    for n, plant in enumerate(doc.plants, start=1):
+        for key in plants_io.PARAMETER_FIELDS:
+            values = _numbers(plant.fields[key], f"{key}@{n}", errors)
+            if not plant.fields[key].strip():
+                errors.append(f"{key}@{n}: empty")
+            elif len(values) > 1:
+                warnings.append(f"{key}@{n}: only the first of {len(values)} values is used")
+        for k, rows in enumerate(plant.tables, start=1):
+            xs = [values[0] for values in (_numbers(" ".join(row), f"tab{k}@{n}", errors) for row in rows) if values]
+            if any(b < a for a, b in zip(xs, xs[1:])):
+                warnings.append(f"tab{k}@{n}: column 1 is not increasing")
+    return errors, warnings
+
+
+###############################################################################################################
+# JSON-RPC
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def _method_render(root, source):
+    return {"text": render_source(source, root)}
+
+
+def _method_parse(root, source):
+    return {"document": document_to_json(load_source(source, root))}
+
+
+def _method_validate(root, source):
+    try:
+        doc = load_source(source, root)
+    except plants_io.PlantsFormatError as e:
+        return {"valid": False, "errors": [str(e)], "warnings": []}
+    errors, warnings = validate(doc)
+    return {"valid": not errors, "errors": errors, "warnings": warnings}
+
+
+def _method_diff(root, params):
+    # params: {"a": source, "b": source, "text": bool} or [a, b]
+    if isinstance(params, list):
+        params = dict(zip(("a", "b", "text"), params))
+    doc_a, doc_b = load_source(params["a"], root), load_source(params["b"], root)
+    result = {"changes": [list(change) for change in plants_scenarios.differences(doc_a, doc_b)]}
+    if params.get("text"):
+        result["diff"] = "".join(difflib.unified_diff(plants_io.serialize(doc_a).splitlines(True),
+                                                      plants_io.serialize(doc_b).splitlines(True), "a", "b"))
+    return result
+
+
+def _method_ping(root, params):
+    return "pong"
+
+
+METHODS = {
+    "render": _method_render,
+    "parse": _method_parse,
+    "validate": _method_validate,
+    "diff": _method_diff,
+    "ping": _method_ping,
+}
+
+
+def handle_call(call, root="."):
+    # Response object for one JSON-RPC call, or None for a notification
+    call_id = call.get("id") if isinstance(call, dict) else None
+    try:
+        if not isinstance(call, dict) or call.get("jsonrpc") != "2.0" or not isinstance(call.get("method"), str):
+            raise RpcError(-32600, "invalid request")
+        method = METHODS.get(call["method"])
+        if method is None:
+            raise RpcError(-32601, f"method not found: {call['method']}")
+        try:
+            result = method(root, call.get("params", {}))
+        except (ValueError, KeyError, IndexError, TypeError, OSError) as e:
+            raise RpcError(-32602, f"{type(e).__name__}: {e}") from None
+    except RpcError as e:
+        response = {"jsonrpc": "2.0", "id": call_id, "error": {"code": e.code, "message": str(e)}}
+    except Exception as e:
+        response = {"jsonrpc": "2.0", "id": call_id, "error": {"code": -32603, "message": f"{type(e).__name__}: {e}"}}
+    else:
+        response = {"jsonrpc": "2.0", "id": call_id, "result": result}
+    return response if not isinstance(call, dict) or "id" in call else None
+
+
+def _handle_chunk(calls, root):
+    # Runs in a worker process
+    return [handle_call(call, root) for call in calls]
+
+
+class RenderService(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, root=".", workers=0, min_parallel_batch=64):
+        super().__init__(address, RpcHandler)
+        self.root = root
+        self.pool = concurrent.futures.ProcessPoolExecutor(workers) if workers > 1 else None
+        self.workers = workers
+        self.min_parallel_batch = min_parallel_batch
+
+    def handle_batch(self, calls):
+        if self.pool is None or len(calls) < self.min_parallel_batch:
+            return [handle_call(call, self.root) for call in calls]
+        size = -(-len(calls) // self.workers)
+        chunks = [calls[i:i + size] for i in range(0, len(calls), size)]
+        return [response for chunk in self.pool.map(_handle_chunk, chunks, [self.root] * len(chunks))
+                for response in chunk]
+
+    def server_close(self):
+        super().server_close()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+
+class RpcHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body are written separately
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in ("", "/rpc"):
+            self.send_json(404, {"error": "use POST /rpc"})
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            request = json.loads(body)
+        except ValueError as e:
+            self.send_json(200, {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": f"parse error: {e}"}})
+            return
+        if isinstance(request, list):
+            if not request:
+                response = {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "empty batch"}}
+            else:
+                response = [r for r in self.server.handle_batch(request) if r is not None] or None
+        else:
+            response = handle_call(request, self.server.root)
+        if response is None:
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            self.send_json(200, response)
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one line per request would dominate the run time
+
+
+###############################################################################################################
+# Client
+
+class ServiceClient:
+    # Keep-alive client: client.call("render", {"base": "plants.in", "set": {"AMX": 70}})
+    def __init__(self, host="127.0.0.1", port=8765, timeout=60):
+        self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+        self._next_id = 0
+
+    def _post(self, payload):
+        self.connection.request("POST", "/rpc", json.dumps(payload).encode(), {"Content-Type": "application/json"})
+        response = self.connection.getresponse()
+        body = response.read()
+        return json.loads(body) if body else None
+
+    def _request(self, method, params):
+        self._next_id += 1
+        return {"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params}
+
+    def call(self, method, params=None):
+        response = self._post(self._request(method, params or {}))
+        if "error" in response:
+            raise RuntimeError(response["error"]["message"])
+        return response["result"]
+
+    def batch(self, calls):
+        # [(method, params)] -> [result or RuntimeError], in order
+        requests = [self._request(method, params) for method, params in calls]
+        responses = {response["id"]: response for response in self._post(requests)}
+        return [responses[r["id"]]["result"] if "result" in responses[r["id"]]
+                else RuntimeError(responses[r["id"]]["error"]["message"]) for r in requests]
+
+    def close(self):
+        self.connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve plants.in rendering, validation and diffs over JSON-RPC")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="port (default: 8765)")
+    parser.add_argument("--root", default=".", help="directory that relative paths refer to (default: .)")
+    parser.add_argument("-w", "--workers", type=int, default=0,
+                        help="worker processes for large batches (default: handle everything in the server process)")
+    args = parser.parse_args(argv)
+
+    server = RenderService((args.host, args.port), os.path.abspath(args.root), args.workers)
+    print(f"plants.in service on http://{args.host}:{server.server_address[1]}/rpc (root {server.root})",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
@@ -0,0 +1,145 @@
+#############################################################################################################
+
+"""
+Description:
+Error-bounded simplification of the plants.in lookup tables.
+
+Tables derived from measurements (Tab.12 root density, the N-content tables 13-17) can have
+thousands of rows. AgroC interpolates linearly between rows, so rows that lie on (or close to) the
+line between their neighbours can be dropped. simplify() keeps a subset of the rows chosen with
+the Douglas-Peucker algorithm on the vertical (interpolation) error: the piecewise-linear curve
+through the kept rows differs from every original row by at most the given tolerance. The first
+and last rows are always kept. Row counts in the written file follow the tables automatically.
+
+Usage:
+    python plants_simplify.py --tables 12 13 14 15 16 17 --tolerance 0.001 library/*.in -o simplified/
+    python plants_simplify.py --tables 12 --tolerance 0.0005 --in-place plants.in
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import concurrent.futures
+import os
+import sys
+
+import numpy as np
+
+import plants_io
+from plants_trace import traced
+
+
+###############################################################################################################
+
+def simplify(x, y, tolerance):
+    # Indices of the rows to keep so that linear interpolation stays within tolerance of all rows
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n <= 2:
+        return np.arange(n)
+    if np.any(np.diff(x) < 0):
+        raise ValueError("table column 1 must be sorted in ascending order")
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        xs = x[first + 1:last]
+        dx = x[last] - x[first]
+        if dx == 0:
+            line = np.full(len(xs), y[first])
+        else:
+            line = y[first] + (xs - x[first]) * ((y[last] - y[first]) / dx)
+        error = np.abs(y[first + 1:last] - line)
+        worst = int(np.argmax(error))
+        if error[worst] > tolerance:
+            split = first + 1 + worst
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def interpolation_error(x, y, kept):
+    # Largest vertical distance between the original rows and the curve through the kept rows
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(kept) == len(x):
+        return 0.0
+    return float(np.max(np.abs(np.interp(x, x[kept], y[kept]) - y)))
+
+
+def simplify_table(rows, tolerance):
+    # Simplifies text rows of a table; returns (kept rows, maximum error)
+    if len(rows) <= 2:
+        return rows, 0.0
+    values = np.array(plants_io.table_values(rows), dtype=float).reshape(-1, 2)
+    kept = simplify(values[:, 0], values[:, 1], tolerance)
+    return [rows[i] for i in kept], interpolation_error(values[:, 0], values[:, 1], kept)
+
+
+@traced(name="plants_simplify.simplify_document")
+def simplify_document(doc, tables, tolerance):
+    # Simplifies the given table numbers (1-based) of every plant type in place; returns a report
+    report = []
+    for p, plant in enumerate(doc.plants, start=1):
+        for number in tables:
+            before = len(plant.tables[number - 1])
+            plant.tables[number - 1], error = simplify_table(plant.tables[number - 1], tolerance)
+            report.append((p, number, before, len(plant.tables[number - 1]), error))
+    return report
+
+
+##########################################
+# Batch use
+
+def _simplify_file(job):
+    path, target, tables, tolerance = job
+    doc = plants_io.read(path)
+    report = simplify_document(doc, tables, tolerance)
+    plants_io.write(doc, target)
+    return path, report
+
+
+def simplify_files(paths, tables, tolerance, out_dir=None, jobs=None):
+    # Simplifies many files in a process pool; yields (path, report) as files finish. In out_dir the
+    # files keep their paths relative to the common directory of the inputs, so same-named inputs
+    # from different directories do not overwrite each other.
+    paths = list(paths)
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths]) if paths else ""
+    work = []
+    for path in paths:
+        target = path if out_dir is None else os.path.join(out_dir, os.path.relpath(os.path.abspath(path), root))
+        if out_dir is not None:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+        work.append((path, target, tables, tolerance))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(_simplify_file, work, chunksize=max(1, len(work) // (4 * (jobs or os.cpu_count() or 1))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reduce table rows within an interpolation error tolerance")
+    parser.add_argument("files", nargs="+", help="plants.in files")
+    parser.add_argument("--tables", nargs="+", type=int, default=[12], help="table numbers 1-17 (default: 12)")
+    parser.add_argument("--tolerance", type=float, required=True, help="maximum interpolation error (column 2 units)")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("-o", "--out-dir", help="directory for the simplified files, keeping their paths below the common input directory")
+    output.add_argument("--in-place", action="store_true", help="overwrite the input files")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes")
+    args = parser.parse_args(argv)
+
+    if any(not 1 <= number <= plants_io.NUM_TABLES for number in args.tables):
+        parser.error("table numbers must be between 1 and 17")
+    for path, report in simplify_files(args.files, args.tables, args.tolerance, args.out_dir, args.jobs):
+        for plant, number, before, after, error in report:
+            if before != after:
+                print(f"{path}: plant type {plant} Tab.{number}: {before} -> {after} rows, max error {error:.3g}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
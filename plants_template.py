@@ -0,0 +1,199 @@
+#############################################################################################################
+
+"""
+Description:
+Precompiled plants.in templates for bulk generation of input variants.
+
+A PlantsTemplate is compiled once from a base document and a list of slot names (fields such as
+'latitude', 'start_date', 'AMX', 'tempstart@2', or whole tables such as 'tab12'). Everything that
+is not a slot - comment text, padding, section headers, the unchanged tables - is rendered once into
+static text. Rendering a variant then only formats the slot values and joins them with the static
+pieces into one string.
+
+Usage (one output per CSV row; the columns are the slot names):
+    python plants_template.py plants.in sites.csv -o variants/ --id-column site
+    python plants_template.py plants.in sites.csv -o variants.pack --id-column site
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import csv
+import sys
+import time
+
+import plants_archive
+import plants_io
+from plants_trace import span, traced
+
+
+###############################################################################################################
+
+class PlantsTemplate:
+    # Static skeleton of a document with named slots for the values that vary between variants
+
+    def __init__(self, doc, slots):
+        self.doc = doc
+        self.slots = list(slots)
+        self._parts = []
+        # (position in _parts, slot key, renderer)
+        self._slot_positions = []
+        # plant number -> (position of its row-count line, static counts, {table index: slot key})
+        self._row_lines = {}
+        self._compile()
+
+    ##########################################
+
+    def _compile(self):
+        doc = self.doc
+        header_slots = {}
+        plant_slots = {}
+        for key in self.slots:
+            where, name = plants_io.resolve_key(doc, key)
+            if where is doc.header:
+                header_slots[name] = key
+            else:
+                plant = next(i for i, p in enumerate(doc.plants) if p is where or p.fields is where)
+                plant_slots.setdefault(plant, {})[name] = key
+
+        static = []
+
+        def flush():
+            if static:
+                self._parts.append("".join(static))
+                static.clear()
+
+        def add_slot(key, renderer, default):
+            flush()
+            self._slot_positions.append((len(self._parts), key, renderer))
+            self._parts.append(renderer(default))
+
+        for field, line in plants_io.HEADER_LINES:
+            if field in header_slots:
+                prefix, suffix = line.split("{}")
+                static.append(prefix)
+                add_slot(header_slots[field], _field_renderer(field), doc.header.get(field, ""))
+                static.append(suffix + "\n")
+            else:
+                value = plants_io.format_field(field, doc.header.get(field, "")) if field else None
+                static.append((line.format(value) if field else line) + "\n")
+
+        for p, plant in enumerate(doc.plants):
+            slots = plant_slots.get(p, {})
+            table_slots = {int(name[3:]) - 1: key for name, key in slots.items() if name.startswith("tab")}
+            static.append(plants_io.format_plant_header(p + 1))
+            row_positions = []
+            for field, line in plants_io.PLANT_LINES:
+                if field == "table_rows" and table_slots:
+                    prefix, suffix = line.split("{}")
+                    static.append(prefix)
+                    flush()
+                    row_positions.append(len(self._parts))
+                    self._parts.append(plant.table_rows())
+                    static.append(suffix + "\n")
+                elif field == "table_rows":
+                    static.append(line.format(plant.table_rows()) + "\n")
+                elif field in slots:
+                    prefix, suffix = line.split("{}")
+                    static.append(prefix)
+                    add_slot(slots[field], _field_renderer(field), plant.fields.get(field, ""))
+                    static.append(suffix + "\n")
+                else:
+                    value = plants_io.format_field(field, plant.fields.get(field, "")) if field else None
+                    static.append((line.format(value) if field else line) + "\n")
+            for i, rows in enumerate(plant.tables):
+                static.append(plants_io.format_table_header(i))
+                if i in table_slots:
+                    add_slot(table_slots[i], _render_table, rows)
+                else:
+                    static.append(plants_io.format_table_rows(rows))
+            if table_slots:
+                counts = [str(len(rows)) for rows in plant.tables]
+                self._row_lines[p] = (row_positions, counts, table_slots)
+        flush()
+
+    ##########################################
+
+    def render(self, values):
+        # Text of the variant with the given slot values (missing slots keep the base value; an empty
+        # value, such as an empty CSV cell, counts as missing)
+        parts = list(self._parts)
+        for pos, key, renderer in self._slot_positions:
+            value = values.get(key)
+            if not _missing(value):
+                parts[pos] = renderer(value)
+        for row_positions, counts, table_slots in self._row_lines.values():
+            counts = list(counts)
+            changed = False
+            for i, key in table_slots.items():
+                value = values.get(key)
+                if not _missing(value):
+                    counts[i] = str(len(plants_io.table_from_value(value)))
+                    changed = True
+            if changed:
+                line = " ".join(counts)
+                for pos in row_positions:
+                    parts[pos] = line
+        return "".join(parts)
+
+
+def _missing(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _field_renderer(field):
+    def render(value):
+        return plants_io.format_field(field, plants_io.format_number(value))
+    return render
+
+
+def _render_table(value):
+    return plants_io.format_table_rows(plants_io.table_from_value(value))
+
+
+###############################################################################################################
+# Batch generation
+
+def iter_csv_variants(template, csv_path, id_column=None):
+    # Yields (name, text) for every row of the CSV file
+    with open(csv_path, newline="") as file:
+        reader = csv.DictReader(file)
+        for n, row in enumerate(reader):
+            name = row.pop(id_column) if id_column else f"plants_{n:06d}"
+            yield name, template.render(row)
+
+
+def csv_slots(csv_path, id_column=None):
+    with open(csv_path, newline="") as file:
+        columns = next(csv.reader(file))
+    return [column for column in columns if column != id_column]
+
+
+@traced(name="plants_template.generate_from_csv")
+def generate_from_csv(base_file, csv_path, output, id_column=None):
+    # Writes one variant per CSV row into output: a directory, or a .zip/.tar/.pack archive
+    doc = plants_io.read(base_file)
+    with span("plants_template.compile"):
+        template = PlantsTemplate(doc, csv_slots(csv_path, id_column))
+    return plants_archive.write_archive(iter_csv_variants(template, csv_path, id_column), output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate plants.in variants from a base file and a CSV of values")
+    parser.add_argument("base", help="base plants.in file")
+    parser.add_argument("csv", help="CSV file; each column names a field (e.g. latitude, start_date, AMX, tab12)")
+    parser.add_argument("-o", "--output", default="variants",
+                        help="output directory, or an archive (.zip, .tar, .tar.gz, .pack) to stream all variants into")
+    parser.add_argument("--id-column", help="CSV column used as output file name instead of a running number")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    count = generate_from_csv(args.base, args.csv, args.output, args.id_column)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {count} variants to {args.output} in {elapsed:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
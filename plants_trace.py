@@ -0,0 +1,231 @@
+#############################################################################################################
+
+"""
+Description:
+Lightweight timing spans for the AgroC plants.in editor and its headless tools.
+
+Spans are switched off by default and cost a single flag check per call. They are enabled with the
+AGROC_TRACE environment variable (set to the output path of the trace file) or with the --trace
+command line flag of the editor. When the process exits, the recorded spans are written as
+Chrome trace-event JSON (open it in chrome://tracing or https://ui.perfetto.dev) and a summary
+table is printed to stderr.
+
+Usage:
+    from plants_trace import traced, span
+
+    @traced
+    def load_file(self, filename): ...
+
+    with span("parse tables"):
+        ...
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+
+###############################################################################################################
+
+ENV_VAR = "AGROC_TRACE"
+
+
+class _TraceState:
+    # Holds the global on/off switch and the recorded events
+    __slots__ = ("enabled", "path", "events", "lock", "t0", "registered")
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.events = []
+        self.lock = threading.Lock()
+        self.t0 = time.perf_counter()
+        self.registered = False
+
+
+_state = _TraceState()
+
+
+class _NullSpan:
+    # Shared no-op context manager returned by span() while tracing is disabled
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "cat", "args", "start")
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, self.cat, self.start, time.perf_counter(), self.args)
+        return False
+
+
+##########################################
+
+def enable(path=None):
+    # Switch tracing on; the trace is written to path (or only summarised if path is None) at exit
+    _state.enabled = True
+    _state.path = path
+    if not _state.registered:
+        atexit.register(_flush_at_exit)
+        _state.registered = True
+
+
+def disable():
+    _state.enabled = False
+
+
+def is_enabled():
+    return _state.enabled
+
+
+def reset():
+    # Drop all recorded events (used by benchmarks between phases)
+    with _state.lock:
+        _state.events = []
+
+
+def enable_from_env():
+    # Enable tracing when AGROC_TRACE is set; "1" only prints the summary table
+    value = os.environ.get(ENV_VAR)
+    if value:
+        enable(None if value in ("1", "true", "yes") else value)
+    return _state.enabled
+
+
+def enable_from_argv(argv):
+    # Strip a "--trace [PATH]" option from argv (in place) and enable tracing if present
+    for i, arg in enumerate(argv):
+        if arg == "--trace":
+            path = None
+            if i + 1 < len(argv) and not argv[i + 1].startswith("-"):
+                path = argv.pop(i + 1)
+            argv.pop(i)
+            enable(path or "agroc_trace.json")
+            return True
+        if arg.startswith("--trace="):
+            argv.pop(i)
+            enable(arg.split("=", 1)[1] or "agroc_trace.json")
+            return True
+    return False
+
+
+##########################################
+
+def _record(name, cat, start, end, args):
+    event = {
+        "name": name,
+        "cat": cat,
+        "ph": "X",
+        "ts": (start - _state.t0) * 1e6,
+        "dur": (end - start) * 1e6,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+    }
+    if args:
+        event["args"] = args
+    with _state.lock:
+        _state.events.append(event)
+
+
+def span(name, cat="agroc", **args):
+    # Context manager timing the enclosed block
+    if not _state.enabled:
+        return _NULL_SPAN
+    return _Span(name, cat, args)
+
+
+def traced(func=None, *, name=None, cat="agroc"):
+    # Decorator timing every call of func; usable as @traced or @traced(name="...")
+    if func is None:
+        return functools.partial(traced, name=name, cat=cat)
+    span_name = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _state.enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _record(span_name, cat, start, time.perf_counter(), None)
+
+    return wrapper
+
+
+##########################################
+# Export
+
+def events():
+    with _state.lock:
+        return list(_state.events)
+
+
+def write_chrome_trace(path, evts=None):
+    # Write the events in Chrome trace-event format
+    evts = events() if evts is None else evts
+    with open(path, "w") as file:
+        json.dump({"traceEvents": evts, "displayTimeUnit": "ms"}, file)
+
+
+def summary(evts=None):
+    # Aggregate durations per span name: (name, count, total_ms, mean_ms, max_ms), slowest first
+    evts = events() if evts is None else evts
+    totals = {}
+    for event in evts:
+        stats = totals.setdefault(event["name"], [0, 0.0, 0.0])
+        dur = event["dur"] / 1000.0
+        stats[0] += 1
+        stats[1] += dur
+        if dur > stats[2]:
+            stats[2] = dur
+    rows = [(name, n, total, total / n, peak) for name, (n, total, peak) in totals.items()]
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows
+
+
+def format_summary(rows=None):
+    rows = summary() if rows is None else rows
+    width = max([len("span")] + [len(row[0]) for row in rows])
+    lines = [f"{'span':<{width}}  {'calls':>7}  {'total ms':>10}  {'mean ms':>9}  {'max ms':>9}"]
+    for name, n, total, mean, peak in rows:
+        lines.append(f"{name:<{width}}  {n:>7}  {total:>10.2f}  {mean:>9.3f}  {peak:>9.3f}")
+    return "\n".join(lines)
+
+
+def _flush_at_exit():
+    evts = events()
+    if not evts:
+        return
+    if _state.path:
+        write_chrome_trace(_state.path, evts)
+        print(f"Trace written to {_state.path}", file=sys.stderr)
+    print(format_summary(summary(evts)), file=sys.stderr)
+
+
+enable_from_env()
+
+#####################################################################################################################
@@ -0,0 +1,307 @@
+#############################################################################################################
+
+"""
+Description:
+Streaming batch transforms for libraries of plants.in files.
+
+Each file goes through parse -> transforms -> serialize in a pool of worker processes; files are
+streamed from the directory tree, so libraries of any size can be processed. Table operations work
+on NumPy arrays of the table columns. With --dry-run nothing is written, and --diff prints a
+unified diff of every change.
+
+Transforms (given with -t, applied in order):
+    convert-units UNIT          convert RNA_MAX, ROOT_MAX, ROOT_INIT and p0-p3 to the SOILCO2 length
+                                unit UNIT (mm, cm, dm, m, km or 1-5) and update unit_soilco2
+    scale TABLE COL FACTOR      multiply column x or y of a table, e.g. "scale tab13 y 1.1"
+    offset TABLE COL VALUE      add to column x or y of a table
+    renormalize TABLE [sum]     scale column y so that its integral over x (or its sum) is 1
+    shift-senescence DAYS       shift the senescence start/end day of year, wrapping within the year
+    set FIELD VALUE             set a field, e.g. "set AMX 70"
+    generate TABLE CURVE [NAME=VALUE ...]
+                                replace a table by an analytic curve (see plants_generators.py),
+                                e.g. "generate tab12 exponential k=5 rows=21" or
+                                "generate tab2 beta t_opt=22 x=-5:40"
+
+Usage:
+    python plants_transform.py library/ -t "convert-units cm" -t "renormalize tab12" -o converted/
+    python plants_transform.py library/ -t "shift-senescence 10" --in-place --dry-run --diff
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import argparse
+import difflib
+import multiprocessing
+import os
+import shlex
+import sys
+import time
+
+import numpy as np
+
+import plants_generators
+import plants_io
+
+
+###############################################################################################################
+
+UNITS = ["mm", "cm", "dm", "m", "km"]
+# Length of one unit in mm, for unit codes 1-5
+UNIT_MM = [1.0, 10.0, 100.0, 1000.0, 1.0e6]
+LENGTH_FIELDS = ["rna_max", "root_max", "root_init"]
+
+
+def _unit_code(text):
+    text = text.strip().lower()
+    if text in UNITS:
+        return UNITS.index(text) + 1
+    code = int(text)
+    if not 1 <= code <= len(UNITS):
+        raise ValueError(f"unknown unit {text!r}")
+    return code
+
+
+def _column(name):
+    if name.lower() not in ("x", "y", "1", "2"):
+        raise ValueError(f"column must be x or y, got {name!r}")
+    return 0 if name.lower() in ("x", "1") else 1
+
+
+def _table_array(doc, key):
+    rows = doc.get(key)
+    return np.array(plants_io.table_values(rows), dtype=float).reshape(-1, 2)
+
+
+def _tables(doc, name):
+    # Keys of the table in every plant type ("tab12" -> tab12@1, tab12@2, ...) unless one is named
+    if "@" in name:
+        return [name]
+    return [f"{name}@{p}" for p in range(1, len(doc.plants) + 1)]
+
+
+##########################################
+# Transforms: each factory returns a function that changes a document in place
+
+def convert_units(unit):
+    target = _unit_code(unit)
+
+    def apply(doc):
+        source = _unit_code(doc.header["unit_soilco2"])
+        if source == target:
+            return
+        factor = UNIT_MM[source - 1] / UNIT_MM[target - 1]
+        for plant in doc.plants:
+            for key in LENGTH_FIELDS:
+                plant.fields[key] = plants_io.format_number(float(plant.fields[key]) * factor)
+            values = np.array(plant.fields["p_values"].split(), dtype=float) * factor
+            plant.fields["p_values"] = " ".join(plants_io.format_number(v) for v in values)
+        doc.header["unit_soilco2"] = str(target)
+    return apply
+
+
+def scale(table, column, factor):
+    col, factor = _column(column), float(factor)
+
+    def apply(doc):
+        for key in _tables(doc, table):
+            values = _table_array(doc, key)
+            values[:, col] *= factor
+            doc.set(key, values.tolist())
+    return apply
+
+
+def offset(table, column, value):
+    col, value = _column(column), float(value)
+
+    def apply(doc):
+        for key in _tables(doc, table):
+            values = _table_array(doc, key)
+            values[:, col] += value
+            doc.set(key, values.tolist())
+    return apply
+
+
+def renormalize(table, mode="integral"):
+    if mode not in ("integral", "sum"):
+        raise ValueError("renormalize mode must be 'integral' or 'sum'")
+
+    def apply(doc):
+        for key in _tables(doc, table):
+            values = _table_array(doc, key)
+            if len(values) == 0:
+                continue
+            x, y = values[:, 0], values[:, 1]
+            total = y.sum() if mode == "sum" else np.sum((y[1:] + y[:-1]) * np.diff(x)) / 2.0
+            if total != 0:
+                values[:, 1] = y / total
+                doc.set(key, values.tolist())
+    return apply
+
+
+def shift_senescence(days, year_length=365):
+    days = int(days)
+
+    def apply(doc):
+        for plant in doc.plants:
+            values = np.array(plant.fields["senescence"].split(), dtype=int)
+            values = (values - 1 + days) % year_length + 1
+            plant.fields["senescence"] = " ".join(str(v) for v in values)
+    return apply
+
+
+def set_field(field, value):
+    def apply(doc):
+        doc.set(field, value)
+    return apply
+
+
+def generate(table, name, *settings):
+    # rows=N and x=START:STOP choose the sampling, the other settings are curve parameters
+    params, x_range, rows = {}, None, None
+    for setting in settings:
+        key, _, value = setting.partition("=")
+        if key == "rows":
+            rows = int(value)
+        elif key == "x":
+            x_range = tuple(float(v) for v in value.split(":"))
+        else:
+            params[key] = float(value)
+    table_rows = plants_generators.generate(name, params, x_range, rows)
+
+    def apply(doc):
+        for key in _tables(doc, table):
+            doc.set(key, table_rows)
+    return apply
+
+
+TRANSFORMS = {
+    "convert-units": convert_units,
+    "scale": scale,
+    "offset": offset,
+    "renormalize": renormalize,
+    "shift-senescence": shift_senescence,
+    "set": set_field,
+    "generate": generate,
+}
+
+
+def build_pipeline(specs):
+    # ["scale tab12 y 2", ...] -> list of transform functions
+    pipeline = []
+    for spec in specs:
+        name, *args = shlex.split(spec)
+        if name not in TRANSFORMS:
+            raise ValueError(f"unknown transform {name!r}; choose from {', '.join(TRANSFORMS)}")
+        pipeline.append(TRANSFORMS[name](*args))
+    return pipeline
+
+
+def transform_text(pipeline, text):
+    # Returns (text written without transforms, transformed text); serialize() normalizes the layout,
+    # so the first one, not the input, shows what the transforms changed
+    doc = plants_io.parse(text)
+    before = plants_io.serialize(doc)
+    for step in pipeline:
+        step(doc)
+    return before, plants_io.serialize(doc)
+
+
+###############################################################################################################
+# Streaming over a library
+
+_worker = {}
+
+
+def _init_worker(specs, dry_run, diff):
+    _worker["pipeline"] = build_pipeline(specs)
+    _worker["dry_run"] = dry_run
+    _worker["diff"] = diff
+
+
+def _process(job):
+    # Runs in a worker: returns (source, changed, diff text or None, error or None)
+    source, target = job
+    try:
+        with plants_io.open_file(source) as file:
+            text = file.read()
+        before, new_text = transform_text(_worker["pipeline"], text)
+    except Exception as e:
+        return source, False, None, f"{type(e).__name__}: {e}"
+    changed = new_text != before
+    if (changed or source != target) and not _worker["dry_run"]:
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        with plants_io.open_file(target, "w") as file:
+            file.write(new_text)
+    diff = None
+    if _worker["diff"] and changed:
+        diff = "".join(difflib.unified_diff(before.splitlines(True), new_text.splitlines(True),
+                                            source, target))
+    return source, changed, diff, None
+
+
+def iter_library(paths, suffixes=(".in",)):
+    # Yields (root, path) for files given directly and for *.in files (also compressed, *.in.gz,
+    # *.in.xz, *.in.zst) found below directories
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in files:
+                    if plants_io.strip_compression(name).endswith(suffixes):
+                        yield path, os.path.join(root, name)
+        else:
+            yield os.path.dirname(path), path
+
+
+def run(paths, specs, out_dir=None, dry_run=False, diff=False, jobs=None, chunksize=64):
+    # Yields worker results as files are processed
+    build_pipeline(specs)  # report bad transform specs before starting the pool
+
+    def jobs_iter():
+        for root, path in iter_library(paths):
+            target = path if out_dir is None else os.path.join(out_dir, os.path.relpath(path, root))
+            yield path, target
+
+    with multiprocessing.Pool(jobs, _init_worker, (specs, dry_run, diff)) as pool:
+        yield from pool.imap_unordered(_process, jobs_iter(), chunksize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply transforms to a library of plants.in files",
+                                     formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     epilog=__doc__[__doc__.index("Transforms"):__doc__.index("Usage")])
+    parser.add_argument("paths", nargs="+", help="plants.in files or directories (searched for *.in)")
+    parser.add_argument("-t", "--transform", action="append", required=True, help="transform, see below")
+    output = parser.add_mutually_exclusive_group(required=True)
+    output.add_argument("-o", "--out-dir", help="write results here, keeping the directory layout")
+    output.add_argument("--in-place", action="store_true", help="overwrite the input files")
+    parser.add_argument("--dry-run", action="store_true", help="do not write anything")
+    parser.add_argument("--diff", action="store_true", help="print a unified diff for every changed file")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: number of cores)")
+    args = parser.parse_args(argv)
+
+    try:
+        build_pipeline(args.transform)
+    except (ValueError, TypeError) as e:
+        parser.error(str(e))
+    start = time.perf_counter()
+    total = changed = failed = 0
+    for source, was_changed, diff, error in run(args.paths, args.transform, args.out_dir, args.dry_run,
+                                                args.diff, args.jobs):
+        total += 1
+        changed += was_changed
+        if error:
+            failed += 1
+            print(f"{source}: {error}", file=sys.stderr)
+        if diff:
+            sys.stdout.write(diff)
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else 0.0
+    action = "would change" if args.dry_run else "changed"
+    print(f"{total} files in {elapsed:.2f} s ({rate:.0f} files/s): {action} {changed}, failed {failed}",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+#####################################################################################################################
@@ -0,0 +1,58 @@
+#############################################################################################################
+
+"""
+Description:
+Regression tests for the parse cache (plants_cache.py) and the documents it loads.
+
+Usage:
+    python -m pytest test_plants_cache.py
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import os
+import shutil
+
+import plants_cache
+import plants_io
+import plants_scenarios
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+###############################################################################################################
+
+def _cached_read(tmp_path, monkeypatch):
+    # Reads a copy of plants.in twice, so the second read is a cache hit
+    monkeypatch.setattr(plants_cache, "_default", [plants_cache.ParseCache(str(tmp_path / "cache"))])
+    path = str(tmp_path / "plants.in")
+    shutil.copy(os.path.join(HERE, "plants.in"), path)
+    plants_io.read(path)
+    return plants_io.read(path)
+
+
+def test_copy_then_set_keeps_original(tmp_path, monkeypatch):
+    doc = _cached_read(tmp_path, monkeypatch)
+    assert not doc.plants[0].loaded
+    other = doc.copy()
+    other.set("amx", "2")
+    assert doc.get("amx") == plants_io.read(os.path.join(HERE, "plants.in"), use_cache=False).get("amx")
+    assert other.get("amx") == "2"
+
+
+def test_scenario_fork_of_cached_document(tmp_path, monkeypatch):
+    scenarios = plants_scenarios.ScenarioSet(_cached_read(tmp_path, monkeypatch))
+    base = scenarios.current
+    scenarios.fork("warmer")
+    doc = scenarios.document().copy()
+    doc.set("amx", "2")
+    scenarios.commit(doc)
+    assert scenarios.compare(base, "warmer")
+
+
+def test_load_arrays_without_writable_cache(tmp_path, monkeypatch):
+    cache = plants_cache.ParseCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(cache, "_write_entry", lambda path, stat, doc: None)
+    header, plants = cache.load_arrays(os.path.join(HERE, "plants.in"))
+    doc = plants_io.read(os.path.join(HERE, "plants.in"), use_cache=False)
+    assert header == doc.header
+    assert list(plants[0][1][11]) == [v for row in plants_io.table_values(doc.plants[0].tables[11]) for v in row]
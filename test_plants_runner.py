@@ -0,0 +1,45 @@
+#############################################################################################################
+
+"""
+Description:
+Regression tests for the run orchestrator (plants_runner.py), with agroc_stub.py as the simulator.
+
+Usage:
+    python -m pytest test_plants_runner.py
+"""
+############# IMPORT all necessary Libraries ################################################################
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+
+import plants_runner
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STUB = [sys.executable, os.path.join(HERE, "agroc_stub.py"), "--sleep", "0"]
+
+
+###############################################################################################################
+
+def test_same_named_inputs_get_separate_workdirs(tmp_path):
+    for name in ("a", "b"):
+        os.makedirs(tmp_path / name)
+        shutil.copy(os.path.join(HERE, "plants.in"), tmp_path / name / "plants.in")
+    work = tmp_path / "runs"
+    exe = " ".join(f'"{part}"' for part in STUB)
+    assert plants_runner.main([str(tmp_path / "a" / "plants.in"), str(tmp_path / "b" / "plants.in"),
+                               "--exe", exe, "-w", str(work), "-j", "2", "-q"]) == 0
+    with open(work / "runs.json") as file:
+        runs = json.load(file)
+    assert [run["run_id"] for run in runs] == ["plants", "plants_2"]
+    assert all(run["outputs"] == ["plants_out.txt"] for run in runs)
+
+
+def test_id_outside_work_root_fails_only_that_run(tmp_path):
+    with open(os.path.join(HERE, "plants.in")) as file:
+        text = file.read()
+    results = asyncio.run(plants_runner.run_all([("../x", text), ("ok", text)], STUB, str(tmp_path / "runs"), 1))
+    assert results[0].error and not os.path.exists(tmp_path / "x")
+    assert results[1].ok